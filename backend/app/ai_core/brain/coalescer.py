@@ -0,0 +1,157 @@
+# backend/app/ai_core/brain/coalescer.py
+"""
+사용자별 LLM 호출 직렬화 및 병합 (Request Coalescing)
+같은 사용자에 대해 인사/대기/실패/성공 메시지가 동시에 LLM 경로로 들어오면
+히스토리 순서가 섞이고 LLM을 중복 호출하므로, 사용자당 한 번에 하나만 실행합니다.
+
+- 워커 내부: 사용자별 asyncio.Lock (FIFO)
+- 워커 간: Redis 락 brain_lock:{user_id} (SET NX PX, Lua로 소유자만 해제)
+- 대기 중인 낮은 우선순위 요청은 더 새로운(같거나 높은 우선순위) 요청으로 병합되고,
+  더 높은 우선순위가 대기 중이면 새 요청은 버려집니다. 성공 메시지는 버리지 않고 순서대로 실행합니다.
+- 차례(Turn)는 히스토리 조회부터 대화 기억 기록까지 유지되므로, 다음 호출은 항상 앞선 응답이 기록된 히스토리를 읽습니다.
+"""
+import os
+import uuid
+import asyncio
+import itertools
+from typing import Optional
+from app.db.database_redis import RedisManager
+from app.ai_core.brain.dispatcher import PRIORITY_SUCCESS
+
+LOCK_TTL_MS = int(os.getenv("BRAIN_LOCK_TTL_MS", "10000"))   # LLM_TIMEOUT보다 길게
+LOCK_WAIT_SEC = float(os.getenv("BRAIN_LOCK_WAIT_SEC", "8"))  # 다른 워커의 락 대기 상한
+LOCK_RETRY_SEC = 0.05
+
+# 소유자 토큰이 일치할 때만 삭제
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+COUNTERS = {"granted": 0, "coalesced": 0, "dropped": 0, "lock_timeouts": 0}
+
+_seq = itertools.count(1)
+
+
+class _Gate:
+    __slots__ = ("lock", "pending", "refs")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = None  # 대기 중인 낮은 우선순위 요청 중 최신: (priority, seq)
+        self.refs = 0
+
+
+_gates = {}
+
+
+async def _acquire_redis_lock(client, key: str, token: str) -> bool:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LOCK_WAIT_SEC
+    while True:
+        if await client.set(key, token, nx=True, px=LOCK_TTL_MS):
+            return True
+        if loop.time() >= deadline:
+            return False
+        await asyncio.sleep(LOCK_RETRY_SEC)
+
+
+def _unref(user_id: int, gate: _Gate):
+    gate.refs -= 1
+    if gate.refs == 0 and _gates.get(user_id) is gate:
+        _gates.pop(user_id, None)
+
+
+class Turn:
+    """
+    획득한 사용자별 실행 차례 (워커 내부 락 + Redis 락)
+    생성부터 대화 기억 기록까지 잡고 있다가 release로 반환합니다. (여러 번 호출해도 안전)
+    반환을 잊어도 LOCK_TTL_MS 뒤에는 자동으로 반환됩니다. (Redis 락도 그때 만료)
+    """
+    __slots__ = ("user_id", "gate", "client", "key", "token", "locked", "released", "_expiry")
+
+    def __init__(self, user_id: int, gate: _Gate, client, key: str, token: str, locked: bool):
+        self.user_id = user_id
+        self.gate = gate
+        self.client = client
+        self.key = key
+        self.token = token
+        self.locked = locked
+        self.released = False
+        self._expiry = asyncio.get_running_loop().call_later(
+            LOCK_TTL_MS / 1000, lambda: asyncio.ensure_future(self.release())
+        )
+
+    async def release(self):
+        if self.released:
+            return
+        self.released = True
+        self._expiry.cancel()
+        self.gate.lock.release()
+        _unref(self.user_id, self.gate)
+        if self.locked:
+            try:
+                await self.client.eval(_RELEASE_LUA, 1, self.key, self.token)
+            except Exception as e:
+                print(f"[Brain] Unlock Error: {e}")
+
+
+async def acquire_turn(user_id: int, priority: int) -> Optional[Turn]:
+    """
+    사용자별 LLM 실행 차례를 얻습니다. 병합/폐기되었으면 None.
+    얻은 Turn은 호출자가 release해야 합니다. (graphs.PreparedResponse가 확정/폐기 시 반환)
+    """
+    gate = _gates.get(user_id)
+    if gate is None:
+        gate = _gates[user_id] = _Gate()
+    gate.refs += 1
+
+    seq = None
+    holding = False
+    turn = None
+    try:
+        # 앞선 호출이 진행 중이면 낮은 우선순위 요청은 병합 대상
+        if priority < PRIORITY_SUCCESS and gate.lock.locked():
+            if gate.pending is not None and gate.pending[0] > priority:
+                COUNTERS["dropped"] += 1
+                return None
+            seq = next(_seq)
+            gate.pending = (priority, seq)
+
+        await gate.lock.acquire()
+        holding = True
+        if seq is not None:
+            if gate.pending is None or gate.pending[1] != seq:
+                # 대기 중 더 새로운 요청으로 대체됨
+                COUNTERS["coalesced"] += 1
+                return None
+            gate.pending = None
+
+        client = RedisManager.get_client()
+        key = f"brain_lock:{user_id}"
+        token = uuid.uuid4().hex
+        locked = False
+        try:
+            locked = await _acquire_redis_lock(client, key, token)
+        except Exception as e:
+            print(f"[Brain] Lock Error: {e}")
+        if not locked:
+            COUNTERS["lock_timeouts"] += 1
+            if priority < PRIORITY_SUCCESS:
+                return None
+            # 성공 메시지는 락 없이라도 진행
+
+        COUNTERS["granted"] += 1
+        turn = Turn(user_id, gate, client, key, token, locked)  # 락 소유권을 Turn으로 넘김
+        return turn
+    finally:
+        if turn is None:
+            if holding:
+                gate.lock.release()
+            _unref(user_id, gate)
+
+
+def metrics() -> dict:
+    return {**COUNTERS, "active_users": len(_gates)}
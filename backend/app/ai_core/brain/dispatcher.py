@@ -0,0 +1,205 @@
+# backend/app/ai_core/brain/dispatcher.py
+"""
+LLM 호출 디스패처
+분석 소켓의 LLM 호출(인사, 격려, 칭찬, 대기)을 추적하고 제한합니다.
+
+- 세션 단위 "최신 요청 우선": 세션마다 실행 중 1개 + 대기 1개만 유지하고,
+  새 요청이 오면 우선순위가 같거나 높을 때 대기 중인 오래된 요청을 취소합니다.
+- 우선순위: 성공(3) > 실패/인사(2) > 대기(1). 실행 중인 호출은 더 높은 우선순위만 밀어냅니다.
+- 전역 제한: 세마포어(동시 실행 수) + 토큰 버킷(초당 호출 수)으로 OpenAI API 호출을 제한합니다.
+- 소켓 종료 시 close()로 세션의 모든 호출을 취소합니다.
+"""
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RATE_PER_SEC = float(os.getenv("LLM_RATE_PER_SEC", "5"))  # 0이면 무제한
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+
+# 우선순위 (높을수록 우선)
+PRIORITY_IDLE = 1
+PRIORITY_FAIL = 2
+PRIORITY_SUCCESS = 3
+
+
+def priority_for(action_type: str, is_success: bool) -> int:
+    """FSM의 TriggerLLM 정보를 우선순위로 변환 (인사는 실패 격려와 같은 등급)"""
+    if is_success:
+        return PRIORITY_SUCCESS
+    if action_type == "idle":
+        return PRIORITY_IDLE
+    return PRIORITY_FAIL
+
+
+class LLMDispatcher:
+    """프로세스(워커) 단위 전역 LLM 호출 제한기"""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 rate_per_sec: float = LLM_RATE_PER_SEC, burst: int = LLM_RATE_BURST):
+        self.max_concurrency = max_concurrency
+        self.rate_per_sec = rate_per_sec
+        self.burst = max(1, burst)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket_lock: Optional[asyncio.Lock] = None
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self.counters = {
+            "submitted": 0,
+            "started": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "dropped": 0,
+            "failed": 0,
+        }
+        self._waiting = set()  # 제출됐지만 아직 시작하지 않은 태스크 (시작 전에 취소돼도 빠짐)
+        self.in_flight = 0
+
+    def session(self, key) -> "LLMSession":
+        return LLMSession(self, key)
+
+    async def _acquire(self):
+        # asyncio 프리미티브는 이벤트 루프 안에서 생성
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket_lock = asyncio.Lock()
+
+        if self.rate_per_sec > 0:
+            async with self._bucket_lock:
+                while True:
+                    now = time.monotonic()
+                    self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_sec)
+                    self._refilled_at = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        break
+                    await asyncio.sleep((1.0 - self._tokens) / self.rate_per_sec)
+
+        await self._semaphore.acquire()
+
+    def _release(self):
+        self._semaphore.release()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def metrics(self) -> dict:
+        return {
+            **self.counters,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rate_per_sec": self.rate_per_sec,
+        }
+
+
+class LLMSession:
+    """
+    소켓 1개에 대응하는 LLM 호출 핸들
+    submit()은 fire-and-forget, call()은 결과를 기다립니다. (취소/폐기 시 None)
+    """
+    __slots__ = ("dispatcher", "key", "_running", "_pending", "_closed")
+
+    def __init__(self, dispatcher: LLMDispatcher, key):
+        self.dispatcher = dispatcher
+        self.key = key
+        self._running = None  # (priority, task)
+        self._pending = None  # (priority, task)
+        self._closed = False
+
+    def submit(self, priority: int, factory: Callable[[], Awaitable]) -> Optional[asyncio.Task]:
+        """
+        LLM 호출을 예약합니다. 정책에 따라 버려지면 None을 반환합니다.
+        factory는 호출 시점에 코루틴을 만드는 함수입니다. (대기 중 취소되면 만들지 않음)
+        """
+        d = self.dispatcher
+        if self._closed:
+            d.counters["dropped"] += 1
+            return None
+
+        if self._pending is not None:
+            if priority < self._pending[0]:
+                d.counters["dropped"] += 1
+                return None
+            self._cancel(self._pending)
+        # 대기 슬롯과 별개로, 실행 중인 더 낮은 우선순위 호출은 항상 선점
+        if self._running is not None and priority > self._running[0]:
+            self._cancel(self._running)
+
+        d.counters["submitted"] += 1
+        task = asyncio.create_task(self._run(priority, factory))
+        # 코루틴이 한 번도 실행되기 전에 취소되면 _run의 finally가 돌지 않으므로 완료 콜백으로 정리
+        d._waiting.add(task)
+        task.add_done_callback(d._waiting.discard)
+        self._pending = (priority, task)
+        return task
+
+    async def call(self, priority: int, factory: Callable[[], Awaitable]):
+        """submit 후 결과를 기다립니다. 버려지거나 취소되면 None."""
+        task = self.submit(priority, factory)
+        if task is None:
+            return None
+        await asyncio.wait((task,))
+        return None if task.cancelled() else task.result()
+
+    def close(self):
+        """소켓 종료: 대기/실행 중인 호출을 모두 취소"""
+        self._closed = True
+        for slot in (self._pending, self._running):
+            if slot is not None:
+                self._cancel(slot)
+        self._pending = None
+        self._running = None
+
+    def _cancel(self, slot):
+        task = slot[1]
+        if not task.done() and not task.cancelling():
+            task.cancel()
+            self.dispatcher.counters["cancelled"] += 1
+
+    async def _run(self, priority: int, factory):
+        d = self.dispatcher
+        me = asyncio.current_task()
+        started = False
+        acquired = False
+        try:
+            # 세션 내 직렬 실행: 앞선 호출이 끝날 때까지 대기
+            prev = self._running
+            if prev is not None and not prev[1].done():
+                await asyncio.wait((prev[1],))
+
+            await d._acquire()
+            acquired = True
+
+            d._waiting.discard(me)
+            started = True
+            if self._pending is not None and self._pending[1] is me:
+                self._pending = None
+            self._running = (priority, me)
+            d.in_flight += 1
+            d.counters["started"] += 1
+
+            result = await factory()
+            d.counters["completed"] += 1
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            d.counters["failed"] += 1
+            print(f"[LLM_DISPATCH] Error ({self.key}): {e}")
+            return None
+        finally:
+            if acquired:
+                d._release()
+            if started:
+                d.in_flight -= 1
+            if self._pending is not None and self._pending[1] is me:
+                self._pending = None
+            if self._running is not None and self._running[1] is me:
+                self._running = None
+
+
+# 워커 전역 디스패처
+dispatcher = LLMDispatcher()
@@ -1,20 +1,20 @@
 import os
 import random
 import time
-import pickle # [New] Serialization
-import base64 # [New] Base64 for Redis string compatibility
-from typing import Annotated, TypedDict, Optional, Literal
-from langchain_openai import ChatOpenAI
+import asyncio
+from typing import Annotated, TypedDict, Optional, Literal, NamedTuple, Callable, Awaitable
 from langgraph.graph import StateGraph, END, START
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
 # from langgraph.checkpoint.memory import MemorySaver # [Removed]
-from app.db.database_redis import RedisManager # [New] Redis Manager
-from app.ai_core.brain.prompts import (
-    BASE_PERSONA, MODE_PERSONA, SUCCESS_TEMPLATE, FAIL_TEMPLATE, 
-    DAILY_STREAK_ADDON, MILESTONE_ADDON, IDLE_TEMPLATE, GREETING_TEMPLATE
-)
+from app.ai_core.brain import memory # [New] 대화 기억 저장소 (Redis List)
+from app.ai_core.brain.llm_provider import create_llm
+from app.ai_core.brain.coalescer import Turn, acquire_turn
+from app.ai_core.brain.dispatcher import priority_for
+from app.ai_core.brain.response_cache import response_cache, situation_key
+from app.ai_core.brain import prompt_builder
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "6"))  # 초 - 초과 시 규칙 기반 메시지로 대체
 
 # [New] Rule-based Templates
 RULE_TEMPLATES = {
@@ -51,6 +51,19 @@ RULE_TEMPLATES = {
         "심호흡 한 번 하고 다시 해볼까요? 🧘",
         "실패는 성공의 어머니랬어요! 화이팅! 🔥",
         "천천히 해도 괜찮아요. 기다리고 있을게요! ⏳"
+    ],
+    # LLM 타임아웃/오류 시 대체용
+    "greeting": [
+        "안녕하세요! 오늘도 같이 훈련해봐요! 🐾",
+        "왔어요? 기다리고 있었어요! 시작해볼까요? ✨",
+        "반가워요! 오늘은 어떤 걸 해볼까요? 😆",
+        "준비 완료! 오늘도 힘차게 가봅시다! 🔥"
+    ],
+    "idle": [
+        "주인님~ 뭐 하고 계세요? 심심해요! 🥺",
+        "저 여기 있어요! 같이 놀아주세요! 🐾",
+        "혹시 저 잊어버리신 건 아니죠? 👀",
+        "꼬리 흔들면서 기다리는 중이에요! 🐕"
     ]
 }
 
@@ -70,8 +83,8 @@ class AgentState(TypedDict):
     best_shot_url: Optional[str] # [New]
              
 
-# LLM 모델 초기화
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, api_key=OPENAI_API_KEY)
+# LLM 모델 초기화 (LLM_PROVIDER=openai|fake)
+llm = create_llm()
 
 # [New] Router Logic (Hybrid Filter)
 def route_step(state: AgentState) -> Literal["llm_node", "rule_node"]:
@@ -103,99 +116,60 @@ def route_step(state: AgentState) -> Literal["llm_node", "rule_node"]:
     # 4. 그 외 단순 반복적 성공/실패 -> Rule Based
     return "rule_node"
 
-# [Node] LLM Message Generation
-def generate_llm_message(state: AgentState):
-    action = state["action_type"]
-    stats = state["current_stats"]
-    mode = state.get("mode", "playing")
-    is_success = state.get("is_success", False)
-    feedback = state.get("feedback_detail", "")
-    reward = state.get("reward_info", {})
-    daily_count = state.get("daily_count", 1)
-    milestone_reached = state.get("milestone_reached", False)
-    is_long_absence = state.get("is_long_absence", False)
-    best_shot_url = state.get("best_shot_url")
-    
-    # 히스토리 로드 (최근 6개 대화만 유지)
-    history = state.get("messages", [])
-    if not history: history = []
-    
-    # 호칭 결정
-    user_title = "주인님"
-    strength = stats.get("strength", 0)
-    intelligence = stats.get("intelligence", 0)
-    happiness = stats.get("happiness", 0)
-    
-    if strength > 50: user_title = "든든한 대장님"
-    elif intelligence > 50: user_title = "척척박사님"
-    elif happiness > 50: user_title = "베스트 프렌드"
-    
-    persona_prompt = BASE_PERSONA.format(user_title=user_title)
-    persona_prompt += MODE_PERSONA.get(mode, MODE_PERSONA["default"])
-    
-    situation_prompt = ""
-    
-    if is_success:
-        stat_type = reward.get("stat_type", "스탯")
-        stat_value = reward.get("value", 0)
-        bonus = reward.get("bonus_points", 0)
-        
-        situation_prompt = SUCCESS_TEMPLATE.format(
-            action=action, stat_type=stat_type, stat_value=stat_value, bonus=bonus
-        )
-        if daily_count > 1: situation_prompt += DAILY_STREAK_ADDON.format(daily_count=daily_count)
-        if milestone_reached: situation_prompt += MILESTONE_ADDON
-        if best_shot_url:
-             situation_prompt += "\n(참고: 방금 정말 멋진 훈련 모습이 사진으로 찍혔어요! '인생샷', '화보' 등을 언급하며 칭찬해주세요.)"
-            
-    elif action == "idle":
-        situation_prompt = IDLE_TEMPLATE
-        
-    elif action == "greeting":
-        # [New] 오랜만에 접속 시 특별 메시지
-        if is_long_absence:
-             situation_prompt = "주인님! 너무 보고 싶었어요! 어디 다녀오셨어요? 😭 배고파서 현기증 난단 말이에요..."
-        else:
-             situation_prompt = GREETING_TEMPLATE
-            
+def pick_rule_template(state: AgentState) -> str:
+    """상황(인사/대기/성공/실패)에 맞는 규칙 기반 대사를 고릅니다."""
+    action = state.get("action_type", "")
+    if state.get("is_success", False):
+        key = "success"
+    elif action in ("greeting", "idle"):
+        key = action
     else:
-        situation_prompt = FAIL_TEMPLATE.format(action=action, feedback=feedback)
+        key = "fail"
+    return random.choice(RULE_TEMPLATES[key])
 
-    # 시스템 메시지 (매번 최신 상태 반영을 위해 새로 생성)
-    system_msg = SystemMessage(content=f"{persona_prompt}\n\n[Stats]\n{stats}")
-    user_msg = HumanMessage(content=situation_prompt)
-    
-    # [Context] 히스토리 포함하여 메시지 구성 (System + History + User)
-    # 히스토리 중 SystemMessage나 오래된 내용은 제외하고 최근 대화만 포함
-    context_messages = [system_msg] + history[-6:] + [user_msg]
+async def _stream_llm(context_messages: list, on_token: Callable[[str], Awaitable]) -> AIMessage:
+    """토큰 단위로 on_token에 전달하면서 전체 응답을 모읍니다."""
+    chunks = []
+    async for chunk in llm.astream(context_messages):
+        if chunk.content:
+            chunks.append(chunk.content)
+            await on_token(chunk.content)
+    return AIMessage(content="".join(chunks))
+
+# [Node] LLM Message Generation
+async def generate_llm_message(state: AgentState, config: RunnableConfig):
+    # 히스토리 (memory.load_window로 최근 대화만 주입됨, 오래된 순)
+    history = state.get("messages") or []
+
+    # [Prompt] 캐시된 페르소나 + 압축 스탯 + 토큰 예산 내 최근 대화 + 오래된 대화 요약
+    context_messages = prompt_builder.build_messages(state, history)
+    # 히스토리에는 긴 상황 설명 대신 짧은 라벨 저장
+    user_msg = HumanMessage(content=prompt_builder.situation_label(state))
     
-    response = llm.invoke(context_messages)
+    try:
+        # [Streaming] on_token 콜백이 있으면 토큰 스트리밍 (소켓으로 바로 전달)
+        on_token = (config or {}).get("configurable", {}).get("on_token")
+        if on_token:
+            response = await asyncio.wait_for(_stream_llm(context_messages, on_token), timeout=LLM_TIMEOUT)
+        else:
+            response = await asyncio.wait_for(llm.ainvoke(context_messages), timeout=LLM_TIMEOUT)
+        # 같은 상황에서 재사용할 수 있도록 변형 풀에 추가 (대체 대사는 넣지 않음)
+        response_cache.put(situation_key(state), response.content)
+    except Exception as e:
+        # 타임아웃/API 오류 시 규칙 기반 대사로 대체 (메시지 지연 상한 보장)
+        print(f"[Brain] LLM Fallback ({type(e).__name__}): {e}")
+        response = AIMessage(content=pick_rule_template(state))
     
-    # 상태 업데이트: 히스 갱신
-    new_history = history + [user_msg, response]
-    # 너무 길어지지 않게 관리 (최대 20개)
-    if len(new_history) > 20:
-        new_history = new_history[-20:]
-        
-    return {"messages": new_history}
+    # 상태 업데이트: 히스토리 갱신 (길이 제한은 memory 저장소가 담당)
+    return {"messages": history + [user_msg, response]}
 
 # [Node] Rule-based Message Generation
 def generate_rule_message(state: AgentState):
-    is_success = state.get("is_success", False)
-    key = "success" if is_success else "fail"
-    templates = RULE_TEMPLATES.get(key, RULE_TEMPLATES["success"])
-    msg = random.choice(templates)
-    
-    # Rule 기반 메시지는 히스토리에 굳이 쌓지 않거나, 쌓더라도 간단하게 처리
-    # 여기서는 대화 맥락 유지를 위해 쌓는 것으로 결정
-    history = state.get("messages", [])
-    if not history: history = []
+    msg = pick_rule_template(state)
     
-    ai_msg = AIMessage(content=msg)
-    new_history = history + [ai_msg]
-    if len(new_history) > 20: new_history = new_history[-20:]
-    
-    return {"messages": new_history}
+    # Rule 기반 메시지도 대화 맥락 유지를 위해 히스토리에 쌓음
+    history = state.get("messages") or []
+    return {"messages": history + [AIMessage(content=msg)]}
 
 # --- 워크플로우(Workflow) 정의 ---
 # memory = MemorySaver() # [Removed]
@@ -221,43 +195,35 @@ workflow.add_edge("rule_node", END)
 app = workflow.compile()
 
 # --- 외부 호출용 함수 ---
-async def get_character_response(
-    user_id: int, # [New] User ID for Thread handling
-    action_type: str, 
-    current_stats: dict, 
-    mode: str = "playing", 
+class PreparedResponse(NamedTuple):
+    """
+    생성만 하고 아직 대화 기억에 기록하지 않은 응답 (추측 생성/확정 분리용)
+    LLM 경로에서 만든 응답은 사용자 차례(turn)를 잡고 있으므로 반드시 commit 또는 discard 해야 합니다.
+    """
+    user_id: int
+    messages: list
+    streamed: bool = False  # on_token으로 토큰을 이미 전달했는지 여부
+    turn: Optional[Turn] = None  # 히스토리를 읽은 뒤 기록까지 잡고 있는 사용자 차례
+
+    @property
+    def content(self) -> str:
+        return self.messages[-1].content
+
+
+def _build_inputs(
+    action_type: str,
+    current_stats: dict,
+    mode: str = "playing",
     is_success: bool = False,
     reward_info: dict = {},
     feedback_detail: str = "",
     daily_count: int = 1,
     milestone_reached: bool = False,
-    best_shot_url: Optional[str] = None # [New] Best Shot URL
-) -> str:
-    """
-    Redis를 사용하여 대화 맥락(State)을 로드하고 LangGraph를 실행한 뒤 결과를 저장합니다.
-    """
-    
-    # 1. Redis에서 상태 로드
-    client = RedisManager.get_client()
-    redis_key = f"brain_state:{user_id}"
-    
-    saved_state = {}
-    is_long_absence = False
-    
-    try:
-        data = await client.get(redis_key)
-        if data:
-            # Base64 decode string to bytes, then unpickle
-            saved_state = pickle.loads(base64.b64decode(data))
-            last_ts = saved_state.get("last_interaction_timestamp", 0)
-            if last_ts > 0 and (time.time() - last_ts > 86400):
-                is_long_absence = True
-    except Exception as e:
-        print(f"[Brain] Redis Load Error: {e}")
-        saved_state = {}
-
-    # 2. 입력 데이터 구성 (기존 상태 + 새로운 입력)
-    inputs = {
+    best_shot_url: Optional[str] = None,
+    now: float = 0.0,
+    is_long_absence: bool = False
+) -> AgentState:
+    return {
         "action_type": action_type,
         "current_stats": current_stats,
         "mode": mode,
@@ -265,26 +231,123 @@ async def get_character_response(
         "reward_info": reward_info,
         "feedback_detail": feedback_detail,
         "daily_count": daily_count,
-        "feedback_detail": feedback_detail,
-        "daily_count": daily_count,
         "milestone_reached": milestone_reached,
         "best_shot_url": best_shot_url, # [New] Add to inputs
-        "last_interaction_timestamp": time.time(),
+        "last_interaction_timestamp": now,
         "is_long_absence": is_long_absence,
-        "messages": saved_state.get("messages", []) # 기존 대화 히스토리 주입
+        "messages": []
     }
+
+
+def speculation_key(**kwargs) -> tuple:
+    """
+    get_character_response 인자에서 대사를 결정하는 요소만 뽑은 키.
+    미리 생성한 응답이 실제 상황과 같은지 비교할 때 사용합니다.
+    """
+    return situation_key(_build_inputs(**kwargs))
+
+
+async def prepare_character_response(
+    user_id: int,
+    on_token: Optional[Callable[[str], Awaitable]] = None,
+    **kwargs
+) -> Optional[PreparedResponse]:
+    """
+    대사를 생성하되 대화 기억에는 기록하지 않습니다. (commit_character_response로 확정, discard_character_response로 폐기)
+    인자는 get_character_response와 같습니다.
+    on_token을 주면 LLM 경로에서 토큰을 스트리밍합니다. (규칙/캐시 경로는 호출되지 않음)
+    같은 사용자의 LLM 호출이 진행 중이라 병합/폐기되면 None을 반환합니다.
+    """
+    now = time.time()
+    streamed = False
+
+    async def forward_token(token: str):
+        nonlocal streamed
+        streamed = True
+        await on_token(token)
+
+    # 1. 마지막 대화 시각 (오랜만의 접속 판단)
+    last_ts = await memory.get_last_interaction(user_id)
+    is_long_absence = last_ts > 0 and (now - last_ts > 86400)
+
+    # 2. 입력 데이터 구성
+    inputs = _build_inputs(now=now, is_long_absence=is_long_absence, **kwargs)
     
     # 3. 그래프 실행
-    result = await app.ainvoke(inputs)
-    
-    # 4. Redis에 최신 상태 저장
+    # [Fast Path] 규칙 기반 응답은 그래프를 거치지 않고 바로 생성 (히스토리 조회 없음)
+    if route_step(inputs) == "rule_node":
+        new_messages = generate_rule_message(inputs)["messages"]
+    elif (cached := response_cache.get(situation_key(inputs))) is not None:
+        # [Cache] 같은 상황의 변형 풀이 차 있으면 LLM 호출 없이 재사용
+        new_messages = [AIMessage(content=cached)]
+    else:
+        # [Coalescing] 사용자당 LLM 호출 1개 (워커 간 Redis 락), 대기 중 낮은 우선순위는 병합
+        # 차례는 commit/discard까지 유지: 다음 호출이 이 응답이 기록되기 전의 히스토리를 읽지 않도록
+        turn = await acquire_turn(user_id, priority_for(inputs["action_type"], inputs["is_success"]))
+        if turn is None:
+            return None
+        try:
+            # 요약용으로 저장된 전체 히스토리(최대 HISTORY_LIMIT)를 읽음
+            history = await memory.load_window(user_id, memory.HISTORY_LIMIT)
+            inputs["messages"] = history
+            config = {"configurable": {"on_token": forward_token}} if on_token else None
+            result = await app.ainvoke(inputs, config=config)
+            new_messages = result["messages"][len(history):]
+        except BaseException:
+            await turn.release()
+            raise
+        return PreparedResponse(user_id, new_messages, streamed, turn)
+
+    return PreparedResponse(user_id, new_messages, streamed)
+
+
+async def commit_character_response(prepared: PreparedResponse) -> str:
+    """준비된 응답의 새 메시지만 대화 기억에 기록하고 대사를 반환합니다. (잡고 있던 차례 반환)"""
     try:
-        # 결과 전체를 저장 (Result는 AgentState 구조)
-        # Pickle bytes -> Base64 bytes -> String
-        serialized_data = base64.b64encode(pickle.dumps(result)).decode('utf-8')
-        await client.set(redis_key, serialized_data)
-    except Exception as e:
-        print(f"[Brain] Redis Save Error: {e}")
-    
-    last_message = result["messages"][-1]
-    return last_message.content
+        await memory.append(prepared.user_id, prepared.messages, time.time())
+    finally:
+        if prepared.turn is not None:
+            await prepared.turn.release()
+    return prepared.content
+
+
+async def discard_character_response(prepared: Optional[PreparedResponse]):
+    """기록하지 않을 응답(추측 생성 불일치 등)의 차례만 반환합니다."""
+    if prepared is not None and prepared.turn is not None:
+        await prepared.turn.release()
+
+
+async def get_character_response(
+    user_id: int, # [New] User ID for Thread handling
+    action_type: str, 
+    current_stats: dict, 
+    mode: str = "playing", 
+    is_success: bool = False,
+    reward_info: dict = {},
+    feedback_detail: str = "",
+    daily_count: int = 1,
+    milestone_reached: bool = False,
+    best_shot_url: Optional[str] = None, # [New] Best Shot URL
+    on_token: Optional[Callable[[str], Awaitable]] = None # [New] 토큰 스트리밍 콜백
+) -> Optional[str]:
+    """
+    Redis 대화 기억(memory)을 참고하여 캐릭터 대사를 생성하고 새 대화를 기록합니다.
+    히스토리는 LLM 경로에서만 불러옵니다.
+    같은 사용자의 더 새로운 요청으로 병합/폐기되면 None을 반환합니다.
+    """
+    prepared = await prepare_character_response(
+        user_id,
+        on_token=on_token,
+        action_type=action_type,
+        current_stats=current_stats,
+        mode=mode,
+        is_success=is_success,
+        reward_info=reward_info,
+        feedback_detail=feedback_detail,
+        daily_count=daily_count,
+        milestone_reached=milestone_reached,
+        best_shot_url=best_shot_url
+    )
+    if prepared is None:
+        return None
+    return await commit_character_response(prepared)
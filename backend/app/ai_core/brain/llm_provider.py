@@ -0,0 +1,102 @@
+# backend/app/ai_core/brain/llm_provider.py
+"""
+LLM 제공자 선택
+LLM_PROVIDER 환경 변수로 실제 OpenAI 모델 또는 로컬 가짜 모델(fake)을 선택합니다.
+
+- openai : ChatOpenAI (gpt-4o-mini) - 기본값
+- fake   : FakeChatModel - 네트워크/비용 없이 부하 테스트 및 디스패처/캐시 벤치마크용
+           지연(LLM_FAKE_LATENCY_MS), 흔들림(LLM_FAKE_JITTER_MS), 오류율(LLM_FAKE_ERROR_RATE),
+           시드(LLM_FAKE_SEED)로 동작을 조절합니다.
+"""
+import os
+import random
+import asyncio
+import hashlib
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+
+# 가짜 모델 응답 문장 조각 (한국어 1~2문장 형태)
+_FAKE_OPENERS = ["와!", "좋아요!", "멍멍!", "헤헤,", "주인님,", "음~"]
+_FAKE_BODIES = [
+    "오늘도 같이 해서 너무 신나요",
+    "조금만 더 하면 될 것 같아요",
+    "간식 생각이 나는 순간이네요",
+    "방금 정말 멋졌어요",
+    "천천히 다시 해볼까요",
+    "꼬리가 저절로 흔들려요",
+]
+_FAKE_EMOJIS = ["🐾", "✨", "😆", "🍖", "💖", "🔥"]
+
+
+class FakeLLMError(Exception):
+    """가짜 모델이 error_rate에 따라 발생시키는 API 오류"""
+
+
+class FakeChatModel:
+    """
+    ChatOpenAI를 대신하는 결정적(deterministic) 가짜 채팅 모델
+    graphs.py가 사용하는 ainvoke / astream만 구현합니다. (덕 타이핑)
+    같은 시드와 같은 호출 순서면 지연/오류/응답이 항상 같습니다.
+    """
+
+    def __init__(self, latency_ms: float = 800.0, jitter_ms: float = 300.0,
+                 error_rate: float = 0.0, seed: int = 0, chunk_delay_ms: float = 30.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.chunk_delay_ms = chunk_delay_ms
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    def _plan(self, messages: list):
+        """호출 1건의 지연 시간(초), 오류 여부, 응답 문장을 결정"""
+        self.calls += 1
+        latency = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000.0
+        failed = self._rng.random() < self.error_rate
+
+        # 마지막 메시지(상황 설명) 해시 + 난수로 문장 조합
+        prompt = messages[-1].content if messages else ""
+        h = int(hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8], 16) ^ self._rng.getrandbits(32)
+        text = (
+            f"{_FAKE_OPENERS[h % len(_FAKE_OPENERS)]} "
+            f"{_FAKE_BODIES[(h >> 8) % len(_FAKE_BODIES)]} "
+            f"{_FAKE_EMOJIS[(h >> 16) % len(_FAKE_EMOJIS)]}"
+        )
+        return latency, failed, text
+
+    async def ainvoke(self, messages: list, config=None, **kwargs) -> AIMessage:
+        latency, failed, text = self._plan(messages)
+        await asyncio.sleep(latency)
+        if failed:
+            self.errors += 1
+            raise FakeLLMError("fake provider error")
+        return AIMessage(content=text)
+
+    async def astream(self, messages: list, config=None, **kwargs):
+        latency, failed, text = self._plan(messages)
+        # 첫 토큰까지의 지연 후 단어 단위로 전송
+        await asyncio.sleep(latency)
+        if failed:
+            self.errors += 1
+            raise FakeLLMError("fake provider error")
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.chunk_delay_ms / 1000.0)
+            yield AIMessageChunk(content=word if i == 0 else " " + word)
+
+
+def create_llm(provider: str = LLM_PROVIDER):
+    """설정된 제공자의 채팅 모델 생성"""
+    if provider == "fake":
+        return FakeChatModel(
+            latency_ms=float(os.getenv("LLM_FAKE_LATENCY_MS", "800")),
+            jitter_ms=float(os.getenv("LLM_FAKE_JITTER_MS", "300")),
+            error_rate=float(os.getenv("LLM_FAKE_ERROR_RATE", "0")),
+            seed=int(os.getenv("LLM_FAKE_SEED", "0")),
+        )
+
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0.7, api_key=os.getenv("OPENAI_API_KEY"))
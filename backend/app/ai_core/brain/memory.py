@@ -0,0 +1,81 @@
+# backend/app/ai_core/brain/memory.py
+"""
+캐릭터 대화 기억 저장소 (Redis)
+LangGraph 결과 전체를 pickle로 저장하던 brain_state:{user_id}를 대체합니다.
+
+- brain_history:{user_id} : 최근 대화 리스트 (최신이 앞, [role, content] JSON, 최대 HISTORY_LIMIT개)
+- brain_meta:{user_id}    : 메타데이터 해시 (last_ts = 마지막 대화 시각)
+두 키 모두 MEMORY_TTL 동안 대화가 없으면 만료됩니다.
+"""
+import os
+from typing import List
+from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
+from app.db.database_redis import RedisManager
+from app.core.serialization import encode_text, loads
+
+HISTORY_LIMIT = 20   # 저장하는 최대 메시지 수
+HISTORY_WINDOW = 6   # LLM 프롬프트에 넣는 최근 메시지 수
+MEMORY_TTL = int(os.getenv("BRAIN_MEMORY_TTL", str(60 * 60 * 24 * 14)))  # 초 (기본 14일)
+
+# role 축약: h = 사용자 상황 설명, a = 캐릭터 대사
+_ROLE_OF = {"human": "h", "ai": "a"}
+_CLASS_OF = {"h": HumanMessage, "a": AIMessage}
+
+
+def _history_key(user_id: int) -> str:
+    return f"brain_history:{user_id}"
+
+
+def _meta_key(user_id: int) -> str:
+    return f"brain_meta:{user_id}"
+
+
+async def get_last_interaction(user_id: int) -> float:
+    """마지막 대화 시각 (없으면 0)"""
+    client = RedisManager.get_client()
+    try:
+        ts = await client.hget(_meta_key(user_id), "last_ts")
+        return float(ts) if ts else 0.0
+    except Exception as e:
+        print(f"[Brain] Memory Load Error: {e}")
+        return 0.0
+
+
+async def load_window(user_id: int, size: int = HISTORY_WINDOW) -> List[BaseMessage]:
+    """최근 대화 size개를 오래된 순으로 반환 (LLM 경로에서만 호출)"""
+    client = RedisManager.get_client()
+    try:
+        rows = await client.lrange(_history_key(user_id), 0, size - 1)
+    except Exception as e:
+        print(f"[Brain] Memory Load Error: {e}")
+        return []
+
+    messages = []
+    for row in reversed(rows):
+        try:
+            role, content = loads(row)
+            messages.append(_CLASS_OF[role](content=content))
+        except Exception:
+            continue
+    return messages
+
+
+async def append(user_id: int, messages: List[BaseMessage], timestamp: float):
+    """새 메시지를 기록하고 길이/만료를 갱신합니다. (파이프라인 1회 왕복)"""
+    client = RedisManager.get_client()
+    history_key = _history_key(user_id)
+    meta_key = _meta_key(user_id)
+    rows = [encode_text([_ROLE_OF.get(m.type, "a"), m.content]) for m in messages]
+
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            if rows:
+                pipe.lpush(history_key, *rows)
+                pipe.ltrim(history_key, 0, HISTORY_LIMIT - 1)
+                pipe.expire(history_key, MEMORY_TTL)
+            pipe.hset(meta_key, "last_ts", timestamp)
+            pipe.expire(meta_key, MEMORY_TTL)
+            pipe.delete(f"brain_state:{user_id}")  # 구버전(pickle) 상태 정리
+            await pipe.execute()
+    except Exception as e:
+        print(f"[Brain] Memory Save Error: {e}")
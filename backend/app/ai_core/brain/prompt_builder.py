@@ -0,0 +1,189 @@
+# backend/app/ai_core/brain/prompt_builder.py
+"""
+LLM 프롬프트 조립기
+- 페르소나/모드 시스템 프롬프트는 (호칭, 모드)별로 한 번만 렌더링 (lru_cache)
+- 스탯은 dict repr 대신 짧은 약어 문자열로 직렬화
+- 토큰 예산(PROMPT_TOKEN_BUDGET) 안에서 최근 대화를 넣고, 넘치는 오래된 대화는 한 줄 요약으로 대체
+- 히스토리에는 긴 상황 설명 대신 짧은 상황 라벨을 저장 (situation_label)
+"""
+import os
+import threading
+from functools import lru_cache
+from typing import List
+from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage
+from app.ai_core.brain.prompts import (
+    BASE_PERSONA, MODE_PERSONA, SUCCESS_TEMPLATE, FAIL_TEMPLATE,
+    DAILY_STREAK_ADDON, DAILY_REPEAT_ADDON, MILESTONE_ADDON, IDLE_TEMPLATE, GREETING_TEMPLATE
+)
+from app.ai_core.brain import memory
+from app.ai_core.brain.response_cache import resolve_user_title, daily_count_bucket
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "700"))
+RECENT_MESSAGES = memory.HISTORY_WINDOW  # 원문으로 넣는 최근 메시지 수 (상한)
+SUMMARY_QUOTES = 2        # 요약에 인용하는 최근 캐릭터 대사 수
+QUOTE_CHARS = 30
+
+STAT_ABBR = {
+    "strength": "STR", "intelligence": "INT", "agility": "AGI", "defense": "DEF",
+    "luck": "LUK", "happiness": "HAP", "health": "HP"
+}
+
+LONG_ABSENCE_PROMPT = "주인님! 너무 보고 싶었어요! 어디 다녀오셨어요? 😭 배고파서 현기증 난단 말이에요..."
+BEST_SHOT_ADDON = "\n(참고: 방금 정말 멋진 훈련 모습이 사진으로 찍혔어요! '인생샷', '화보' 등을 언급하며 칭찬해주세요.)"
+
+
+# --- 토큰 계산 (tiktoken 사용, 없거나 인코딩 파일을 못 받으면 근사치) ---
+# 인코딩 파일 다운로드가 이벤트 루프를 막지 않도록 백그라운드 스레드에서 로드하고,
+# 로드 전까지는 근사치를 사용합니다. (서버 시작 시 또는 첫 토큰 계산 시 한 번 시작, import 시에는 시작하지 않음)
+_encoder = None
+_loader_started = False
+_loader_lock = threading.Lock()
+
+
+def _load_encoder():
+    global _encoder
+    try:
+        import tiktoken
+        _encoder = tiktoken.get_encoding("o200k_base")  # gpt-4o 계열
+    except Exception as e:
+        print(f"[Brain] tiktoken unavailable, using estimate: {e}")
+
+
+def start_encoder_loader():
+    """tiktoken 인코딩 로드 스레드 시작 (여러 번 호출해도 한 번만)"""
+    global _loader_started
+    with _loader_lock:
+        if _loader_started:
+            return
+        _loader_started = True
+    threading.Thread(target=_load_encoder, name="tiktoken-loader", daemon=True).start()
+
+
+def count_tokens(text: str) -> int:
+    if not _loader_started:
+        start_encoder_loader()
+    encoder = _encoder
+    if encoder is not None:
+        return len(encoder.encode(text))
+    # 근사치: 한글 등 비 ASCII 문자는 1자 ≒ 1토큰, ASCII는 4자 ≒ 1토큰
+    non_ascii = sum(1 for c in text if ord(c) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4 + 1
+
+
+# --- 시스템 프롬프트 ---
+@lru_cache(maxsize=64)
+def system_prompt(user_title: str, mode: str) -> str:
+    """(호칭, 모드)별 페르소나 프롬프트 (한 번만 렌더링)"""
+    persona = BASE_PERSONA.format(user_title=user_title)
+    persona += MODE_PERSONA.get(mode, MODE_PERSONA["default"])
+    return persona.strip()
+
+
+def compact_stats(stats: dict) -> str:
+    """{'strength': 10, 'happiness': 80} -> 'STR 10, HAP 80'"""
+    return ", ".join(f"{STAT_ABBR.get(k, k)} {v}" for k, v in stats.items() if v is not None)
+
+
+# --- 상황 프롬프트 ---
+def render_situation(state: dict) -> str:
+    """이번 호출의 상황 설명 (LLM에 보내는 사용자 메시지)"""
+    action = state["action_type"]
+
+    if state.get("is_success", False):
+        reward = state.get("reward_info") or {}
+        text = SUCCESS_TEMPLATE.format(
+            action=action,
+            stat_type=reward.get("stat_type", "스탯"),
+            stat_value=reward.get("value", 0),
+            bonus=reward.get("bonus_points", 0)
+        )
+        bucket = daily_count_bucket(state.get("daily_count", 1))
+        if bucket == "repeat":
+            text += DAILY_REPEAT_ADDON
+        elif bucket:
+            text += DAILY_STREAK_ADDON.format(daily_count=bucket)
+        if state.get("milestone_reached", False):
+            text += MILESTONE_ADDON
+        if state.get("best_shot_url"):
+            text += BEST_SHOT_ADDON
+        return text
+
+    if action == "idle":
+        return IDLE_TEMPLATE
+
+    if action == "greeting":
+        # [New] 오랜만에 접속 시 특별 메시지
+        return LONG_ABSENCE_PROMPT if state.get("is_long_absence", False) else GREETING_TEMPLATE
+
+    return FAIL_TEMPLATE.format(action=action, feedback=state.get("feedback_detail", ""))
+
+
+def situation_label(state: dict) -> str:
+    """히스토리에 저장할 짧은 상황 라벨 (다음 호출의 맥락용)"""
+    action = state["action_type"]
+    if state.get("is_success", False):
+        reward = state.get("reward_info") or {}
+        return f"[성공] {action} {reward.get('stat_type', '')}+{reward.get('value', 0)}"
+    if action == "idle":
+        return "[대기]"
+    if action == "greeting":
+        return "[인사]"
+    feedback = state.get("feedback_detail", "")
+    return f"[실패] {action} ({feedback})" if feedback else f"[실패] {action}"
+
+
+# --- 히스토리 요약 ---
+def summarize(messages: List[BaseMessage]) -> str:
+    """
+    원문으로 넣지 못한 오래된 대화의 추출 요약
+    상황 라벨 횟수 + 최근 캐릭터 대사 몇 개의 앞부분
+    """
+    counts = {}
+    quotes = []
+    for m in messages:
+        if m.type == "human":
+            tag = m.content.split("]", 1)[0].lstrip("[") if m.content.startswith("[") else "기타"
+            counts[tag] = counts.get(tag, 0) + 1
+        elif m.type == "ai":
+            quotes.append(m.content[:QUOTE_CHARS])
+
+    parts = []
+    if counts:
+        parts.append(", ".join(f"{tag} {n}회" for tag, n in counts.items()))
+    if quotes:
+        parts.append("최근에 한 말: " + " / ".join(f"'{q}'" for q in quotes[-SUMMARY_QUOTES:]))
+    return ". ".join(parts)
+
+
+def build_messages(state: dict, history: List[BaseMessage], budget: int = PROMPT_TOKEN_BUDGET) -> list:
+    """
+    [System(페르소나+스탯+요약)] + 최근 대화(예산 내) + [이번 상황] 메시지 목록 생성
+    history는 오래된 순입니다.
+    """
+    stats = state.get("current_stats") or {}
+    system_text = f"{system_prompt(resolve_user_title(stats), state.get('mode', 'playing'))}\n\n[Stats] {compact_stats(stats)}"
+    user_msg = HumanMessage(content=render_situation(state))
+
+    remaining = budget - count_tokens(system_text) - count_tokens(user_msg.content)
+
+    # 최근 대화부터 예산 안에서 원문 유지
+    recent = history[-RECENT_MESSAGES:]
+    kept = []
+    for m in reversed(recent):
+        cost = count_tokens(m.content)
+        if cost > remaining:
+            break
+        kept.append(m)
+        remaining -= cost
+    kept.reverse()
+
+    # 넣지 못한 오래된 대화는 한 줄 요약 (예산이 남을 때만)
+    older = history[:len(history) - len(kept)]
+    if older:
+        summary = summarize(older)
+        if summary:
+            summary_text = f"\n\n[이전 대화 요약] {summary}"
+            if count_tokens(summary_text) <= remaining:
+                system_text += summary_text
+
+    return [SystemMessage(content=system_text)] + kept + [user_msg]
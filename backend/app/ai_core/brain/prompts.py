@@ -54,6 +54,8 @@ AI 감지 피드백: '{feedback}'.
 
 # 연속 수행 시 추가 문구
 DAILY_STREAK_ADDON = " 참고로 오늘 벌써 {daily_count}번째 놀아주는 거예요! 주인의 꾸준함에 감동해주세요."
+# 5회 단위가 아닌 반복 수행 (횟수를 말하지 않아 같은 구간의 대사를 재사용 가능)
+DAILY_REPEAT_ADDON = " 참고로 오늘 여러 번 함께 놀아주고 있어요! 주인의 꾸준함에 감동해주세요."
 
 # 마일스톤(레벨업 등) 달성 시 추가 문구
 MILESTONE_ADDON = " [중요] 스탯 레벨이 한 단계 성장했습니다(10단위 돌파)! 짧고 강렬한 축하 메시지를 전해주세요."
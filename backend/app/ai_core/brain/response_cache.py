@@ -0,0 +1,120 @@
+# backend/app/ai_core/brain/response_cache.py
+"""
+캐릭터 대사 응답 캐시 (워커 메모리)
+같은 상황(모드, 행동, 성공 여부, 보상 스탯, 호칭, 마일스톤 등)에서 생성된 LLM 대사는 서로 바꿔 써도
+자연스러우므로, 상황 키마다 여러 개의 변형(variant)을 모아두고 무작위로 재사용합니다.
+
+- 풀이 POOL_SIZE개로 다 차기 전(콜드)이거나 오래된 변형이 만료되어(TTL) 빠지면 LLM을 호출해 채웁니다.
+- 키 개수는 MAX_KEYS로 제한하고 가장 오래 사용되지 않은 키부터 제거합니다. (OrderedDict LRU)
+"""
+import os
+import time
+import random
+from collections import OrderedDict
+from typing import Optional
+
+MAX_KEYS = int(os.getenv("RESPONSE_CACHE_MAX_KEYS", "512"))
+POOL_SIZE = int(os.getenv("RESPONSE_CACHE_POOL_SIZE", "5"))   # 키당 변형 수 (다 차야 캐시에서 응답)
+CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "1800"))      # 초 - 변형 유효 기간
+
+
+def resolve_user_title(stats: dict) -> str:
+    """스탯에 따른 사용자 호칭"""
+    if stats.get("strength", 0) > 50:
+        return "든든한 대장님"
+    if stats.get("intelligence", 0) > 50:
+        return "척척박사님"
+    if stats.get("happiness", 0) > 50:
+        return "베스트 프렌드"
+    return "주인님"
+
+
+def daily_count_bucket(daily_count: int):
+    """
+    오늘 수행 횟수 구간: 첫 번째(0) / 반복("repeat") / 5회 단위(그 횟수)
+    프롬프트도 같은 구간으로 만들어지므로(5회 단위만 숫자를 말함) 같은 구간의 대사는 서로 바꿔 쓸 수 있습니다.
+    """
+    if daily_count <= 1:
+        return 0
+    if daily_count % 5 == 0:
+        return daily_count
+    return "repeat"
+
+
+def situation_key(state: dict) -> tuple:
+    """
+    LLM 프롬프트를 결정하는 요소만 뽑아 정규화한 캐시 키
+    성공 메시지는 오늘 수행 횟수를 언급하므로 daily_count 구간을 포함합니다. (정확한 횟수로 나누면 재사용되지 않음)
+    """
+    is_success = bool(state.get("is_success", False))
+    reward = state.get("reward_info") or {}
+    return (
+        state.get("mode", "playing"),
+        state.get("action_type", ""),
+        is_success,
+        reward.get("stat_type") if is_success else None,
+        resolve_user_title(state.get("current_stats") or {}),
+        bool(state.get("milestone_reached", False)),
+        daily_count_bucket(state.get("daily_count", 1)) if is_success else 0,
+        bool(state.get("is_long_absence", False)),
+        bool(state.get("best_shot_url")),
+    )
+
+
+class ResponseCache:
+    def __init__(self, max_keys: int = MAX_KEYS, pool_size: int = POOL_SIZE, ttl: float = CACHE_TTL):
+        self.max_keys = max_keys
+        self.pool_size = pool_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, list]" = OrderedDict()  # key -> [(text, created_at), ...]
+        self._last_served = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, now: Optional[float] = None) -> Optional[str]:
+        """풀이 가득 차 있으면 무작위 변형을 반환 (직전에 준 대사는 피함), 아니면 None"""
+        now = time.time() if now is None else now
+        pool = self._entries.get(key)
+        if pool:
+            fresh = [v for v in pool if now - v[1] < self.ttl]
+            if len(fresh) != len(pool):
+                pool[:] = fresh
+            if len(fresh) >= self.pool_size:
+                self._entries.move_to_end(key)
+                last = self._last_served.get(key)
+                text = random.choice([t for t, _ in fresh if t != last] or [fresh[0][0]])
+                self._last_served[key] = text
+                self.hits += 1
+                return text
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, text: str, now: Optional[float] = None):
+        """새로 생성된 변형 추가 (풀이 가득 차면 가장 오래된 변형 교체)"""
+        now = time.time() if now is None else now
+        pool = self._entries.get(key)
+        if pool is None:
+            pool = self._entries[key] = []
+        else:
+            self._entries.move_to_end(key)
+        if any(t == text for t, _ in pool):
+            return
+        pool.append((text, now))
+        if len(pool) > self.pool_size:
+            del pool[0]
+        while len(self._entries) > self.max_keys:
+            old_key, _ = self._entries.popitem(last=False)
+            self._last_served.pop(old_key, None)
+
+    def metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "keys": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# 워커 전역 캐시
+response_cache = ResponseCache()
@@ -99,6 +99,24 @@ def apply_temporal_smoothing(current_box, current_cls, vision_state):
     smoothed_box = [float(ema_box[0]), float(ema_box[1]), float(ema_box[2]), float(ema_box[3]), float(conf), float(consensus_cls)]
     return smoothed_box, consensus_cls
 
+# [Session Resume] 재접속 시 추적 상태(Anti-Flickering) 복원용
+TRACKING_KEYS = ("last_pet_box", "missing_count", "is_tracking", "history_boxes", "history_classes")
+
+def export_tracking_state(vision_state: dict) -> list:
+    """vision_state의 추적 정보를 JSON 직렬화 가능한 리스트로 추출합니다."""
+    ema_box = vision_state.get("ema_box")
+    values = [vision_state.get(k) for k in TRACKING_KEYS]
+    values.append(ema_box.tolist() if ema_box is not None else None)
+    return values
+
+def restore_tracking_state(vision_state: dict, data: list):
+    """export_tracking_state()로 추출한 추적 정보를 vision_state에 되돌립니다."""
+    *values, ema_box = data
+    for key, value in zip(TRACKING_KEYS, values):
+        if value is not None:
+            vision_state[key] = value
+    vision_state["ema_box"] = np.array(ema_box) if ema_box is not None else None
+
 def process_frame(
     image_bytes,  # [Modified] bytes or np.ndarray 
     mode: str = "playing", 
@@ -1,11 +1,15 @@
 # backend/app/api/v1/battle.py
 import uuid
 from app.db.database import get_db
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.user import User
+from app.db.models.character import Character
 from app.core.security import get_current_user_id
 from app.api.v1.chat import manager as chat_manager
 from app.services import friend_service, user_service
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.game import battle_replay, battle_rating
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 router = APIRouter()
 
@@ -59,3 +63,83 @@ async def invite_friend(
         "status": "success",
         "room_id": room_id
     }
+
+# --- 리플레이 엔드포인트 ---
+@router.get("/replays/{room_id}")
+async def get_battle_replay(
+    room_id: str,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    턴 로그(시드 + 선택)로 전투를 다시 계산해 턴별 이벤트를 반환합니다.
+    종료된 대전만 조회할 수 있습니다. (진행 중인 대전은 시드 노출을 막기 위해 404)
+    verified가 False면 desync_turns의 턴에서 기록된 결과와 재계산 결과가 다릅니다.
+    """
+    replay = await battle_replay.load_replay(db, room_id)
+    if replay is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="리플레이를 찾을 수 없습니다.")
+    return replay
+
+# --- 레이팅 / 리더보드 엔드포인트 ---
+async def attach_profiles(db: AsyncSession, entries: list) -> list:
+    """리더보드 항목에 닉네임/펫 정보 추가 (페이지에 나온 유저만 조회)"""
+    ids = [e["user_id"] for e in entries]
+    if not ids:
+        return entries
+    res = await db.execute(
+        select(User.id, User.nickname, Character.pet_type, Character.face_url)
+        .outerjoin(Character, Character.user_id == User.id)
+        .where(User.id.in_(ids))
+    )
+    profiles = {row.id: row for row in res.all()}
+    for e in entries:
+        p = profiles.get(e["user_id"])
+        e["nickname"] = p.nickname if p else None
+        e["pet_type"] = p.pet_type if p else None
+        e["face_url"] = p.face_url if p else None
+    return entries
+
+def resolve_board(board: str) -> str:
+    key = battle_rating.board_key(board)
+    if key is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="board는 global 또는 pet:{펫 종류}입니다.")
+    return key
+
+@router.get("/rating/me")
+async def get_my_rating(current_user_id: int = Depends(get_current_user_id)):
+    """내 레이팅, 전체/펫 순위, 전적"""
+    return await battle_rating.my_rating(current_user_id)
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    board: str = "global",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """리더보드 페이지 (board: global 또는 pet:{펫 종류})"""
+    entries = await battle_rating.top(resolve_board(board), offset, limit)
+    return {"board": board, "offset": offset, "entries": await attach_profiles(db, entries)}
+
+@router.get("/leaderboard/around-me")
+async def get_leaderboard_around_me(
+    board: str = "global",
+    radius: int = Query(5, ge=1, le=50),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """내 순위 앞뒤 radius명 (아직 대전 기록이 없으면 빈 목록)"""
+    entries = await battle_rating.around(resolve_board(board), current_user_id, radius)
+    return {"board": board, "entries": await attach_profiles(db, entries)}
+
+@router.get("/leaderboard/friends")
+async def get_friends_leaderboard(
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """나와 친구들의 레이팅 순위"""
+    friend_ids = await friend_service.get_friend_ids(db, current_user_id)
+    entries = await battle_rating.friends(current_user_id, friend_ids)
+    return {"board": "friends", "entries": await attach_profiles(db, entries)}
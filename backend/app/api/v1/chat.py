@@ -1,11 +1,13 @@
 # backend/app/api/v1/chat.py
-import json
+import os
 import asyncio
-from typing import Dict
+from typing import Dict, Optional
 from app.db.database import get_db
 from app.services import user_service
 from app.db.models.chat_data import ChatMessage
 from app.db.database_redis import RedisManager
+from app.db.redis_pubsub import hub as pubsub_hub
+from app.core.serialization import send_json, encode_text, loads
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import and_, or_, update
 from sqlalchemy.future import select
@@ -24,17 +26,48 @@ async def get_chat_status():
         "active_connections": len(manager.active_connections)
     }
     
+# 채팅 알림은 워커마다 Pub/Sub 연결 1개(PubSubHub)로 user_notify_* 패턴을 구독하고,
+# 이 워커에 접속한 유저의 소켓으로만 전달합니다. (유저마다 구독 연결을 만들지 않음)
+NOTIFY_CHANNEL_PREFIX = "user_notify_"
+CHAT_SEND_TIMEOUT = float(os.getenv("CHAT_SEND_TIMEOUT", "5"))  # 느린 소켓이 전달을 오래 붙잡지 않도록
+
 class ChatManager:
     def __init__(self):
         self.active_connections: Dict[int, dict] = {}
-        self.notification_tasks: Dict[int, asyncio.Task] = {}
+
+    async def _deliver(self, user_id: int, encoded: str) -> bool:
+        """이 워커에 연결된 소켓에만 전송 (성공 여부 반환)"""
+        conn = self.active_connections.get(user_id)
+        if not conn:
+            return False
+        try:
+            await asyncio.wait_for(conn["socket"].send_text(encoded), CHAT_SEND_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def notify(self, user_id: int, payload: dict) -> bool:
+        """
+        특정 유저에게 알림 전송 (같은 워커면 바로, 아니면 Pub/Sub)
+        접속 중이 아니면 발행하지 않고 False
+        """
+        encoded = encode_text(payload)
+        if await self._deliver(user_id, encoded):
+            return True
+        if not await RedisManager.is_user_online(user_id):
+            return False
+        await pubsub_hub.publish(f"{NOTIFY_CHANNEL_PREFIX}{user_id}", user_id, encoded)
+        return True
+
+    async def on_notify_event(self, channel: str, target: str, payload: str):
+        """다른 워커가 발행한 알림을 이 워커의 소켓에 전달"""
+        await self._deliver(int(target), payload)
 
     async def send_personal_message(self, payload: dict, user_id: int):
-        """특정 유저에게 알림을 전송, 전송 성공 여부 반환"""
-        # RedisManager.publish_chat_notification이 리스너 수를 반환한다고 가정
-        receiver_count = await RedisManager.publish_chat_notification(user_id, payload)
-        print(f"[SIGNAL] 유저 {user_id}에게 {payload['type']} 전송됨. (수신자 수: {receiver_count})")
-        return receiver_count > 0
+        """특정 유저에게 알림을 전송, 전송 성공 여부 반환 (온라인 여부 기준)"""
+        delivered = await self.notify(user_id, payload)
+        print(f"[SIGNAL] 유저 {user_id}에게 {payload['type']} 전송됨. (온라인: {delivered})")
+        return delivered
 
     async def connect(self, user_id: int, nickname: str, websocket: WebSocket):
         await websocket.accept()
@@ -44,8 +77,10 @@ class ChatManager:
         }
         print(f"[CHAT] {nickname}({user_id}) 연결됨.")
 
-    async def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
+    async def disconnect(self, user_id: int, websocket: Optional[WebSocket] = None):
+        conn = self.active_connections.get(user_id)
+        # 같은 유저가 새 소켓으로 다시 접속했다면 이전 소켓의 종료는 무시
+        if conn and (websocket is None or conn["socket"] is websocket):
             del self.active_connections[user_id]
             await RedisManager.set_user_offline(user_id)
         
@@ -55,29 +90,9 @@ class ChatManager:
                 "online": False
             })
             print(f"[CHAT] 유저 {user_id} 연결 끊김.")
-            
-        # [Fix] 연결 끊김 시 리스너 태스크도 확실하게 정리
-        await self.cancel_notification_task(user_id)
-
-    async def register_notification_task(self, user_id: int, task: asyncio.Task):
-        # 기존에 돌고 있는 태스크가 있다면 취소 (좀비 방지)
-        await self.cancel_notification_task(user_id)
-        self.notification_tasks[user_id] = task
-        print(f"[CHAT] 유저 {user_id}의 새 알림 리스너 등록됨.")
-
-    async def cancel_notification_task(self, user_id: int):
-        task = self.notification_tasks.pop(user_id, None) 
-        if task:
-            if not task.done():
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
-            print(f"[CHAT] 유저 {user_id}의 알림 리스너가 안전하게 제거되었습니다.")
 
     async def broadcast(self, payload: dict):
-        message = json.dumps(payload, ensure_ascii=False)
+        message = encode_text(payload)
         for uid in list(self.active_connections.keys()):
             try:
                 await self.active_connections[uid]["socket"].send_text(message)
@@ -89,6 +104,7 @@ class ChatManager:
         return user_info["nickname"] if user_info else f"User_{user_id}"
 
 manager = ChatManager()
+pubsub_hub.register(f"{NOTIFY_CHANNEL_PREFIX}*", manager.on_notify_event)
 
 @router.websocket("/ws/chat/{user_id}")
 async def chat_endpoint(websocket: WebSocket, user_id: int, db: AsyncSession = Depends(get_db)):
@@ -102,10 +118,10 @@ async def chat_endpoint(websocket: WebSocket, user_id: int, db: AsyncSession = D
     for uid in list(manager.active_connections.keys()):
         online_members.append(uid)
     
-    await websocket.send_text(json.dumps({
+    await send_json(websocket, {
         "type": "INITIAL_ONLINE_LIST",
         "user_ids": online_members
-    }))
+    })
 
     await manager.broadcast({
         "type": "USER_STATUS",
@@ -113,16 +129,10 @@ async def chat_endpoint(websocket: WebSocket, user_id: int, db: AsyncSession = D
         "online": True
     })
 
-    # [Fix] 리스너 태스크를 매니저에 등록하여 관리 (중복 실행 방지)
-    # 기존: 그냥 create_task 하고 끝 -> 좀비 발생 가능
-    # 변경: Register -> 기존꺼 취소 -> 새로 등록
-    notification_task = asyncio.create_task(listen_to_notifications(websocket, user_id))
-    await manager.register_notification_task(user_id, notification_task)
-
     try:
         while True:
             data = await websocket.receive_text()
-            message_json = json.loads(data)
+            message_json = loads(data)
             receiver_id = int(message_json.get("to_user_id"))
             content = message_json.get("message")
 
@@ -143,33 +153,15 @@ async def chat_endpoint(websocket: WebSocket, user_id: int, db: AsyncSession = D
                 "created_at": new_msg.created_at.isoformat()
             }
 
-            await RedisManager.publish_chat_notification(receiver_id, notification_payload)
+            await manager.notify(receiver_id, notification_payload)
             
     except WebSocketDisconnect:
         print(f"[CHAT] 유저 {user_id} 연결 종료")
     except Exception as e:
         print(f"[CHAT] 에러 발생: {e}")
     finally:
-        await RedisManager.set_user_offline(user_id)
-        await manager.disconnect(user_id)
-        # manager.disconnect 내부에서 task cancel을 호출하므로 여기선 생략 가능하지만 명시적으로 둠
-        # notification_task.cancel()        
-
-async def listen_to_notifications(websocket: WebSocket, user_id: int):
-    """Redis에서 나에게 온 알림이 있는지 계속 듣고 있다가 소켓으로 쏴주는 역할"""
-    redis_client = RedisManager.get_client()
-    pubsub = redis_client.pubsub()
-    await pubsub.subscribe(f"user_notify_{user_id}")
-    
-    try:
-        async for message in pubsub.listen():
-            if message['type'] == 'message':
-                # Redis 채널에 메시지가 뜨면 즉시 웹소켓으로 전송
-                await websocket.send_text(message['data'])
-    except Exception as e:
-        print(f"Notification Error: {e}")
-    finally:
-        await pubsub.unsubscribe(f"user_notify_{user_id}")
+        # 알림 수신은 워커 공용 구독이 담당하므로 정리할 리스너 없음
+        await manager.disconnect(user_id, websocket)
 
 @router.get("/history/{other_user_id}", tags=["chat"])
 async def get_chat_history(
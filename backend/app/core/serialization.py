@@ -0,0 +1,49 @@
+# backend/app/core/serialization.py
+"""
+프로젝트 공용 JSON 직렬화 모듈 (orjson 기반)
+웹소켓 전송, Redis 저장에 사용하는 인코딩/디코딩을 한 곳에서 관리합니다.
+(REST 응답은 FastAPI 내장 fastapi.responses.ORJSONResponse가 같은 옵션으로 직렬화)
+
+- NumPy 배열/스칼라(float32, int64 등)를 별도 float() 캐스팅 없이 바로 직렬화합니다.
+- dict의 int 키(예: user_id)를 표준 json 모듈처럼 문자열 키로 변환합니다.
+- 브로드캐스트는 encode_text()로 한 번만 인코딩한 뒤 모든 수신자에게 같은 문자열을 보냅니다.
+"""
+from typing import Any
+
+import orjson
+from fastapi import WebSocket
+
+# NumPy 직렬화 + int 키 허용 (json.dumps 동작과 호환)
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any):
+    """orjson이 기본 지원하지 않는 타입 처리 (set, tuple 서브클래스 등)"""
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "item"):  # 기타 NumPy 스칼라 계열
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """객체를 UTF-8 JSON 바이트로 인코딩합니다."""
+    return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+
+
+def encode_text(obj: Any) -> str:
+    """웹소켓 텍스트 프레임/Redis 문자열용 JSON 문자열을 반환합니다."""
+    return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode("utf-8")
+
+
+def loads(data: str | bytes | bytearray | memoryview) -> Any:
+    """JSON 문자열 또는 바이트를 파이썬 객체로 디코딩합니다."""
+    return orjson.loads(data)
+
+
+async def send_json(websocket: WebSocket, payload: Any):
+    """
+    websocket.send_json() 대체 헬퍼.
+    클라이언트(Flutter)는 텍스트 프레임을 기대하므로 텍스트로 전송합니다.
+    """
+    await websocket.send_text(encode_text(payload))
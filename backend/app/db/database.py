@@ -37,7 +37,7 @@ async def init_db():
     서버 시작 시 테이블을 생성하고 최신화된 모델 필드에 맞춰 테스트 데이터를 시딩합니다.
     """
     # Base.metadata 등록을 위해 모델 임포트
-    from app.db.models import user, character, friendship, diary, chat_data, guestbook
+    from app.db.models import user, character, friendship, diary, chat_data, guestbook, battle_replay, battle_rating
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
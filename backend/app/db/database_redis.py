@@ -1,6 +1,5 @@
 # backend/app/db/database_redis.py
 import os
-import json
 import redis.asyncio as redis
 from dotenv import load_dotenv
 
@@ -42,14 +41,3 @@ class RedisManager:
     async def is_user_online(cls, user_id: int) -> bool:
         client = cls.get_client()
         return await client.sismember(cls.ONLINE_USERS_KEY, user_id)
-
-    @classmethod
-    async def publish_chat_notification(cls, receiver_id: int, payload: dict):
-        client = cls.get_client()
-        try:
-            message = json.dumps(payload, ensure_ascii=False)
-            # return을 추가하여 구독자 수(int)를 반환하도록 합니다.
-            return await client.publish(f"user_notify_{receiver_id}", message)
-        finally:
-            # 클라이언트 연결을 명시적으로 닫기 (연결 풀 반환)
-            await client.aclose()
\ No newline at end of file
@@ -3,3 +3,5 @@ from app.db.models.character import Character
 from app.db.models.friendship import Friendship
 from app.db.models.guestbook import GuestbookEntry
 from app.db.models.notice import Notice
+from app.db.models.battle_replay import BattleReplay
+from app.db.models.battle_rating import BattleRating
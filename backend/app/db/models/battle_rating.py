@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from sqlalchemy import Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.database import Base
+
+def get_utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# --- 배틀 레이팅(BattleRating) 모델 ---
+# 대전 중 레이팅은 Redis 리더보드(rating:global 등)에서 갱신되고, 주기적으로 이 테이블에 저장됩니다.
+# Redis가 비어 있으면 서버 시작 시 이 테이블에서 리더보드를 다시 채웁니다.
+class BattleRating(Base):
+    __tablename__ = "battle_ratings"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), unique=True, index=True) # 유저당 캐릭터 하나
+    pet_type: Mapped[str] = mapped_column(String(32), default="dog")
+    rating: Mapped[float] = mapped_column(Float, default=1000.0)
+    wins: Mapped[int] = mapped_column(Integer, default=0)
+    losses: Mapped[int] = mapped_column(Integer, default=0)
+    draws: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=get_utc_now, onupdate=get_utc_now)
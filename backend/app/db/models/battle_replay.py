@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import Integer, String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import JSONB
+from app.db.database import Base
+
+def get_utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# --- 배틀 리플레이(BattleReplay) 모델 ---
+# 대전 종료 시 Redis 턴 로그 스트림(room:{id}:log)을 옮겨 저장합니다.
+# 시드와 선택만으로 전투를 다시 계산할 수 있으므로 이벤트 로그는 저장하지 않습니다.
+class BattleReplay(Base):
+    __tablename__ = "battle_replays"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    room_id: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    seed: Mapped[str] = mapped_column(String(32))
+    player1_id: Mapped[int] = mapped_column(Integer, index=True) # AI 봇은 0 (users FK 없음)
+    player2_id: Mapped[int] = mapped_column(Integer, index=True)
+    winner_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # 무승부면 None
+    result: Mapped[str] = mapped_column(String(16)) # ko, draw, forfeit
+    turn_count: Mapped[int] = mapped_column(Integer, default=0)
+    log: Mapped[dict] = mapped_column(JSONB) # {"start": 초기 정보, "turns": [턴 항목, ...]}
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=get_utc_now)
@@ -0,0 +1,110 @@
+# backend/app/db/redis_pubsub.py
+"""
+워커 단위 Redis Pub/Sub 허브
+uvicorn 워커(또는 노드)마다 Pub/Sub 연결 1개로 필요한 채널 패턴을 한 번만 구독하고,
+수신한 메시지를 패턴별 핸들러로 분배합니다. (소켓마다 구독 연결을 만들지 않음)
+
+메시지 형식 (envelope): "origin|target|payload"
+- origin  : 발행한 워커 ID (자기 자신이 보낸 메시지는 이미 로컬로 전달했으므로 무시)
+- target  : 수신 대상 (예: 유저 ID, 전체는 '*')
+- payload : 이미 인코딩된 JSON 문자열 (수신 측은 다시 인코딩하지 않고 그대로 전송)
+
+핸들러는 수신 루프 밖의 태스크에서 실행합니다. 같은 채널의 메시지는 순서대로 처리하고,
+느린 소켓이 있는 채널은 그 채널만 밀리며 다른 채널(배틀/매칭/알림)은 막지 않습니다.
+"""
+import uuid
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+from app.db.database_redis import RedisManager
+
+BROADCAST = "*"
+
+# handler(channel, target, payload)
+Handler = Callable[[str, str, str], Awaitable[None]]
+
+
+class PubSubHub:
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._handlers: Dict[str, Handler] = {}
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+        self._tails: Dict[str, asyncio.Task] = {}  # 채널별 마지막 처리 태스크 (순서 보장용)
+
+    def register(self, pattern: str, handler: Handler):
+        """채널 패턴(예: 'battle_room:*')과 핸들러 등록 (start 이후 등록 시 즉시 구독)"""
+        self._handlers[pattern] = handler
+        if self._pubsub is not None:
+            asyncio.create_task(self._pubsub.psubscribe(pattern))
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._pubsub = RedisManager.get_client().pubsub(ignore_subscribe_messages=True)
+        if self._handlers:
+            await self._pubsub.psubscribe(*self._handlers.keys())
+        self._task = asyncio.create_task(self._listen())
+        print(f"[PubSub] Worker {self.worker_id} subscribed: {list(self._handlers.keys())}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in self._tails.values():
+            task.cancel()
+        self._tails.clear()
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+
+    async def publish(self, channel: str, target, payload: str) -> int:
+        """encoded payload 발행 (수신 워커 수 반환)"""
+        client = RedisManager.get_client()
+        return await client.publish(channel, f"{self.worker_id}|{target}|{payload}")
+
+    def _dispatch(self, handler: Handler, channel: str, target: str, payload: str):
+        """같은 채널의 앞선 처리가 끝난 뒤 실행되도록 태스크를 이어 붙임"""
+        task = asyncio.create_task(self._run(self._tails.get(channel), handler, channel, target, payload))
+        self._tails[channel] = task
+
+        def _done(t: asyncio.Task):
+            if self._tails.get(channel) is t:
+                del self._tails[channel]
+        task.add_done_callback(_done)
+
+    async def _run(self, prev: Optional[asyncio.Task], handler: Handler, channel: str, target: str, payload: str):
+        if prev is not None:
+            await asyncio.wait((prev,))
+        try:
+            await handler(channel, target, payload)
+        except Exception as e:
+            print(f"[PubSub] Handler Error ({channel}): {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                # 구독 채널이 아직 없으면 get_message가 바로 반환되므로 대기
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.5)
+                    continue
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get("type") != "pmessage":
+                    continue
+                origin, target, payload = message["data"].split("|", 2)
+                if origin == self.worker_id:
+                    continue
+                handler = self._handlers.get(message["pattern"])
+                if handler:
+                    self._dispatch(handler, message["channel"], target, payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[PubSub] Listen Error: {e}")
+                await asyncio.sleep(1.0)
+
+
+# 워커 전역 허브
+hub = PubSubHub()
@@ -0,0 +1,305 @@
+# backend/app/game/battle_ai.py
+"""
+AI 배틀 상대 (Expectimax 탐색)
+무작위 기술 선택 대신, 실제 전투 규칙(BattleCalculator/BattleManager)으로 몇 턴 앞을 내다보고 기술을 고릅니다.
+
+- 탐색: 봇 선택(max) -> 상대 선택(난이도별 모델) -> 확률 노드(선공 동률, 명중, 효과 발동)
+- 데미지는 기대값(치명타 확률 가중, 난수 평균)으로 계산해 분기 수를 줄입니다.
+- 시간 예산(AI_BOT_BUDGET_MS) 안에서 반복 심화하며, 예산을 넘기면 직전 깊이의 결과를 씁니다.
+- 전치 테이블: 같은 국면(양측 상태, 필드, 남은 깊이)의 값을 프로세스별 LRU에 캐시합니다.
+- 이벤트 루프를 막지 않도록 탐색은 별도 프로세스 풀에서 실행합니다.
+"""
+import os
+import time
+import random
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.game.battle_manager import BattleManager, BattleState, CombatStats
+from app.game.battle_calculator import BattleCalculator
+from app.game.battle_tables import moves_py
+from app.game.game_assets import PET_TYPE_MAP
+
+# --- 설정 ---
+AI_BOT_DIFFICULTY = os.getenv("AI_BOT_DIFFICULTY", "normal")
+AI_BOT_BUDGET_MS = float(os.getenv("AI_BOT_BUDGET_MS", "50"))  # 기술 5개 대 5개 기준 깊이 2에 약 30~40ms
+AI_BOT_WORKERS = int(os.getenv("AI_BOT_WORKERS", "2"))  # 0이면 스레드에서 실행
+TT_MAX_ENTRIES = int(os.getenv("AI_BOT_TT_SIZE", "50000"))
+
+# 난이도별 탐색 설정
+# - random_rate: 탐색 없이 무작위로 고를 확률
+# - max_depth: 최대 탐색 턴 수
+# - caution: 상대 모델 (0 = 상대가 무작위로 고른다고 가정한 평균, 1 = 최악의 응수)
+DIFFICULTY = {
+    "easy":   {"random_rate": 0.4, "max_depth": 1, "caution": 0.0},
+    "normal": {"random_rate": 0.0, "max_depth": 2, "caution": 0.0},
+    "hard":   {"random_rate": 0.0, "max_depth": 3, "caution": 0.5},
+}
+
+WIN_SCORE = 1000.0
+HP_WEIGHT = 100.0     # HP 비율 차이 1.0 = 100점
+STAGE_WEIGHT = 2.0    # 랭크 1단계
+AILMENT_WEIGHT = 8.0  # 상태 이상 1개
+
+_tt: "OrderedDict[tuple, float]" = OrderedDict()
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _Side:
+    """탐색 중 변하지 않는 한쪽 정보"""
+    __slots__ = ("stats", "skills", "element")
+
+    def __init__(self, stats: CombatStats, skills: List[int], pet_type: str):
+        self.stats = stats
+        self.skills = tuple(skills) or (1,)
+        self.element = PET_TYPE_MAP.get(pet_type, "normal")
+
+
+# 국면: (봇 상태, 상대 상태, 필드) / 분기: (확률, 국면)
+# 국면의 상태 객체는 여러 분기가 공유하므로 직접 수정하지 않고, 바뀌는 쪽만 복사합니다.
+Node = Tuple[BattleState, BattleState, dict]
+
+
+class Searcher:
+    """한 번의 기술 선택을 위한 Expectimax 탐색기"""
+
+    def __init__(self, bot: _Side, opp: _Side, difficulty: str = "normal", budget_ms: float = AI_BOT_BUDGET_MS):
+        self.sides = (bot, opp)
+        self.profile = DIFFICULTY.get(difficulty, DIFFICULTY["normal"])
+        self.budget = budget_ms / 1000
+        self.deadline = float("inf")
+        self.moves = moves_py()
+        self._strikes: Dict[tuple, Tuple[float, float]] = {}
+        # 전치 테이블 키에 대진 정보(스탯/기술/속성/난이도)를 포함
+        self.context = (
+            tuple((s.stats.strength, s.stats.defense, s.stats.agility, s.stats.intelligence, s.stats.luck,
+                   s.skills, s.element) for s in self.sides),
+            self.profile["caution"],
+        )
+
+    # --- 진입점 ---
+    def choose(self, bot_state: BattleState, opp_state: BattleState, field: dict) -> int:
+        skills = self.sides[0].skills
+        if len(skills) == 1:
+            return skills[0]
+        if random.random() < self.profile["random_rate"]:
+            return random.choice(skills)
+
+        # 반복 심화: 깊이 1은 항상 끝까지, 이후 깊이는 예산 초과 시 중단
+        best = random.choice(skills)
+        start = time.perf_counter()
+        for depth in range(1, self.profile["max_depth"] + 1):
+            self.deadline = start + self.budget if depth > 1 else float("inf")
+            try:
+                scores = {m: self.q_value(bot_state, opp_state, field, m, depth) for m in skills}
+            except _Timeout:
+                break
+            top = max(scores.values())
+            best = random.choice([m for m, v in scores.items() if v >= top - 1e-9])
+        return best
+
+    # --- 탐색 ---
+    def value(self, bot_state: BattleState, opp_state: BattleState, field: dict, depth: int) -> float:
+        """봇 차례 국면의 값 (max 노드)"""
+        bot_alive, opp_alive = bot_state.current_hp > 0, opp_state.current_hp > 0
+        if not (bot_alive and opp_alive):
+            if bot_alive: return WIN_SCORE + depth  # 빨리 이길수록 우대
+            if opp_alive: return -WIN_SCORE - depth
+            return 0.0
+        if depth == 0:
+            return self.evaluate(bot_state, opp_state)
+
+        key = (self.context, bot_state.key(), opp_state.key(),
+               field.get("weather"), field.get("location"), depth)
+        cached = _tt.get(key)
+        if cached is not None:
+            _tt.move_to_end(key)
+            return cached
+
+        if time.perf_counter() > self.deadline:
+            raise _Timeout()
+
+        result = max(self.q_value(bot_state, opp_state, field, m, depth) for m in self.sides[0].skills)
+
+        _tt[key] = result
+        if len(_tt) > TT_MAX_ENTRIES:
+            _tt.popitem(last=False)
+        return result
+
+    def q_value(self, bot_state: BattleState, opp_state: BattleState, field: dict, bot_move: int, depth: int) -> float:
+        """봇이 bot_move를 골랐을 때의 값 (상대 선택은 난이도별 모델로 결합)"""
+        replies = []
+        for opp_move in self.sides[1].skills:
+            total = 0.0
+            for p, (b, o, f) in self.resolve_turn(bot_state, opp_state, field, bot_move, opp_move):
+                total += p * self.value(b, o, f, depth - 1)
+            replies.append(total)
+        avg = sum(replies) / len(replies)
+        caution = self.profile["caution"]
+        return caution * min(replies) + (1 - caution) * avg
+
+    # --- 턴 진행 (process_turn_redis와 같은 순서, 확률 분기) ---
+    def resolve_turn(self, bot_state: BattleState, opp_state: BattleState, field: dict,
+                     bot_move: int, opp_move: int) -> List[Tuple[float, Node]]:
+        bot, opp = self.sides
+        moves = (bot_move, opp_move)
+        first = BattleCalculator.first_mover(bot.stats, bot_state, bot_move, opp.stats, opp_state, opp_move)
+        orders = [(1.0, first - 1)] if first else [(0.5, 0), (0.5, 1)]
+
+        leaves = []
+        for p_order, a_first in orders:
+            branches = [(p_order, (bot_state, opp_state, field))]
+            for a in (a_first, 1 - a_first):
+                stepped = []
+                for p, node in branches:
+                    # 먼저 맞은 쪽이 쓰러졌으면 반격 없음
+                    if node[a].current_hp <= 0:
+                        stepped.append((p, node))
+                    else:
+                        stepped.extend(self._act(p, node, a, moves[a]))
+                branches = stepped
+            leaves.extend((p, self._end_of_turn(node)) for p, node in branches)
+        return leaves
+
+    def _act(self, p: float, node: Node, a: int, move_id: int) -> List[Tuple[float, Node]]:
+        """a(0=봇, 1=상대)가 move_id를 사용: 빗나감 / 명중(효과 미발동) / 명중(효과 발동)"""
+        d = 1 - a
+        moves = self.moves
+
+        p_hit, dmg = self._strike(node, a, move_id)
+
+        out = []
+        if p_hit < 1:
+            out.append((p * (1 - p_hit), node))
+        if p_hit <= 0:
+            return out
+
+        # 국면은 공유하므로 바뀌는 쪽만 복사 (copy-on-write)
+        hit = list(node)
+        hit[d] = node[d].copy()
+        hit[d].current_hp = max(0.0, round(hit[d].current_hp - dmg, 1))
+
+        effects = moves.effects.get(move_id) if moves.has(move_id) else None
+        p_eff = min(1.0, moves.effect_chance[move_id] / 100) if effects else 0.0
+        if p_eff <= 0 or hit[d].current_hp <= 0:
+            out.append((p * p_hit, hit))
+            return out
+
+        if p_eff < 1:
+            out.append((p * p_hit * (1 - p_eff), hit))
+        triggered = [hit[0].copy(), hit[1].copy(), hit[2]]
+        logs = BattleManager.apply_effects(effects, triggered[a], triggered[d], "", "")
+        for log in logs:
+            if log.get("type") == "field_update":
+                triggered[2] = {**triggered[2], log.get("field"): log.get("value")}
+        out.append((p * p_hit * p_eff, triggered))
+        return out
+
+    def _strike(self, node: Node, a: int, move_id: int) -> Tuple[float, float]:
+        """(명중 확률, 명중 시 기대 데미지), 같은 국면이 여러 분기에서 반복되므로 캐시"""
+        d = 1 - a
+        field = node[2]
+        key = (a, move_id, node[a].key(), node[d].key(), field.get("weather"), field.get("location"))
+        cached = self._strikes.get(key)
+        if cached is not None:
+            return cached
+
+        att, dfn = self.sides[a], self.sides[d]
+        if self.moves.has(move_id) and self.moves.auto_hit[move_id]:
+            p_hit = 1.0
+        else:
+            p_hit = BattleCalculator.hit_chance(att.stats, node[a], dfn.stats, node[d], move_id) / 100
+        dmg = BattleCalculator.expected_damage(att.stats, node[a], dfn.stats, node[d], move_id,
+                                               defender_type=dfn.element, field_data=field)
+        self._strikes[key] = result = (p_hit, dmg)
+        return result
+
+    def _end_of_turn(self, node: Node) -> Node:
+        node = list(node)
+        for s in (0, 1):
+            state = node[s]
+            # 상태 이상/휘발성 상태가 없으면 변화 없음
+            if state.current_hp <= 0 or not (state.status_ailment or state.volatile):
+                continue
+            state = node[s] = state.copy()
+            dmg, _, _ = BattleManager.process_status_effects(self.sides[s].stats, state)
+            if dmg > 0:
+                state.current_hp = max(0.0, state.current_hp - dmg)
+        return node
+
+    # --- 평가 ---
+    @staticmethod
+    def evaluate(bot_state: BattleState, opp_state: BattleState) -> float:
+        """HP 비율 차이 + 랭크 합 차이 - 상태 이상"""
+        score = HP_WEIGHT * (bot_state.current_hp / bot_state.max_hp - opp_state.current_hp / opp_state.max_hp)
+        score += STAGE_WEIGHT * (bot_state.stage_total() - opp_state.stage_total())
+        if bot_state.status_ailment: score -= AILMENT_WEIGHT
+        if opp_state.status_ailment: score += AILMENT_WEIGHT
+        return score
+
+
+def _side_from_room(room_data: dict, uid: str) -> _Side:
+    return _Side(
+        CombatStats.from_dict(room_data["character_stats"][uid]),
+        room_data["learned_skills"].get(uid) or [1],
+        room_data["pet_types"].get(uid, "normal"),
+    )
+
+
+def choose_move(room_data: dict, bot_id: int, difficulty: str = AI_BOT_DIFFICULTY,
+                budget_ms: float = AI_BOT_BUDGET_MS) -> int:
+    """
+    동기 진입점 (워커 프로세스에서 실행)
+    room_data: battle_room_store.load_room 결과 (봇과 상대의 스탯/상태/기술/필드)
+    """
+    bot_uid = str(bot_id)
+    opp_uid = next(str(p) for p in room_data["players"] if str(p) != bot_uid)
+    searcher = Searcher(_side_from_room(room_data, bot_uid), _side_from_room(room_data, opp_uid),
+                        difficulty, budget_ms)
+    states = room_data["battle_states"]
+    return searcher.choose(states[bot_uid], states[opp_uid], dict(room_data.get("field_effects") or {}))
+
+
+# --- 프로세스 풀 ---
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # fork는 이벤트 루프/Redis 연결을 복제하므로 spawn 사용
+        _pool = ProcessPoolExecutor(max_workers=AI_BOT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        print(f"[BattleAI] Process pool started ({AI_BOT_WORKERS} workers, {AI_BOT_DIFFICULTY}, {AI_BOT_BUDGET_MS}ms)")
+    return _pool
+
+
+async def choose_bot_move(room_data: dict, bot_id: int, difficulty: str = AI_BOT_DIFFICULTY) -> int:
+    """
+    AI 봇의 기술 선택 (비동기)
+    탐색이 실패하거나 지연되면 무작위 기술로 대체하여 턴 진행을 막지 않습니다.
+    """
+    skills = room_data.get("learned_skills", {}).get(str(bot_id)) or [1]
+    payload = {k: room_data[k] for k in
+               ("players", "character_stats", "learned_skills", "pet_types", "battle_states", "field_effects")}
+    loop = asyncio.get_running_loop()
+    try:
+        executor = _get_pool() if AI_BOT_WORKERS > 0 else None
+        job = loop.run_in_executor(executor, choose_move, payload, bot_id, difficulty, AI_BOT_BUDGET_MS)
+        # 깊이 1은 예산과 무관하게 끝까지 돌기 때문에 넉넉한 상한을 둠
+        return await asyncio.wait_for(job, timeout=1.0 + AI_BOT_BUDGET_MS / 100)
+    except Exception as e:
+        print(f"[BattleAI] Search failed, fallback to random: {e!r}")
+        return random.choice(skills)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
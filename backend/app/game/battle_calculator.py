@@ -1,6 +1,9 @@
 # backend/app/game/battle_calculator.py
 import random
-from app.game.game_assets import MOVE_DATA
+from app.game.battle_tables import (
+    moves_py, TYPE_ID, TYPE_MATRIX_PY, FIELD_MULT_PY, CRIT_BONUS_PY, field_ids,
+    PHYSICAL, SPECIAL, STATUS
+)
 
 class BattleCalculator:
     """
@@ -18,38 +21,40 @@ class BattleCalculator:
     5. 랜덤 난수(Random): 0.85 ~ 1.0 사이의 값 곱연산
     6. 속성 상성(Type): 효과가 좋음(2.0), 보통(1.0), 별로(0.5), 무효(0.0)
     7. 필드 보정(Field): 날씨(Weather), 장소(Location)에 따른 타입 위력 보정
+
+    기술/상성/필드 수치는 app.game.battle_tables에서 미리 컴파일한 테이블을 사용합니다.
     """
 
     @staticmethod
-    def calculate_damage(attacker_stat, attacker_state, defender_stat, defender_state, move_id: int, defender_type: str = None, field_data: dict = None):
+    def damage_factors(attacker_stat, attacker_state, defender_stat, defender_state, move_id: int, defender_type: str = None, field_data: dict = None):
         """
-        [Logic: 데미지 계산]
-        위의 공식 가이드에 따라 최종 데미지를 산출합니다.
-        Return: (final_damage, is_critical, effectiveness_string)
+        [Logic: 난수 이전 데미지 요소]
+        공식 가이드 1~3, 6~7단계와 치명타 확률 (치명타/난수 판정 전까지)
+        Return: (damage, crit_chance, type_multiplier, field_multiplier), 데미지가 없는 기술이면 None
         """
-        move = MOVE_DATA.get(move_id)
-        if not move: return 0, False, "normal"
+        moves = moves_py()
+        if not moves.has(move_id): return None
 
-        power = move["power"]
-        if power == 0: return 0, False, "normal"
+        power = moves.power[move_id]
+        if power == 0: return None
 
         # 1. 스탯 & 랭크 반영 (Physical/Special Split)
-        move_category = move.get("category", "physical")
+        move_category = moves.category[move_id]
         
         # Determine Stats based on Category
-        if move_category == "special":
+        if move_category == SPECIAL:
             # Special: Intelligence vs Intelligence (Sp.Def)
             atk_val = attacker_stat.intelligence * attacker_state.get_stage_multiplier("intelligence")
             def_val = defender_stat.intelligence * defender_state.get_stage_multiplier("intelligence") 
-        elif move_category == "status":
-            return 0, False, "normal"
+        elif move_category == STATUS:
+            return None
         else:
             # Physical (Default): Strength vs Defense
             atk_val = attacker_stat.strength * attacker_state.get_stage_multiplier("strength")
             def_val = defender_stat.defense * defender_state.get_stage_multiplier("defense")
 
         # 화상 상태일 경우 (Physical Only) 공격력 반감
-        if move_category == "physical" and attacker_state.status_ailment == "burn":
+        if move_category == PHYSICAL and attacker_state.status_ailment == "burn":
             atk_val *= 0.5
             
         if def_val < 1: def_val = 1
@@ -58,8 +63,7 @@ class BattleCalculator:
         damage = (atk_val / def_val) * power * 0.5 + 2
 
         # 2.1 [New] HP Scaling Logic (e.g. 본능 각성)
-        scaling = move.get("scaling")
-        if scaling == "hp_loss":
+        if moves.hp_scaling[move_id]:
             # HP가 낮을수록 데미지 증가 (최소 1.0 ~ 최대 2.0)
             hp_pct = attacker_state.current_hp / attacker_state.max_hp
             scale_multiplier = 1.0 + (1.0 - hp_pct) # 100%->1.0, 0%->2.0
@@ -68,65 +72,50 @@ class BattleCalculator:
         # 3. 크리티컬 (Luck + Crit Stage 기반)
         base_crit = 5.0 + (attacker_stat.luck * 0.5)
         
-        crit_stage = attacker_state.stages.get("crit_rate", 0)
-        crit_bonus = 0.0
-        if crit_stage == 1: crit_bonus = 12.5
-        elif crit_stage == 2: crit_bonus = 50.0
-        elif crit_stage >= 3: crit_bonus = 100.0
+        crit_stage = attacker_state.get_stage("crit_rate")
+        crit_bonus = CRIT_BONUS_PY[min(max(crit_stage, 0), 3)]
         
         crit_chance = base_crit + crit_bonus
         if crit_chance > 100: crit_chance = 100
         
-        is_critical = random.uniform(0, 100) < crit_chance
+        # [New] 속성 상성 및 면역(Immunity) - 상성 행렬 조회
+        move_type = moves.type[move_id]
+        type_multiplier = 1.0
+        if defender_type:
+            def_id = TYPE_ID.get(defender_type)
+            if def_id is not None:
+                type_multiplier = TYPE_MATRIX_PY[move_type][def_id]
+        
+        # [New] Field/Weather Modifiers - (날씨, 장소)별 배율 벡터 조회
+        field_multiplier = 1.0
+        if field_data:
+            weather_id, location_id = field_ids(field_data)
+            field_multiplier = FIELD_MULT_PY[weather_id][location_id][move_type]
+
+        return damage, crit_chance, type_multiplier, field_multiplier
+
+    @staticmethod
+    def calculate_damage(attacker_stat, attacker_state, defender_stat, defender_state, move_id: int, defender_type: str = None, field_data: dict = None, rng=random):
+        """
+        [Logic: 데미지 계산]
+        위의 공식 가이드에 따라 최종 데미지를 산출합니다.
+        rng: 난수 스트림 (기본은 전역 random, 재현이 필요하면 방별 random.Random)
+        Return: (final_damage, is_critical, effectiveness_string)
+        """
+        factors = BattleCalculator.damage_factors(attacker_stat, attacker_state, defender_stat, defender_state, move_id, defender_type, field_data)
+        if factors is None: return 0, False, "normal"
+        damage, crit_chance, type_multiplier, field_multiplier = factors
+
+        is_critical = rng.uniform(0, 100) < crit_chance
         crit_multiplier = 1.5 if is_critical else 1.0
 
         
         # 4. 자속 보정 (STAB - Same Type Attack Bonus)
-        # 공격자의 타입과 기술의 타입이 같으면 1.5배 데미지
-        stab_multiplier = 1.0
-        # Pet Type vs Move Type matching logic needed. 
-        # For now, simplistic check if attacker_stat has type info? No, it's in Character object.
-        # But here we only have Stat object. 
-        # To strictly implement STAB, we need attacker's type passed in.
-        # Current signature: (attacker_stat, attacker_state, defender_stat, defender_state, move_id, defender_type, field_data)
-        # We don't have attacker_type. We can default to 1.0 or try to infer.
-        # Let's clean up the comment first.
+        # 공격자 타입 정보가 시그니처에 없어 아직 1.0 (시뮬레이터도 동일)
         
         # 5. 랜덤 변수 (0.85 ~ 1.0)
-        random_factor = random.uniform(0.85, 1.0)
+        random_factor = rng.uniform(0.85, 1.0)
 
-        # [New] 속성 상성 및 면역(Immunity)
-        from app.game.game_assets import TYPE_CHART, FIELD_EFECTS
-        type_multiplier = 1.0
-        move_type = move.get("type", "normal")
-        
-        if defender_type:
-            chart = TYPE_CHART.get(move_type, {})
-            weak_list = chart.get("weak", [])
-            resist_list = chart.get("resist", [])
-            immune_list = chart.get("immune", [])
-            
-            if defender_type in immune_list:
-                type_multiplier = 0.0 # [Deep Logic] Immunity
-            elif defender_type in weak_list:
-                type_multiplier = 2.0
-            elif defender_type in resist_list:
-                type_multiplier = 0.5
-        
-        # [New] Field/Weather Modifiers
-        field_multiplier = 1.0
-        if field_data:
-            weather = field_data.get("weather", "clear")
-            location = field_data.get("location", "stadium")
-            
-            w_chart = FIELD_EFECTS["weather"].get(weather, {})
-            if move_type in w_chart:
-                field_multiplier *= w_chart[move_type] # e.g. Rain -> Water * 1.5
-            
-            l_chart = FIELD_EFECTS["location"].get(location, {})
-            if move_type in l_chart:
-                 field_multiplier *= l_chart[move_type] # e.g. Cave -> Rock * 1.2
-        
         final_damage = int(damage * crit_multiplier * type_multiplier * random_factor * field_multiplier)
         if final_damage < 1 and type_multiplier > 0: final_damage = 1
         if type_multiplier == 0: final_damage = 0 # Ensure 0 if immune
@@ -141,19 +130,42 @@ class BattleCalculator:
         return final_damage, is_critical, effectiveness
 
     @staticmethod
-    def check_hit(attacker_stat, attacker_state, defender_stat, defender_state, move_id: int) -> bool:
+    def expected_damage(attacker_stat, attacker_state, defender_stat, defender_state, move_id: int, defender_type: str = None, field_data: dict = None) -> float:
+        """
+        [Logic: 기대 데미지] AI 탐색용 (명중했을 때)
+        치명타는 확률 가중(1 + 0.5p), 난수는 평균(0.925)으로 대체합니다.
+        """
+        factors = BattleCalculator.damage_factors(attacker_stat, attacker_state, defender_stat, defender_state, move_id, defender_type, field_data)
+        if factors is None: return 0.0
+        damage, crit_chance, type_multiplier, field_multiplier = factors
+        if type_multiplier == 0: return 0.0
+        expected = damage * (1.0 + 0.5 * crit_chance / 100) * type_multiplier * 0.925 * field_multiplier
+        return max(1.0, expected)
+
+    @staticmethod
+    def check_hit(attacker_stat, attacker_state, defender_stat, defender_state, move_id: int, rng=random) -> bool:
         """
         명중 여부 판정: Accuracy * (Atk Agility / Def Agility) * Stage Modifiers
         """
-        move = MOVE_DATA.get(move_id)
-        if not move: return False
+        moves = moves_py()
+        if not moves.has(move_id): return False
+        if moves.accuracy[move_id] >= 1000: return True # 필중
+
+        hit_chance = BattleCalculator.hit_chance(attacker_stat, attacker_state, defender_stat, defender_state, move_id)
+        return rng.uniform(0, 100) <= hit_chance
+
+    @staticmethod
+    def hit_chance(attacker_stat, attacker_state, defender_stat, defender_state, move_id: int) -> float:
+        """명중 확률 (0 ~ 100, 필중 기술은 100)"""
+        moves = moves_py()
+        if not moves.has(move_id): return 0.0
             
-        accuracy = move.get("accuracy", 100)
-        if accuracy >= 1000: return True # 필중
+        accuracy = moves.accuracy[move_id]
+        if accuracy >= 1000: return 100.0 # 필중
 
         # [New] Stage Logic (Accuracy vs Evasion)
-        atk_acc_stage = attacker_state.stages.get("accuracy", 0)
-        def_eva_stage = defender_state.stages.get("evasion", 0)
+        atk_acc_stage = attacker_state.get_stage("accuracy")
+        def_eva_stage = defender_state.get_stage("evasion")
         
         # Combine stages: (Attacker Acc - Defender Eva)
         # Standard table: -6 to +6 maps to multipliers
@@ -185,18 +197,24 @@ class BattleCalculator:
         if hit_chance < 20: hit_chance = 20
         if hit_chance > 100: hit_chance = 100
         
-        return random.uniform(0, 100) <= hit_chance
+        return hit_chance
 
     @staticmethod
-    def determine_turn_order(stat1, state1, move1_id: int, stat2, state2, move2_id: int) -> int:
+    def determine_turn_order(stat1, state1, move1_id: int, stat2, state2, move2_id: int, rng=random) -> int:
         """
-        선공 결정: 1. 우선도 -> 2. Agility
+        선공 결정: 1. 우선도 -> 2. Agility -> 3. 동률이면 무작위
         """
-        move1 = MOVE_DATA.get(move1_id, {})
-        move2 = MOVE_DATA.get(move2_id, {})
-        
-        prio1 = move1.get("priority", 0)
-        prio2 = move2.get("priority", 0)
+        first = BattleCalculator.first_mover(stat1, state1, move1_id, stat2, state2, move2_id)
+        return first if first else rng.choice([1, 2])
+
+    @staticmethod
+    def first_mover(stat1, state1, move1_id: int, stat2, state2, move2_id: int) -> int:
+        """
+        난수 없는 선공 판정: 1 또는 2, 완전 동률이면 0
+        """
+        moves = moves_py()
+        prio1 = moves.priority[move1_id] if moves.has(move1_id) else 0
+        prio2 = moves.priority[move2_id] if moves.has(move2_id) else 0
         
         if prio1 > prio2: return 1
         if prio2 > prio1: return 2
@@ -211,4 +229,4 @@ class BattleCalculator:
 
         if agi1 > agi2: return 1
         elif agi2 > agi1: return 2
-        else: return random.choice([1, 2])
\ No newline at end of file
+        else: return 0
\ No newline at end of file
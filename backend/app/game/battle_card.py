@@ -0,0 +1,126 @@
+# backend/app/game/battle_card.py
+"""
+배틀 카드 캐시 (Redis)
+캐릭터의 정적인 배틀 정보(펫, 기술 상세, 이미지 URL)를 미리 만들어 두고,
+BATTLE_START / 관전 스냅샷에서는 카드에 현재 HP/PP만 덧붙입니다. (매 시작마다 MOVE_DATA로 다시 조립하지 않음)
+
+battle_card:{user_id} (String, JSON)
+    - 레벨업/스킬 해금/캐릭터 생성 시 갱신, 이미지 변경 시 삭제
+    - 캐시가 없거나 기술 목록이 방에 기록된 것과 다르면 방 데이터로 다시 만들어 채움
+AI 봇 카드는 고정값이라 모듈 로딩 시 한 번만 만듭니다.
+"""
+import os
+from typing import Dict, Iterable, Optional
+from app.db.database_redis import RedisManager
+from app.core.serialization import encode_text, loads
+from app.game.game_assets import MOVE_DATA
+from app.game.battle_manager import BattleState
+from app.game.battle_room_store import AI_BOT_ID, AI_BOT_PET, AI_BOT_SKILLS
+
+CARD_TTL = int(os.getenv("BATTLE_CARD_TTL", str(7 * 24 * 3600)))  # 초
+
+
+def card_key(user_id) -> str:
+    return f"battle_card:{user_id}"
+
+
+def build_card(user_id: int, pet_type: str, skills: Iterable[int], images: Optional[dict]) -> dict:
+    """정적 배틀 카드 (I/O 없음)"""
+    details = []
+    for sid in skills:
+        md = MOVE_DATA.get(sid)
+        if md:
+            details.append({
+                "id": sid, "name": md["name"], "type": md["type"],
+                "power": md["power"], "desc": md["description"],
+                "max_pp": md.get("max_pp", 20),
+            })
+    # 이미지 데이터 (None일 경우 빈 문자열 처리 - 프론트 크래시 방지)
+    images = images or {}
+    return {
+        "id": int(user_id),
+        "name": f"User {user_id}",
+        "pet_type": pet_type or "dog",
+        "skills": details,
+        "front_url": images.get("front") or "",
+        "back_url": images.get("back") or "",
+        "side_url": images.get("side") or "",
+        "face_url": images.get("face") or "",
+    }
+
+
+def character_card(character) -> dict:
+    return build_card(character.user_id, character.pet_type, character.learned_skills or [1], {
+        "front": character.front_url,
+        "back": character.back_url,
+        "side": character.side_url,
+        "face": character.face_url,
+    })
+
+
+def with_state(card: dict, state: Optional[BattleState]) -> dict:
+    """카드에 현재 HP/PP를 덧붙인 플레이어 정보 (상태가 없으면 기본값 100)"""
+    pp = state.pp if state else {}
+    return {
+        **card,
+        "hp": state.current_hp if state else 100,
+        "max_hp": state.max_hp if state else 100,
+        "skills": [{**s, "pp": pp.get(str(s["id"]), s["max_pp"])} for s in card["skills"]],
+    }
+
+
+AI_BOT_CARD = build_card(AI_BOT_ID, AI_BOT_PET, AI_BOT_SKILLS, None)
+
+
+async def refresh_card(character) -> Optional[dict]:
+    """레벨업 등으로 기술/펫이 바뀐 뒤 카드 갱신 (실패해도 게임 진행에는 영향 없음)"""
+    card = character_card(character)
+    try:
+        await RedisManager.get_client().set(card_key(character.user_id), encode_text(card), ex=CARD_TTL)
+        return card
+    except Exception as e:
+        print(f"[BattleCard] Refresh failed for user {character.user_id}: {e}")
+        return None
+
+
+async def invalidate_card(user_id: int):
+    try:
+        await RedisManager.get_client().delete(card_key(user_id))
+    except Exception as e:
+        print(f"[BattleCard] Invalidate failed for user {user_id}: {e}")
+
+
+def _known_skills(skills: Iterable[int]) -> list:
+    return [sid for sid in skills if sid in MOVE_DATA]
+
+
+async def get_cards(room_data: dict) -> Dict[str, dict]:
+    """방 플레이어들의 카드 (1회 왕복, 없는 카드는 방 데이터로 만들어 캐시)"""
+    uids = [str(p) for p in room_data["players"]]
+    cards: Dict[str, dict] = {}
+    humans = [uid for uid in uids if int(uid) != AI_BOT_ID]
+    if humans:
+        client = RedisManager.get_client()
+        for uid, raw in zip(humans, await client.mget([card_key(uid) for uid in humans])):
+            if raw:
+                card = loads(raw)
+                if [s["id"] for s in card["skills"]] == _known_skills(room_data["learned_skills"].get(uid, [1])):
+                    cards[uid] = card
+
+    missing = {}
+    for uid in uids:
+        if uid in cards:
+            continue
+        if int(uid) == AI_BOT_ID:
+            cards[uid] = AI_BOT_CARD
+            continue
+        cards[uid] = build_card(uid, room_data["pet_types"].get(uid, "dog"),
+                                room_data["learned_skills"].get(uid, [1]), room_data["image_urls"].get(uid))
+        missing[card_key(uid)] = encode_text(cards[uid])
+
+    if missing:
+        async with RedisManager.get_client().pipeline(transaction=False) as pipe:
+            for key, value in missing.items():
+                pipe.set(key, value, ex=CARD_TTL)
+            await pipe.execute()
+    return cards
@@ -1,32 +1,109 @@
 # backend/app/game/battle_manager.py
+import base64
 import random
+import struct
+from array import array
 from typing import List, Dict, Any, Optional
 from abc import ABC, abstractmethod
-from app.game.game_assets import MOVE_DATA, STAT_STAGES, STATUS_DATA
+from app.core.serialization import loads
+from app.game.game_assets import MOVE_DATA, STATUS_DATA, PET_TYPE_MAP
+from app.game.battle_tables import STAGE_KEYS, STAGE_INDEX, STAGE_MULT_PY, AILMENTS, AILMENT_ID
 from app.game.battle_calculator import BattleCalculator
 
+class CombatStats:
+    """
+    전투 계산에 쓰는 캐릭터 스탯 (방 데이터의 stats dict에서 생성)
+    매 턴 동적 클래스(StatObj)를 만들지 않도록 __slots__ 고정 클래스를 사용합니다.
+    """
+    __slots__ = ("strength", "defense", "agility", "intelligence", "luck", "health")
+
+    def __init__(self, strength=10, defense=10, agility=10, intelligence=10, luck=10, health=100):
+        self.strength = strength
+        self.defense = defense
+        self.agility = agility
+        self.intelligence = intelligence
+        self.luck = luck
+        self.health = health
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CombatStats':
+        return cls(
+            data.get("strength", 10), data.get("defense", 10), data.get("agility", 10),
+            data.get("intelligence", 10), data.get("luck", 10), data.get("health", 100)
+        )
+
+
+def turn_rng(seed: str, turn: int) -> random.Random:
+    """
+    방 시드와 턴 번호로 만든 턴별 난수 스트림
+    턴마다 새로 만들기 때문에 어느 워커가 처리하든, 리플레이에서 다시 돌리든 같은 난수가 나옵니다.
+    """
+    return random.Random(f"{seed}:{turn}")
+
+
+# BattleState 바이너리 인코딩 (v1, little-endian)
+# 헤더: version, max_hp, current_hp, stages[7], ailment, status_turns, volatile 수, pp 수
+# 이어서 volatile (상태 ID B, 남은 턴 h) * n, pp (기술 ID H, 남은 PP H) * n
+# Redis 해시는 문자열(decode_responses)로 다루므로 base64 텍스트로 저장합니다.
+STATE_VERSION = 1
+_STATE_HEADER = struct.Struct("<BII7bBhBB")
+_VOLATILE_ENTRY = struct.Struct("<Bh")
+_PP_ENTRY = struct.Struct("<HH")
+
+
 class BattleState:
     """
     전투 중 일시적으로 유지되는 상태 (스탯 변화, 상태 이상 등)
+    랭크는 고정 크기 배열(STAGE_KEYS 순서)에 저장합니다.
     """
+    __slots__ = ("max_hp", "current_hp", "_stages", "status_ailment", "status_turns", "volatile", "pp")
+
     def __init__(self, max_hp: int = 100, current_hp: int = 100):
         self.max_hp = max_hp
         self.current_hp = current_hp
-        self.stages = {
-            "strength": 0, "defense": 0, "agility": 0, "intelligence": 0,
-            "accuracy": 0, "evasion": 0, "crit_rate": 0
-        }
+        self._stages = array("b", bytes(len(STAGE_KEYS)))
         self.status_ailment = None # poison, paralysis, burn
         self.status_turns = 0 
         self.volatile = {} # {"flinch": 0, "protect": 0, "confusion": 3}
         self.pp = {} 
 
+    def get_stage(self, stat_name) -> int:
+        return self._stages[STAGE_INDEX[stat_name]]
+
+    def set_stage(self, stat_name, value: int):
+        self._stages[STAGE_INDEX[stat_name]] = value
+
+    def stage_total(self) -> int:
+        """모든 랭크의 합 (AI 평가용)"""
+        return sum(self._stages)
+
     def get_stage_multiplier(self, stat_name):
-        stage = self.stages.get(stat_name, 0)
-        return STAT_STAGES.get(stage, 1.0)
-    
+        return STAGE_MULT_PY[self._stages[STAGE_INDEX[stat_name]] + 6]
+
+    def copy(self) -> 'BattleState':
+        """독립 사본 (AI 탐색 분기용)"""
+        bs = BattleState.__new__(BattleState)
+        bs.max_hp = self.max_hp
+        bs.current_hp = self.current_hp
+        bs._stages = array("b", self._stages)
+        bs.status_ailment = self.status_ailment
+        bs.status_turns = self.status_turns
+        bs.volatile = dict(self.volatile)
+        bs.pp = dict(self.pp)
+        return bs
+
+    def key(self) -> tuple:
+        """전투 결과에 영향을 주는 값만 모은 해시 키 (AI 전치 테이블용, PP 제외)"""
+        return (self.current_hp, self._stages.tobytes(), self.status_ailment, self.status_turns,
+                tuple(sorted(self.volatile.items())))
+
+    @property
+    def stages(self) -> Dict[str, int]:
+        """랭크 dict 사본 (로그/직렬화용, 수정은 set_stage)"""
+        return dict(zip(STAGE_KEYS, self._stages))
+
     def to_dict(self) -> Dict[str, Any]:
-        """Redis 저장을 위한 직렬화"""
+        """클라이언트 전송/디버그용 dict"""
         return {
             "max_hp": self.max_hp,
             "current_hp": self.current_hp,
@@ -39,28 +116,67 @@ class BattleState:
 
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> 'BattleState':
-        """Redis 데이터로부터 상태 복원"""
+        """dict(구버전 JSON 저장 형식)로부터 상태 복원"""
         bs = BattleState(max_hp=data.get("max_hp", 100), current_hp=data.get("current_hp", 100))
-        bs.stages = data.get("stages", bs.stages)
+        for k, v in (data.get("stages") or {}).items():
+            if k in STAGE_INDEX:
+                bs.set_stage(k, v)
         bs.status_ailment = data.get("status_ailment")
         bs.status_turns = data.get("status_turns", 0)
         bs.volatile = data.get("volatile", {})
         bs.pp = data.get("pp", {})
         return bs
 
+    def encode(self) -> str:
+        """Redis 저장용 바이너리 인코딩 (base64 텍스트)"""
+        buf = bytearray(_STATE_HEADER.pack(
+            STATE_VERSION, self.max_hp, self.current_hp, *self._stages,
+            AILMENT_ID.get(self.status_ailment, 0), self.status_turns, len(self.volatile), len(self.pp)
+        ))
+        for name, turns in self.volatile.items():
+            buf += _VOLATILE_ENTRY.pack(AILMENT_ID[name], turns)
+        for move_id, left in self.pp.items():
+            buf += _PP_ENTRY.pack(int(move_id), left)
+        return base64.b64encode(buf).decode("ascii")
+
+    @staticmethod
+    def decode(text: str) -> 'BattleState':
+        """encode() 결과 또는 구버전 JSON 문자열로부터 상태 복원"""
+        if text.startswith("{"):
+            return BattleState.from_dict(loads(text))
+        raw = base64.b64decode(text)
+        if raw[0] != STATE_VERSION:
+            raise ValueError(f"Unknown BattleState version: {raw[0]}")
+        values = _STATE_HEADER.unpack_from(raw)
+        bs = BattleState(max_hp=values[1], current_hp=values[2])
+        bs._stages = array("b", values[3:10])
+        bs.status_ailment = AILMENTS[values[10]]
+        bs.status_turns, n_volatile, n_pp = values[11:14]
+        offset = _STATE_HEADER.size
+        for _ in range(n_volatile):
+            sid, turns = _VOLATILE_ENTRY.unpack_from(raw, offset)
+            bs.volatile[AILMENTS[sid]] = turns
+            offset += _VOLATILE_ENTRY.size
+        for _ in range(n_pp):
+            move_id, left = _PP_ENTRY.unpack_from(raw, offset)
+            bs.pp[str(move_id)] = left
+            offset += _PP_ENTRY.size
+        return bs
+
 # --- [Strategy Pattern Interfaces] ---
 class EffectStrategy(ABC):
     @abstractmethod
     def apply(self, effect: dict, attacker_state: BattleState, defender_state: BattleState, 
-              attacker_name: str, defender_name: str) -> Optional[dict]:
+              attacker_name: str, defender_name: str, rng=random) -> Optional[dict]:
         """
         효과를 적용하고 로그(dict)를 반환합니다. 효과가 없으면 None.
+        rng: 난수가 필요한 효과(지속 턴 등)에 사용할 스트림
         """
         pass
 
 # --- [Concrete Strategies] ---
 class StatChangeStrategy(EffectStrategy):
-    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name):
+    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name, rng=random):
         stat_name = effect["stat"]
         val = effect["value"]
         target = effect["target"]
@@ -68,7 +184,7 @@ class StatChangeStrategy(EffectStrategy):
         target_state = attacker_state if target == "self" else defender_state
         target_name = attacker_name if target == "self" else defender_name
         
-        current_stage = target_state.stages.get(stat_name, 0)
+        current_stage = target_state.get_stage(stat_name)
         limit_max = 3 if stat_name == "crit_rate" else 6
         limit_min = 0 if stat_name == "crit_rate" else -6
         
@@ -83,7 +199,7 @@ class StatChangeStrategy(EffectStrategy):
             
         new_stage = max(limit_min, min(limit_max, current_stage + val))
         if new_stage != current_stage:
-            target_state.stages[stat_name] = new_stage
+            target_state.set_stage(stat_name, new_stage)
             val_str = "크게 " if abs(val) > 1 else ""
             direction = "올라갔습니다" if val > 0 else "떨어졌습니다"
             
@@ -97,7 +213,7 @@ class StatChangeStrategy(EffectStrategy):
         return None
 
 class StatusStrategy(EffectStrategy):
-    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name):
+    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name, rng=random):
         status = effect["status"]
         target = effect["target"]
         target_state = attacker_state if target == "self" else defender_state
@@ -108,7 +224,7 @@ class StatusStrategy(EffectStrategy):
             # 상태 이상 지속 시간 설정
             min_turn = s_data.get("min_turn", 2)
             max_turn = s_data.get("max_turn", 5)
-            target_state.status_turns = random.randint(min_turn, max_turn)
+            target_state.status_turns = rng.randint(min_turn, max_turn)
             
             status_name = s_data.get("name", status)
             return {
@@ -120,7 +236,7 @@ class StatusStrategy(EffectStrategy):
         return None
 
 class HealStrategy(EffectStrategy):
-    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name):
+    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name, rng=random):
         amount_pct = effect.get("amount", effect.get("value", 50))
         target = effect["target"]
         target_state = attacker_state if target == "self" else defender_state
@@ -143,7 +259,7 @@ class HealStrategy(EffectStrategy):
         return None
 
 class FieldStrategy(EffectStrategy):
-    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name):
+    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name, rng=random):
         field_name = effect.get("field", "weather")
         val = effect.get("value", "clear")
         
@@ -163,7 +279,7 @@ class FieldStrategy(EffectStrategy):
         }
 
 class RecoilStrategy(EffectStrategy):
-    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name):
+    def apply(self, effect, attacker_state, defender_state, attacker_name, defender_name, rng=random):
         pct = effect.get("value", 25)
         target = effect["target"]
         target_state = attacker_state if target == "self" else defender_state
@@ -198,12 +314,12 @@ class BattleManager:
     }
 
     @staticmethod
-    def calculate_damage(attacker_stat, attacker_state, defender_stat, defender_state, move_id, defender_type=None, field_data=None):
-        return BattleCalculator.calculate_damage(attacker_stat, attacker_state, defender_stat, defender_state, move_id, defender_type, field_data)
+    def calculate_damage(attacker_stat, attacker_state, defender_stat, defender_state, move_id, defender_type=None, field_data=None, rng=random):
+        return BattleCalculator.calculate_damage(attacker_stat, attacker_state, defender_stat, defender_state, move_id, defender_type, field_data, rng)
 
     @classmethod
     def apply_move_effects(cls, move_id, attacker_state: BattleState, defender_state: BattleState, attacker_stat, 
-                           attacker_name: str, defender_name: str) -> List[Dict]:
+                           attacker_name: str, defender_name: str, rng=random) -> List[Dict]:
         """
         Strategy Pattern을 사용하여 스킬 효과를 적용합니다.
         이제 거대한 if-else 문 대신 각 전략 객체가 로직을 수행합니다.
@@ -211,7 +327,6 @@ class BattleManager:
         move = MOVE_DATA.get(move_id)
         if not move: return []
 
-        logs = []
         raw_effects = move.get("effect")
         chance = move.get("effect_chance", 0)
         
@@ -225,15 +340,24 @@ class BattleManager:
         if not effects_list: return []
         
         # 확률 체크 (전체 효과에 대해 한 번 체크)
-        if random.uniform(0, 100) > chance:
+        if rng.uniform(0, 100) > chance:
             return []
 
+        return cls.apply_effects(effects_list, attacker_state, defender_state, attacker_name, defender_name, rng)
+
+    @classmethod
+    def apply_effects(cls, effects_list: List[dict], attacker_state: BattleState, defender_state: BattleState,
+                      attacker_name: str, defender_name: str, rng=random) -> List[Dict]:
+        """
+        확률 판정 없이 효과 목록을 적용합니다. (AI 탐색이 발동 분기를 직접 나눌 때 사용)
+        """
+        logs = []
         for effect in effects_list:
             etype = effect.get("type", "")
             strategy = cls._strategies.get(etype)
             
             if strategy:
-                log = strategy.apply(effect, attacker_state, defender_state, attacker_name, defender_name)
+                log = strategy.apply(effect, attacker_state, defender_state, attacker_name, defender_name, rng)
                 if log:
                     logs.append(log)
             else:
@@ -243,12 +367,105 @@ class BattleManager:
 
     @staticmethod
     def determine_turn_order(stat1, state1, move1_id: int, 
-                             stat2, state2, move2_id: int):
+                             stat2, state2, move2_id: int, rng=random):
         """
         선공 결정 위임
         """
-        return BattleCalculator.determine_turn_order(stat1, state1, move1_id, stat2, state2, move2_id)
-    
+        return BattleCalculator.determine_turn_order(stat1, state1, move1_id, stat2, state2, move2_id, rng)
+
+    @classmethod
+    def resolve_turn(cls, players: List[int], stats: Dict[str, CombatStats], states: Dict[str, BattleState],
+                     pet_types: Dict[str, str], selections: Dict[str, int], field_effects: dict,
+                     rng=random) -> List[Dict]:
+        """
+        한 턴을 처리합니다. (선공 결정 -> 공격/효과 -> 턴 종료 상태 이상)
+        I/O 없이 states와 field_effects만 변경하므로, 같은 입력과 같은 시드의 rng면 항상 같은 결과가 나옵니다.
+        실제 대전(process_turn_redis), 리플레이 재구성, 검증 스크립트가 함께 사용합니다.
+        Return: 턴 로그 리스트 (TURN_RESULT의 results)
+        """
+        u1, u2 = players[0], players[1]
+        su1, su2 = str(u1), str(u2)
+        move1, move2 = selections[su1], selections[su2]
+
+        first = cls.determine_turn_order(stats[su1], states[su1], move1, stats[su2], states[su2], move2, rng)
+        order = [(u1, u2), (u2, u1)] if first == 1 else [(u2, u1), (u1, u2)]
+
+        turn_logs = []
+        for att_id, def_id in order:
+            s_att_id, s_def_id = str(att_id), str(def_id)
+            att_stat, def_stat = stats[s_att_id], stats[s_def_id]
+            att_state, def_state = states[s_att_id], states[s_def_id]
+            move_id = selections[s_att_id]
+
+            # 애니메이션 트리거
+            md = MOVE_DATA.get(move_id, {})
+            turn_logs.append({
+                "type": "turn_event",
+                "event_type": "attack_start",
+                "attacker": att_id,
+                "defender": def_id,
+                "move_id": move_id,
+                "move_type": md.get("type", "normal")
+            })
+
+            eff = md.get("effect", {})
+            if isinstance(eff, dict) and eff.get("target") == "self": is_hit = True
+            elif md.get("type") in ["heal", "buff"]: is_hit = True
+            else:
+                is_hit = BattleCalculator.check_hit(att_stat, att_state, def_stat, def_state, move_id, rng)
+
+            if not is_hit:
+                turn_logs.append({
+                    "type": "turn_event",
+                    "event_type": "hit_result",
+                    "result": "miss",
+                    "attacker": att_id,
+                    "defender": def_id,
+                    "message": "공격이 빗나갔습니다!"
+                })
+            else:
+                def_elem = PET_TYPE_MAP.get(pet_types[s_def_id], "normal")
+                dmg, is_crit, eff_type = cls.calculate_damage(
+                    att_stat, att_state, def_stat, def_state, move_id,
+                    defender_type=def_elem, field_data=field_effects, rng=rng
+                )
+                def_state.current_hp = max(0, def_state.current_hp - dmg)
+
+                turn_logs.append({
+                    "type": "turn_event", "event_type": "hit_result", "result": "hit",
+                    "attacker": att_id, "defender": def_id,
+                    "damage": dmg, "defender_hp": def_state.current_hp, "is_critical": is_crit,
+                    "message": f"{dmg} 피해!"
+                })
+
+                # Effects
+                if def_state.current_hp > 0:
+                    elog = cls.apply_move_effects(move_id, att_state, def_state, att_stat,
+                                                  f"User {att_id}", f"User {def_id}", rng)
+                    for l in elog:
+                        l["attacker"] = att_id
+                        l["defender"] = def_id
+                        if l.get("type") == "field_update":
+                            field_effects[l.get("field")] = l.get("value")
+                        turn_logs.append(l)
+
+            if def_state.current_hp <= 0: break
+
+        # 턴 종료 상태 이상 데미지
+        for uid in (u1, u2):
+            stat, state = stats[str(uid)], states[str(uid)]
+            if state.current_hp <= 0: continue
+
+            dmg, msg, detail = cls.process_status_effects(stat, state)
+            if dmg > 0:
+                state.current_hp = max(0, state.current_hp - dmg)
+
+            if detail:
+                detail["target"] = uid
+                turn_logs.append(detail)
+
+        return turn_logs
+
     @staticmethod
     def process_status_effects(stat, state: BattleState):
         """
@@ -335,7 +552,7 @@ class BattleManager:
         return damage, msg, detail
 
     @staticmethod
-    def can_move(state: BattleState):
+    def can_move(state: BattleState, rng=random):
         """
         상태 이상으로 인한 행동 불가 체크
         Return: (can_move: bool, message: str, self_damage: int)
@@ -347,7 +564,7 @@ class BattleManager:
         # [Fix] 혼란 (Confusion) - Check Volatile First
         if "confusion" in state.volatile:
             # 33% 확률로 자해
-            if random.random() < 0.33:
+            if rng.random() < 0.33:
                 # 자해 데미지 계산 (최대 체력의 10% 정도?)
                 self_damage = int(state.max_hp * 0.1)
                 if self_damage < 1: self_damage = 1
@@ -359,13 +576,13 @@ class BattleManager:
 
         # 마비 (Paralysis) 체크
         if state.status_ailment == "paralysis":
-            if random.random() < 0.25:
+            if rng.random() < 0.25:
                 # 25% 확률로 행동 불가
                 return False, "몸이 저려서 움직일 수 없습니다!", 0
         
         # 공포 (Fear) 체크
         if state.status_ailment == "fear":
-            if random.random() < 0.50:
+            if rng.random() < 0.50:
                 # 50% 확률로 행동 불가
                 return False, "공포에 질려 움직일 수 없습니다!", 0
         
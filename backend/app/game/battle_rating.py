@@ -0,0 +1,281 @@
+# backend/app/game/battle_rating.py
+"""
+배틀 레이팅 (Elo) + Redis 리더보드
+대전 결과는 Lua 한 번으로 양측 레이팅/전적/리더보드를 원자적으로 갱신하고,
+DB(battle_ratings)에는 변경된 유저만 주기적으로 모아서 저장합니다. (대전마다 DB 쓰기 없음)
+
+rating:global      (ZSet) user_id -> 레이팅 (전체 리더보드)
+rating:pet:{type}  (ZSet) user_id -> 레이팅 (펫 종류별 리더보드)
+rating:pets        (Hash) user_id -> 리더보드에 올라간 펫 종류 (펫을 바꾸면 이전 보드에서 제거)
+rating:records     (Hash) {user_id}:w / :l / :d -> 승/패/무 횟수
+rating:dirty       (Set)  DB에 아직 저장하지 않은 user_id
+
+- 순위/페이지/내 주변 조회는 ZREVRANK + ZREVRANGE로 O(log n + 페이지 크기), 테이블 스캔 없음
+- 친구 리더보드는 친구 ID들의 점수만 ZMSCORE로 가져와 정렬 (임시 키 없음)
+- AI 대전은 레이팅에 반영하지 않습니다.
+"""
+import os
+import asyncio
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from app.db.database import AsyncSessionLocal
+from app.db.database_redis import RedisManager
+from app.db.models.battle_rating import BattleRating, get_utc_now
+from app.game.battle_room_store import room_key
+
+GLOBAL_KEY = "rating:global"
+PET_KEY_PREFIX = "rating:pet:"
+PETS_KEY = "rating:pets"
+RECORDS_KEY = "rating:records"
+DIRTY_KEY = "rating:dirty"
+WARM_LOCK_KEY = "rating:warm"
+
+DEFAULT_RATING = float(os.getenv("RATING_DEFAULT", "1000"))
+K_FACTOR = float(os.getenv("RATING_K", "32"))
+FLUSH_SEC = float(os.getenv("RATING_FLUSH_SEC", "30"))
+FLUSH_BATCH = 500
+WARM_BATCH = 1000
+
+# 양측 레이팅 갱신 (ARGV: a, b, a의 결과(1 승 / 0.5 무), K, 기본 레이팅, a 펫, b 펫, 펫 보드 접두사)
+# KEYS[5]는 방 해시: 방마다 rated를 한 번만 설정하므로 같은 대전이 두 번 반영되지 않음
+# 반환: {a 새 레이팅, b 새 레이팅} (문자열, 소수 1자리), 이미 반영했거나 방이 없으면 nil
+_RECORD_LUA = """
+local board, pets, records, dirty, room = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5]
+if redis.call('EXISTS', room) == 0 or redis.call('HSETNX', room, 'rated', '1') == 0 then
+    return false
+end
+local a, b, sa, k, default = ARGV[1], ARGV[2], tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local ra = tonumber(redis.call('ZSCORE', board, a) or default)
+local rb = tonumber(redis.call('ZSCORE', board, b) or default)
+local ea = 1 / (1 + 10 ^ ((rb - ra) / 400))
+local na = math.floor((ra + k * (sa - ea)) * 10 + 0.5) / 10
+local nb = math.floor((rb + k * ((1 - sa) - (1 - ea))) * 10 + 0.5) / 10
+local result = {}
+for i, uid in ipairs({a, b}) do
+    local rating = (i == 1) and na or nb
+    local pet = ARGV[5 + i]
+    local old = redis.call('HGET', pets, uid)
+    if old and old ~= pet then
+        redis.call('ZREM', ARGV[8] .. old, uid)
+    end
+    redis.call('HSET', pets, uid, pet)
+    redis.call('ZADD', board, rating, uid)
+    redis.call('ZADD', ARGV[8] .. pet, rating, uid)
+    redis.call('SADD', dirty, uid)
+    result[i] = tostring(rating)
+end
+if sa == 0.5 then
+    redis.call('HINCRBY', records, a .. ':d', 1)
+    redis.call('HINCRBY', records, b .. ':d', 1)
+else
+    redis.call('HINCRBY', records, a .. ':w', 1)
+    redis.call('HINCRBY', records, b .. ':l', 1)
+end
+return result
+"""
+
+_scripts: Dict[str, object] = {}
+
+
+def _script(source: str):
+    if source not in _scripts:
+        _scripts[source] = RedisManager.get_client().register_script(source)
+    return _scripts[source]
+
+
+def board_key(board: str) -> Optional[str]:
+    """'global' 또는 'pet:{type}' -> Redis 키 (알 수 없으면 None)"""
+    if board == "global":
+        return GLOBAL_KEY
+    if board.startswith("pet:") and len(board) > 4:
+        return f"{PET_KEY_PREFIX}{board[4:].lower()}"
+    return None
+
+
+async def record_result(room_id: str, winner_id: int, loser_id: int, pet_types: Dict[str, str],
+                        draw: bool = False) -> Optional[dict]:
+    """
+    대전 결과를 레이팅에 반영합니다. (1회 왕복, 실패해도 보상 처리에는 영향 없음)
+    방마다 한 번만 반영되며, 이미 반영한 방이면 None.
+    Return: {user_id: 새 레이팅}
+    """
+    try:
+        a, b = int(winner_id), int(loser_id)
+        client = RedisManager.get_client()
+        result = await _script(_RECORD_LUA)(
+            keys=[GLOBAL_KEY, PETS_KEY, RECORDS_KEY, DIRTY_KEY, room_key(room_id)],
+            args=[a, b, 0.5 if draw else 1, K_FACTOR, DEFAULT_RATING,
+                  (pet_types.get(str(a)) or "dog").lower(), (pet_types.get(str(b)) or "dog").lower(), PET_KEY_PREFIX],
+            client=client
+        )
+        if not result:
+            print(f"[Rating] Room {room_id} already rated, skip")
+            return None
+        new_a, new_b = result
+        print(f"[Rating] {a} vs {b} ({'draw' if draw else 'win'}): {new_a} / {new_b}")
+        return {a: float(new_a), b: float(new_b)}
+    except Exception as e:
+        print(f"[Rating] Update failed for {winner_id} vs {loser_id}: {e}")
+        return None
+
+
+async def get_rating(user_id: int) -> float:
+    score = await RedisManager.get_client().zscore(GLOBAL_KEY, user_id)
+    return DEFAULT_RATING if score is None else float(score)
+
+
+async def my_rating(user_id: int) -> dict:
+    """내 레이팅, 전체/펫 순위(1부터, 기록 없으면 None), 전적"""
+    client = RedisManager.get_client()
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.zscore(GLOBAL_KEY, user_id)
+        pipe.zrevrank(GLOBAL_KEY, user_id)
+        pipe.hget(PETS_KEY, user_id)
+        pipe.hmget(RECORDS_KEY, f"{user_id}:w", f"{user_id}:l", f"{user_id}:d")
+        score, rank, pet, (w, l, d) = await pipe.execute()
+    pet_rank = await client.zrevrank(f"{PET_KEY_PREFIX}{pet}", user_id) if pet else None
+    return {
+        "user_id": user_id,
+        "rating": DEFAULT_RATING if score is None else float(score),
+        "rank": None if rank is None else rank + 1,
+        "pet_type": pet,
+        "pet_rank": None if pet_rank is None else pet_rank + 1,
+        "wins": int(w or 0), "losses": int(l or 0), "draws": int(d or 0),
+    }
+
+
+async def top(key: str, offset: int = 0, limit: int = 20) -> List[dict]:
+    """리더보드 페이지 (순위 = offset + 1부터)"""
+    rows = await RedisManager.get_client().zrevrange(key, offset, offset + limit - 1, withscores=True)
+    return [{"rank": offset + i + 1, "user_id": int(uid), "rating": score} for i, (uid, score) in enumerate(rows)]
+
+
+async def around(key: str, user_id: int, radius: int = 5) -> List[dict]:
+    """내 순위 앞뒤 radius명 (리더보드에 없으면 빈 리스트)"""
+    rank = await RedisManager.get_client().zrevrank(key, user_id)
+    if rank is None:
+        return []
+    start = max(0, rank - radius)
+    return await top(key, start, rank + radius - start + 1)
+
+
+async def friends(user_id: int, friend_ids: List[int]) -> List[dict]:
+    """나와 친구들의 순위 (기록이 없는 친구는 기본 레이팅)"""
+    ids = [user_id] + [f for f in friend_ids if f != user_id]
+    scores = await RedisManager.get_client().zmscore(GLOBAL_KEY, ids)
+    rows = sorted(
+        ((uid, DEFAULT_RATING if s is None else float(s)) for uid, s in zip(ids, scores)),
+        key=lambda r: (-r[1], r[0])
+    )
+    return [{"rank": i + 1, "user_id": uid, "rating": rating} for i, (uid, rating) in enumerate(rows)]
+
+
+# --- DB 저장 / 복구 ---
+async def flush_dirty(batch: int = FLUSH_BATCH) -> int:
+    """
+    변경된 유저의 레이팅/전적을 DB에 upsert (실패하면 다음 주기에 재시도)
+    rating:dirty에서 꺼낸 수를 반환합니다. (점수가 없어 저장하지 않은 id도 포함, 0이면 비었음)
+    """
+    client = RedisManager.get_client()
+    ids = await client.spop(DIRTY_KEY, batch)
+    if not ids:
+        return 0
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zmscore(GLOBAL_KEY, ids)
+            pipe.hmget(PETS_KEY, ids)
+            pipe.hmget(RECORDS_KEY, [f"{uid}:{c}" for uid in ids for c in "wld"])
+            scores, pets, records = await pipe.execute()
+
+        rows = []
+        for i, uid in enumerate(ids):
+            if scores[i] is None:
+                continue
+            w, l, d = records[i * 3:i * 3 + 3]
+            rows.append({
+                "user_id": int(uid), "pet_type": pets[i] or "dog", "rating": float(scores[i]),
+                "wins": int(w or 0), "losses": int(l or 0), "draws": int(d or 0),
+                "updated_at": get_utc_now(),
+            })
+        if rows:
+            stmt = insert(BattleRating).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[BattleRating.user_id],
+                set_={c: stmt.excluded[c] for c in ("pet_type", "rating", "wins", "losses", "draws", "updated_at")}
+            )
+            async with AsyncSessionLocal() as db:
+                await db.execute(stmt)
+                await db.commit()
+        return len(ids)
+    except Exception:
+        await client.sadd(DIRTY_KEY, *ids)
+        raise
+
+
+async def warm_from_db() -> int:
+    """Redis 리더보드가 비어 있으면 DB에서 다시 채움 (워커 하나만, id 키셋 페이지로 전체 조회 없이)"""
+    client = RedisManager.get_client()
+    if await client.exists(GLOBAL_KEY) or not await client.set(WARM_LOCK_KEY, "1", nx=True, ex=60):
+        return 0
+    loaded, last_id = 0, 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            res = await db.execute(
+                select(BattleRating).where(BattleRating.id > last_id).order_by(BattleRating.id).limit(WARM_BATCH)
+            )
+            rows = res.scalars().all()
+            if not rows:
+                break
+            async with client.pipeline(transaction=False) as pipe:
+                for r in rows:
+                    pipe.zadd(GLOBAL_KEY, {r.user_id: r.rating})
+                    pipe.zadd(f"{PET_KEY_PREFIX}{r.pet_type}", {r.user_id: r.rating})
+                    pipe.hset(PETS_KEY, r.user_id, r.pet_type)
+                    pipe.hset(RECORDS_KEY, mapping={f"{r.user_id}:w": r.wins, f"{r.user_id}:l": r.losses,
+                                                    f"{r.user_id}:d": r.draws})
+                await pipe.execute()
+            loaded += len(rows)
+            last_id = rows[-1].id
+    print(f"[Rating] Leaderboards warmed from DB ({loaded} ratings)")
+    return loaded
+
+
+class RatingPersister:
+    """rating:dirty를 주기적으로 DB에 저장 (모든 워커에서 실행, SPOP으로 나눠 가짐)"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        try:
+            await warm_from_db()
+        except Exception as e:
+            print(f"[Rating] Warm-up failed: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            # 종료 전 남은 변경분 저장
+            while await flush_dirty():
+                pass
+        except Exception as e:
+            print(f"[Rating] Final flush failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(FLUSH_SEC)
+            try:
+                while await flush_dirty() >= FLUSH_BATCH:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Rating] Flush Error: {e}")
+
+
+persister = RatingPersister()
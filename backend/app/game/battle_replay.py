@@ -0,0 +1,155 @@
+# backend/app/game/battle_replay.py
+"""
+배틀 리플레이 (턴 로그 기록/저장/재구성)
+
+- 대전 중: 턴 확정과 같은 Lua 스크립트에서 Redis 스트림(room:{id}:log)에 추가 (battle_room_store.commit_turn)
+    start: 시드, 플레이어, 스탯, 펫, 기술, 처리 전 상태, 필드 (첫 턴에 한 번)
+    turn : 턴 번호, 양측 선택, 처리 후 상태(BattleState.encode), 필드
+- 종료 시(GAME_OVER/기권): 스트림을 battle_replays 테이블로 옮기고 삭제
+- 조회는 끝난 대전만 가능: 진행 중인 방의 시드/상태가 공개되면 이후 턴의 난수를 미리 계산할 수 있음
+- 재구성: 시드와 선택으로 BattleManager.resolve_turn을 다시 돌려 이벤트를 만들고,
+  기록된 상태와 비교해 불일치(desync) 턴을 보고합니다. (분쟁 재현, 회귀/성능 테스트 코퍼스)
+"""
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import AsyncSessionLocal
+from app.db.database_redis import RedisManager
+from app.db.models.battle_replay import BattleReplay
+from app.game import battle_room_store
+from app.game.battle_manager import BattleManager, BattleState, CombatStats, turn_rng
+
+
+def start_entry(room_data: dict) -> dict:
+    """대전 초기 정보 (첫 턴 처리 전에 호출)"""
+    uids = [str(p) for p in room_data["players"]]
+    return {
+        "seed": room_data["seed"],
+        "players": room_data["players"],
+        "ai": room_data["is_ai_battle"],
+        "stats": {uid: room_data["character_stats"][uid] for uid in uids},
+        "pets": {uid: room_data["pet_types"].get(uid, "dog") for uid in uids},
+        "skills": {uid: room_data["learned_skills"].get(uid, []) for uid in uids},
+        "states": {uid: room_data["battle_states"][uid].encode() for uid in uids},
+        "field": dict(room_data["field_effects"]),
+    }
+
+
+def turn_entry(turn: int, selections: Dict[str, int], states: Dict[str, BattleState], field_effects: dict) -> dict:
+    """한 턴의 선택과 처리 후 상태"""
+    return {
+        "n": turn,
+        "sel": selections,
+        "states": {uid: state.encode() for uid, state in states.items()},
+        "field": dict(field_effects),
+    }
+
+
+def player_states(states: Dict[str, BattleState]) -> dict:
+    """TURN_RESULT의 player_states와 같은 형식"""
+    return {
+        uid: {
+            "hp": state.current_hp,
+            "status": [state.status_ailment] if state.status_ailment else [],
+            "pp": state.pp
+        }
+        for uid, state in states.items()
+    }
+
+
+def rebuild(start: dict, turns: List[dict]) -> dict:
+    """
+    턴 로그로 전투를 처음부터 다시 진행합니다. (I/O 없음)
+    Return: {"turns": [{turn, selections, results, player_states}], "verified": bool, "desync_turns": [...]}
+    """
+    players = start["players"]
+    stats = {uid: CombatStats.from_dict(s) for uid, s in start["stats"].items()}
+    states = {uid: BattleState.decode(s) for uid, s in start["states"].items()}
+    field = dict(start["field"])
+
+    rebuilt, desync = [], []
+    for entry in turns:
+        turn = entry["n"]
+        selections = {uid: int(m) for uid, m in entry["sel"].items()}
+        results = BattleManager.resolve_turn(
+            players, stats, states, start["pets"], selections, field, rng=turn_rng(start["seed"], turn)
+        )
+        if {uid: s.encode() for uid, s in states.items()} != entry["states"] or field != entry["field"]:
+            desync.append(turn)
+        rebuilt.append({
+            "turn": turn,
+            "selections": selections,
+            "results": results,
+            "player_states": player_states(states),
+        })
+    return {"turns": rebuilt, "verified": not desync, "desync_turns": desync}
+
+
+def _split(entries: list):
+    start = next((d for kind, d in entries if kind == "start"), None)
+    turns = [d for kind, d in entries if kind == "turn"]
+    return start, turns
+
+
+async def save_replay(room_id: str, winner_id: Optional[int], result: str) -> bool:
+    """
+    대전 종료 시 턴 로그 스트림을 DB로 옮기고 스트림을 삭제합니다.
+    한 턴도 진행되지 않았거나(로그 없음) 이미 저장했다면 False.
+    """
+    try:
+        start, turns = _split(await battle_room_store.read_log(room_id))
+        if start is None:
+            return False
+
+        async with AsyncSessionLocal() as db:
+            exists = await db.execute(select(BattleReplay.id).where(BattleReplay.room_id == room_id))
+            if exists.scalar_one_or_none() is not None:
+                return False
+            p1, p2 = start["players"][0], start["players"][1]
+            db.add(BattleReplay(
+                room_id=room_id, seed=start["seed"], player1_id=p1, player2_id=p2,
+                winner_id=winner_id, result=result, turn_count=len(turns),
+                log={"start": start, "turns": turns}
+            ))
+            await db.commit()
+
+        await RedisManager.get_client().delete(battle_room_store.log_key(room_id))
+        print(f"[Replay] Saved room {room_id} ({len(turns)} turns, {result})")
+        return True
+    except Exception as e:
+        # 저장 실패 시 스트림은 방 TTL 동안 남아 있으므로 재시도/수동 복구 가능
+        print(f"[Replay] Save failed for room {room_id}: {e}")
+        return False
+
+
+async def load_replay(db: AsyncSession, room_id: str) -> Optional[dict]:
+    """
+    끝난 대전의 리플레이를 재구성하여 반환합니다. 진행 중이거나 없으면 None.
+    DB 저장이 실패해 스트림만 남은 경우에도 방이 종료 상태일 때만 스트림을 읽습니다.
+    """
+    row = (await db.execute(select(BattleReplay).where(BattleReplay.room_id == room_id))).scalar_one_or_none()
+    if row is not None:
+        start, turns = row.log["start"], row.log["turns"]
+        meta = {"winner_id": row.winner_id, "result": row.result, "created_at": row.created_at.isoformat()}
+    else:
+        finished = await RedisManager.get_client().hget(battle_room_store.room_key(room_id), "finished")
+        if finished != "1":
+            return None
+        start, turns = _split(await battle_room_store.read_log(room_id))
+        if start is None:
+            return None
+        meta = {"winner_id": None, "result": None, "created_at": None}
+
+    return {
+        "room_id": room_id,
+        "seed": start["seed"],
+        "players": start["players"],
+        "is_ai_battle": start["ai"],
+        "pet_types": start["pets"],
+        "skills": start["skills"],
+        "initial_states": player_states({uid: BattleState.decode(s) for uid, s in start["states"].items()}),
+        "field_effects": start["field"],
+        "finished": True,
+        **meta,
+        **rebuild(start, turns),
+    }
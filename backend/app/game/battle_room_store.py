@@ -0,0 +1,393 @@
+# backend/app/game/battle_room_store.py
+"""
+배틀 방 상태 저장소 (Redis Hash)
+방 전체를 JSON 한 덩어리로 읽고 쓰던 room:{id} 대신, 필드 단위 해시로 저장하고
+참가/기술 선택/턴 확정을 Lua 스크립트로 원자적으로 처리합니다. (읽기-수정-쓰기 경합 제거)
+
+room:{id} (Hash)
+    room_id, is_ai_battle('1'/'0'), turn_count, field_effects(JSON), seed(턴별 난수 시드)
+    spectators (전체 워커의 관전자 수), idle:{uid} (연속 시간 초과 횟수, 직접 선택하면 초기화)
+    started ('1': 양측 준비 완료로 BATTLE_START를 보낸 방, 한 번만 설정)
+    finished ('1': KO/무승부 턴 확정 또는 기권으로 끝난 방, 이후 선택/기권/레이팅 처리 없음)
+    rated ('1': 레이팅 반영 완료, app.game.battle_rating이 설정)
+    stats:{uid}, pet:{uid}, skills:{uid}, images:{uid}             (JSON)
+    state:{uid}                                         (BattleState.encode 바이너리, base64)
+    sel:{uid}                                           (선택한 기술 ID)
+room:{id}:players_list (Set) - 접속 중인 플레이어 (AI 봇 0은 포함하지 않음)
+room:{id}:claim (String, PX) - 턴을 획득해 처리 중인 턴 번호 (처리 워커가 죽어도 CLAIM_TTL_MS 뒤 만료)
+room:{id}:log (Stream) - 턴 로그 (첫 항목 start: 대전 초기 정보, 이후 turn: 선택과 결과 상태), 턴 확정과 함께 기록
+
+턴 마감 시각은 battle:deadlines (app.game.battle_scheduler)에 입장/턴 확정과 같은 스크립트에서 기록합니다.
+
+턴당 Redis 왕복: 기술 선택(select_move) 1회 + 턴 확정(commit_turn) 1회
+"""
+import secrets
+from typing import Dict, Optional, Tuple
+from app.db.database_redis import RedisManager
+from app.core.serialization import encode_text, loads
+from app.game.battle_manager import BattleState
+from app.game.battle_scheduler import DEADLINES_KEY, join_deadline
+
+ROOM_TTL = 3600  # 초
+CLAIM_TTL_MS = 10000  # 턴 획득 ~ 확정 사이 (AI 봇 탐색 포함) 상한
+AI_BOT_ID = 0
+AI_BOT_PET = "bear"
+AI_BOT_SKILLS = [5, 15, 30]
+DEFAULT_FIELD_EFFECTS = {"weather": "clear", "location": "stadium"}
+
+_PER_PLAYER = (
+    ("stats:", "character_stats"),
+    ("pet:", "pet_types"),
+    ("skills:", "learned_skills"),
+    ("images:", "image_urls"),
+    ("state:", "battle_states"),
+    ("sel:", "selections"),
+)
+
+
+def room_key(room_id: str) -> str:
+    return f"room:{room_id}"
+
+
+def players_key(room_id: str) -> str:
+    return f"room:{room_id}:players_list"
+
+
+def claim_key(room_id: str) -> str:
+    return f"room:{room_id}:claim"
+
+
+def log_key(room_id: str) -> str:
+    return f"room:{room_id}:log"
+
+
+def new_seed() -> str:
+    return secrets.token_hex(8)
+
+
+# --- Lua Scripts ---
+# 방 메타 기본값 설정 + 내 정보 기록 + (AI 방이면) 봇 정보 복사 + 입장 마감 등록(없을 때만) 후 방 전체 반환
+# 이 입장으로 양측 전투 상태가 모두 준비되었으면 started를 설정하고 1 반환 (방마다 한 번만)
+_JOIN_LUA = """
+local room, players = KEYS[1], KEYS[2]
+local uid = ARGV[1]
+redis.call('HSETNX', room, 'room_id', ARGV[2])
+redis.call('HSETNX', room, 'is_ai_battle', '0')
+redis.call('HSETNX', room, 'turn_count', '0')
+redis.call('HSETNX', room, 'field_effects', ARGV[3])
+redis.call('HSETNX', room, 'seed', ARGV[13])
+redis.call('HSET', room, 'stats:' .. uid, ARGV[4], 'pet:' .. uid, ARGV[5],
+           'skills:' .. uid, ARGV[6], 'images:' .. uid, ARGV[7])
+redis.call('HSETNX', room, 'state:' .. uid, ARGV[8])
+redis.call('SADD', players, uid)
+if redis.call('HGET', room, 'is_ai_battle') == '1' then
+    local bot = ARGV[9]
+    if redis.call('HSETNX', room, 'state:' .. bot, redis.call('HGET', room, 'state:' .. uid)) == 1 then
+        redis.call('HSET', room, 'stats:' .. bot, ARGV[4], 'pet:' .. bot, ARGV[10], 'skills:' .. bot, ARGV[11])
+    end
+end
+redis.call('EXPIRE', room, ARGV[12])
+redis.call('EXPIRE', players, ARGV[12])
+redis.call('ZADD', KEYS[3], 'NX', ARGV[14], ARGV[2])
+local members = redis.call('SMEMBERS', players)
+local count, ready = #members, 1
+if redis.call('HGET', room, 'is_ai_battle') == '1' then
+    count = count + 1
+    ready = redis.call('HEXISTS', room, 'state:' .. ARGV[9])
+end
+for _, id in ipairs(members) do
+    if redis.call('HEXISTS', room, 'state:' .. id) == 0 then
+        ready = 0
+    end
+end
+local started = 0
+if count >= 2 and ready == 1 then
+    started = redis.call('HSETNX', room, 'started', '1')
+end
+return {redis.call('HGETALL', room), members, started}
+"""
+
+# 기술 선택 기록, 모든 (사람) 플레이어가 선택했으면 선택을 비우고(턴 획득) 방 전체 반환
+# AI 봇의 선택은 기록하지 않음: 턴을 획득한 쪽이 반환된 스냅샷(현재 상태)으로 탐색 (방을 다시 읽지 않음)
+# 획득한 턴 번호는 KEYS[3](claim)에 남겨 처리 중인 턴에 시간 초과 자동 선택이 끼어들지 않게 함 (ARGV[5] = PX)
+# (ARGV[3] = '1'이면 플레이어가 직접 선택한 것이므로 연속 시간 초과 횟수 초기화)
+# 없는 방(삭제됨)이나 끝난 방이면 기록하지 않음 ({-1}, 기록했지만 아직 다 모이지 않았으면 {0})
+# 시간 초과 자동 선택(ARGV[3] = '0')은 턴이 ARGV[4]에서 넘어갔거나, 이미 선택했거나, 처리 중이면 기록하지 않음
+_SELECT_LUA = """
+local room, players, claim = KEYS[1], KEYS[2], KEYS[3]
+if redis.call('EXISTS', room) == 0 or redis.call('HGET', room, 'finished') == '1' then
+    return {-1}
+end
+if ARGV[3] == '0' and (redis.call('HGET', room, 'turn_count') ~= ARGV[4]
+        or redis.call('GET', claim) == ARGV[4]
+        or redis.call('HEXISTS', room, 'sel:' .. ARGV[1]) == 1) then
+    return {-1}
+end
+redis.call('HSET', room, 'sel:' .. ARGV[1], ARGV[2])
+if ARGV[3] == '1' then
+    redis.call('HDEL', room, 'idle:' .. ARGV[1])
+end
+local ids = redis.call('SMEMBERS', players)
+local needed = 2
+if redis.call('HGET', room, 'is_ai_battle') == '1' then
+    needed = 1
+end
+if #ids < needed then
+    return {0}
+end
+for _, id in ipairs(ids) do
+    if redis.call('HEXISTS', room, 'sel:' .. id) == 0 then
+        return {0}
+    end
+end
+local snapshot = redis.call('HGETALL', room)
+for _, id in ipairs(ids) do
+    redis.call('HDEL', room, 'sel:' .. id)
+end
+redis.call('SET', claim, redis.call('HGET', room, 'turn_count'), 'PX', ARGV[5])
+return {1, snapshot, ids}
+"""
+
+# 턴 번호가 그대로일 때만 결과 기록 + 턴 로그 추가 + 다음 턴 마감 갱신 (0이면 대전 종료: finished 설정, 마감 제거)
+# (ARGV: turn_count, ttl, field_effects, start 항목(첫 턴만, 아니면 ''), turn 항목, 다음 마감, room_id,
+#        uid1, state1, uid2, state2, ...)
+_COMMIT_LUA = """
+local room, log, deadlines = KEYS[1], KEYS[2], KEYS[3]
+if redis.call('HGET', room, 'turn_count') ~= ARGV[1] or redis.call('HGET', room, 'finished') == '1' then
+    return 0
+end
+redis.call('HSET', room, 'field_effects', ARGV[3])
+for i = 8, #ARGV, 2 do
+    redis.call('HSET', room, 'state:' .. ARGV[i], ARGV[i + 1])
+end
+redis.call('HINCRBY', room, 'turn_count', 1)
+if ARGV[4] ~= '' and redis.call('XLEN', log) == 0 then
+    redis.call('XADD', log, '*', 't', 'start', 'd', ARGV[4])
+end
+redis.call('XADD', log, '*', 't', 'turn', 'd', ARGV[5])
+if ARGV[6] == '0' then
+    redis.call('HSET', room, 'finished', '1')
+    redis.call('ZREM', deadlines, ARGV[7])
+else
+    redis.call('ZADD', deadlines, ARGV[6], ARGV[7])
+end
+redis.call('EXPIRE', room, ARGV[2])
+redis.call('EXPIRE', log, ARGV[2])
+return 1
+"""
+
+# 기권 등으로 방 종료 (방이 있고 아직 끝나지 않았을 때만 1, 한 호출자만 성공)
+_FINISH_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local ok = redis.call('HSETNX', KEYS[1], 'finished', '1')
+if ok == 1 then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+end
+return ok
+"""
+
+# 방이 있을 때만 카운터 필드 변경 (종료된 방의 키를 다시 만들지 않음)
+# 턴 번호가 그대로이고, 처리 중이 아니고, 아직 선택하지 않았을 때만 시간 초과 1회 기록 (아니면 -1)
+_MARK_IDLE_LUA = """
+if redis.call('HGET', KEYS[1], 'turn_count') ~= ARGV[2] or redis.call('GET', KEYS[2]) == ARGV[2]
+        or redis.call('HEXISTS', KEYS[1], 'sel:' .. ARGV[1]) == 1 then
+    return -1
+end
+return redis.call('HINCRBY', KEYS[1], 'idle:' .. ARGV[1], 1)
+"""
+
+_HINCR_IF_EXISTS_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+return redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+"""
+
+_scripts = {}
+
+
+def _script(lua: str):
+    script = _scripts.get(lua)
+    if script is None:
+        script = _scripts[lua] = RedisManager.get_client().register_script(lua)
+    return script
+
+
+def _pairs(flat: list) -> dict:
+    return dict(zip(flat[0::2], flat[1::2]))
+
+
+def decode_room(fields: dict, members) -> dict:
+    """해시 필드를 기존 방 데이터(dict) 형태로 변환"""
+    room = {
+        "room_id": fields.get("room_id"),
+        "players": [],
+        "character_stats": {},
+        "pet_types": {},
+        "learned_skills": {},
+        "image_urls": {},
+        "battle_states": {},
+        "selections": {},
+        "turn_count": int(fields.get("turn_count", 0)),
+        "field_effects": loads(fields["field_effects"]) if "field_effects" in fields else dict(DEFAULT_FIELD_EFFECTS),
+        "is_ai_battle": fields.get("is_ai_battle") == "1",
+        "seed": fields.get("seed") or fields.get("room_id", ""),  # 시드 도입 전 방은 방 ID
+        "spectators": int(fields.get("spectators", 0)),
+        "started": fields.get("started") == "1",
+        "finished": fields.get("finished") == "1",
+    }
+    for name, value in fields.items():
+        for prefix, section in _PER_PLAYER:
+            if name.startswith(prefix):
+                uid = name[len(prefix):]
+                if section == "pet_types":
+                    room[section][uid] = value
+                elif section == "battle_states":
+                    room[section][uid] = BattleState.decode(value)
+                elif section == "selections":
+                    room[section][uid] = int(value)
+                else:
+                    room[section][uid] = loads(value)
+                break
+
+    ids = {int(m) for m in members}
+    if room["is_ai_battle"]:
+        ids.add(AI_BOT_ID)
+    room["players"] = sorted(ids)
+    return room
+
+
+async def create_room(room_id: str, is_ai_battle: bool = False):
+    client = RedisManager.get_client()
+    key = room_key(room_id)
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping={
+            "room_id": room_id,
+            "is_ai_battle": "1" if is_ai_battle else "0",
+            "turn_count": 0,
+            "field_effects": encode_text(DEFAULT_FIELD_EFFECTS),
+            "seed": new_seed(),
+        })
+        pipe.expire(key, ROOM_TTL)
+        await pipe.execute()
+
+
+async def join_room(room_id: str, user_id: int, stats: dict, pet_type: str,
+                    skills: list, images: dict, initial_state: BattleState) -> Tuple[dict, bool]:
+    """
+    플레이어 정보를 기록하고 (방 전체, 이 입장으로 배틀이 시작되었는지)를 반환합니다. (1회 왕복)
+    재접속 시 전투 상태(state)는 유지하고, AI 방이면 봇 정보를 처음 한 번만 만듭니다.
+    시작 여부는 스크립트 안에서 정해지므로 동시에 입장해도 정확히 한 쪽만 True입니다.
+    """
+    client = RedisManager.get_client()
+    fields, members, started = await _script(_JOIN_LUA)(
+        keys=[room_key(room_id), players_key(room_id), DEADLINES_KEY],
+        args=[
+            user_id, room_id, encode_text(DEFAULT_FIELD_EFFECTS),
+            encode_text(stats), pet_type, encode_text(skills), encode_text(images), initial_state.encode(),
+            AI_BOT_ID, AI_BOT_PET, encode_text(AI_BOT_SKILLS), ROOM_TTL, new_seed(), join_deadline()
+        ],
+        client=client
+    )
+    return decode_room(_pairs(fields), members), started == 1
+
+
+async def load_room(room_id: str) -> Optional[dict]:
+    client = RedisManager.get_client()
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.hgetall(room_key(room_id))
+        pipe.smembers(players_key(room_id))
+        fields, members = await pipe.execute()
+    if not fields:
+        return None
+    return decode_room(fields, members)
+
+
+async def _select(room_id: str, user_id: int, move_id: int, turn_count: Optional[int]) -> list:
+    client = RedisManager.get_client()
+    return await _script(_SELECT_LUA)(
+        keys=[room_key(room_id), players_key(room_id), claim_key(room_id)],
+        args=[user_id, move_id, "1" if turn_count is None else "0", "" if turn_count is None else turn_count,
+              CLAIM_TTL_MS],
+        client=client
+    )
+
+
+def _claimed(result: list) -> Optional[dict]:
+    if not result or result[0] != 1:
+        return None
+    return decode_room(_pairs(result[1]), [i for i in result[2] if int(i) != AI_BOT_ID])
+
+
+async def select_move(room_id: str, user_id: int, move_id: int) -> Optional[dict]:
+    """
+    기술 선택을 기록합니다. 이 선택으로 모든 플레이어의 선택이 모였다면
+    선택이 채워진 방 데이터를 반환하고(이 호출자가 턴을 처리), 아니면 None. (1회 왕복)
+    AI 방의 봇 선택은 비어 있으므로 턴을 처리하는 쪽이 스냅샷으로 정합니다.
+    """
+    return _claimed(await _select(room_id, user_id, move_id, None))
+
+
+async def timeout_select(room_id: str, user_id: int, move_id: int, turn_count: int) -> Tuple[bool, Optional[dict]]:
+    """
+    시간 초과 자동 선택 (연속 시간 초과 횟수를 초기화하지 않음)
+    그 사이 턴이 넘어갔거나 플레이어가 직접 선택했다면 기록하지 않습니다.
+    Return: (기록 여부, 턴을 획득했다면 방 데이터)
+    """
+    result = await _select(room_id, user_id, move_id, turn_count)
+    return bool(result) and result[0] != -1, _claimed(result)
+
+
+async def commit_turn(room_id: str, turn_count: int, battle_states: Dict[str, BattleState], field_effects: dict,
+                      log_entry: dict, start_entry: Optional[dict] = None, next_deadline: int = 0) -> bool:
+    """
+    턴 결과를 기록하고 turn_count를 올립니다. 다른 곳에서 이미 확정했다면 False. (1회 왕복)
+    log_entry는 같은 스크립트에서 턴 로그 스트림에 추가되고, start_entry는 로그가 비어 있을 때만 먼저 추가됩니다.
+    next_deadline: 다음 턴 선택 마감 (epoch ms, 0이면 대전 종료로 마감 제거)
+    """
+    client = RedisManager.get_client()
+    args = [turn_count, ROOM_TTL, encode_text(field_effects),
+            encode_text(start_entry) if start_entry else "", encode_text(log_entry), next_deadline, room_id]
+    for uid, state in battle_states.items():
+        args.extend((uid, state.encode()))
+    keys = [room_key(room_id), log_key(room_id), DEADLINES_KEY]
+    return await _script(_COMMIT_LUA)(keys=keys, args=args, client=client) == 1
+
+
+async def read_log(room_id: str) -> list:
+    """턴 로그 스트림 전체 [(종류, 내용 dict), ...]"""
+    client = RedisManager.get_client()
+    entries = await client.xrange(log_key(room_id))
+    return [(fields["t"], loads(fields["d"])) for _, fields in entries]
+
+
+async def finish_room(room_id: str) -> bool:
+    """방을 종료 상태로 표시 (이 호출이 종료시켰으면 True, 이미 끝났거나 없으면 False)"""
+    client = RedisManager.get_client()
+    return await _script(_FINISH_LUA)(keys=[room_key(room_id), DEADLINES_KEY], args=[room_id], client=client) == 1
+
+
+async def add_spectator(room_id: str, delta: int) -> int:
+    """관전자 수 증감 (방이 없으면 -1)"""
+    client = RedisManager.get_client()
+    return await _script(_HINCR_IF_EXISTS_LUA)(keys=[room_key(room_id)], args=["spectators", delta], client=client)
+
+
+async def mark_idle(room_id: str, user_id: int, turn_count: int) -> int:
+    """시간 초과 1회 기록 후 연속 횟수 반환 (방이 없거나, 턴이 넘어갔거나, 이미 선택했으면 -1)"""
+    client = RedisManager.get_client()
+    return await _script(_MARK_IDLE_LUA)(keys=[room_key(room_id), claim_key(room_id)], args=[user_id, turn_count],
+                                         client=client)
+
+
+async def delete_room(room_id: str):
+    """방과 관련된 모든 Redis 임시 데이터를 삭제합니다."""
+    client = RedisManager.get_client()
+    async with client.pipeline(transaction=True) as pipe:
+        # room:{id}:selections 는 구버전 선택 저장 키
+        pipe.delete(room_key(room_id), players_key(room_id), claim_key(room_id), log_key(room_id),
+                    f"room:{room_id}:selections")
+        pipe.zrem(DEADLINES_KEY, room_id)
+        await pipe.execute()
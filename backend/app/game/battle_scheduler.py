@@ -0,0 +1,112 @@
+# backend/app/game/battle_scheduler.py
+"""
+배틀 턴 스케줄러 (Redis Sorted Set)
+방마다 타이머 태스크를 두지 않고, 모든 방의 마감 시각을 하나의 ZSet에 모아 주기적으로 스캔합니다.
+
+battle:deadlines (ZSet) room_id -> 마감 시각 (epoch ms)
+    - 입장 시: 상대 입장 마감 (JOIN_TIMEOUT_SEC, 이미 있으면 유지)
+    - 배틀 시작/턴 확정 시: 다음 턴 선택 마감 (TURN_TIMEOUT_SEC, 턴 확정 Lua에서 원자적으로 갱신)
+    - 방 삭제 시: 제거
+
+- 모든 워커가 스캔하지만, 마감된 방은 Lua로 점수를 LEASE_MS 뒤로 미루며 가져가므로 한 워커만 처리합니다.
+  처리 중 워커가 죽으면 임대 시간이 지난 뒤 다른 워커가 다시 가져갑니다.
+- 마감 처리(자동 선택, 방 정리)는 battle_socket이 set_handler로 등록한 핸들러가 담당합니다.
+"""
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+from app.db.database_redis import RedisManager
+
+DEADLINES_KEY = "battle:deadlines"
+
+TICK_SEC = float(os.getenv("BATTLE_TICK_SEC", "0.5"))
+TURN_TIMEOUT_SEC = float(os.getenv("BATTLE_TURN_TIMEOUT_SEC", "30"))  # 기술 선택 제한 시간
+JOIN_TIMEOUT_SEC = float(os.getenv("BATTLE_JOIN_TIMEOUT_SEC", "60"))  # 상대 입장 대기 시간
+MAX_IDLE_TURNS = int(os.getenv("BATTLE_MAX_IDLE_TURNS", "2"))         # 연속 시간 초과 시 기권 처리
+LEASE_MS = 10_000
+BATCH = 100
+
+# 마감된 방을 최대 ARGV[3]개 가져가며 점수를 임대 만료 시각으로 변경
+_CLAIM_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+for _, room in ipairs(due) do
+    redis.call('ZADD', KEYS[1], ARGV[2], room)
+end
+return due
+"""
+
+# handler(room_id)
+Handler = Callable[[str], Awaitable[None]]
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def turn_deadline() -> int:
+    """지금 시작하는 턴의 선택 마감 시각 (epoch ms)"""
+    return now_ms() + int(TURN_TIMEOUT_SEC * 1000)
+
+
+def join_deadline() -> int:
+    return now_ms() + int(JOIN_TIMEOUT_SEC * 1000)
+
+
+class BattleScheduler:
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+        self._task: Optional[asyncio.Task] = None
+        self._claim = None
+
+    def set_handler(self, handler: Handler):
+        self._handler = handler
+
+    async def schedule(self, room_id: str, deadline_ms: int):
+        client = RedisManager.get_client()
+        await client.zadd(DEADLINES_KEY, {room_id: deadline_ms})
+
+    async def deadline(self, room_id: str) -> Optional[int]:
+        client = RedisManager.get_client()
+        score = await client.zscore(DEADLINES_KEY, room_id)
+        return None if score is None else int(score)
+
+    async def cancel(self, room_id: str):
+        client = RedisManager.get_client()
+        await client.zrem(DEADLINES_KEY, room_id)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Scheduler] Loop Error: {e}")
+            await asyncio.sleep(TICK_SEC)
+
+    async def run_once(self) -> List[str]:
+        """마감된 방을 가져가 핸들러를 동시에 실행 (처리한 방 ID 반환)"""
+        client = RedisManager.get_client()
+        if self._claim is None:
+            self._claim = client.register_script(_CLAIM_LUA)
+        now = now_ms()
+        due = await self._claim(keys=[DEADLINES_KEY], args=[now, now + LEASE_MS, BATCH], client=client)
+        if due and self._handler is not None:
+            results = await asyncio.gather(*(self._handler(room_id) for room_id in due), return_exceptions=True)
+            for room_id, result in zip(due, results):
+                if isinstance(result, Exception):
+                    print(f"[Scheduler] Timeout handler failed for room {room_id}: {result}")
+        return due
+
+
+scheduler = BattleScheduler()
@@ -0,0 +1,292 @@
+# backend/app/game/battle_simulator.py
+"""
+NumPy 배치 전투 시뮬레이터 (밸런스 분석용)
+수십만~수백만 판의 전투를 배열 연산으로 한꺼번에 진행하여
+"Lv30 고양이(할퀴기) vs Lv30 강아지"의 승률 같은 질문에 답합니다.
+
+실제 서버의 턴 처리(battle_socket.process_turn_redis)와 같은 규칙을 따릅니다.
+- 선공: 우선도 -> 민첩(랭크, 마비 0.5배) -> 동률이면 무작위
+- 명중: BattleCalculator.check_hit (자기 대상 단일 효과 기술은 필중)
+- 데미지: BattleCalculator.calculate_damage (랭크, 화상, HP 비례 위력, 치명타, 난수, 상성, 필드)
+- 효과: 방어자가 살아 있을 때만 effect_chance 확률로 순서대로 적용
+- 턴 종료: 상태 이상 피해(독/화상/출혈 1/8) 및 지속 턴 감소
+기술 선택은 AI 봇과 같이 배운 기술 중 무작위입니다. STAB은 아직 서버 공식에 없으므로 1.0입니다.
+수치 테이블(상성/필드/랭크/기술)은 스칼라 엔진과 같은 app.game.battle_tables를 사용합니다.
+
+Usage:
+    python -m app.game.battle_simulator --pets dog,cat,bird --levels 10,30 --battles 100000
+    python -m app.game.battle_simulator --pets cat,dog --levels 30 --skills cat=125,130 --seed 7
+"""
+import time
+import argparse
+import numpy as np
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.game.game_assets import STATUS_DATA, PET_TYPE_MAP, PET_BASE_STATS, PET_LEARNSET
+from app.game.battle_tables import (
+    moves_np, STAGE_MULT, CRIT_BONUS, TYPE_ID, TYPE_MATRIX, FIELD_MULT, WEATHERS, LOCATIONS,
+    WEATHER_ID, LOCATION_ID, AILMENT_ID, DOT_AILMENTS, STAGE_INDEX, PHYSICAL, SPECIAL, STATUS,
+    STR, DEF, AGI, INT, ACC, EVA, CRIT, STAGE_KEYS
+)
+
+# 기본 스탯 배열 열 순서
+STAT_KEYS = ("strength", "defense", "agility", "intelligence", "luck")
+S_STR, S_DEF, S_AGI, S_INT, S_LUCK = range(len(STAT_KEYS))
+BURN, PARALYSIS = AILMENT_ID["burn"], AILMENT_ID["paralysis"]
+
+
+# --- 참가자 ---
+class Fighter(NamedTuple):
+    pet_type: str
+    level: int
+    stats: dict        # strength, defense, agility, intelligence, luck, health
+    skills: Tuple[int, ...]
+
+    @property
+    def element(self) -> str:
+        return PET_TYPE_MAP.get(self.pet_type, "normal")
+
+
+def learned_skills(pet_type: str, level: int) -> Tuple[int, ...]:
+    """해당 레벨까지 배우는 기술 목록 (PET_LEARNSET 기준)"""
+    learnset = PET_LEARNSET.get(pet_type, PET_LEARNSET["dog"])
+    return tuple(sid for lv in sorted(learnset) if lv <= level for sid in learnset[lv]) or (5,)
+
+
+def typical_fighter(pet_type: str, level: int, skills=None) -> Fighter:
+    """
+    종족값 + 레벨업 성장(char_service._give_exp_and_levelup)만 반영한 표준 스탯
+    (분배 포인트는 반영하지 않음)
+    """
+    base = PET_BASE_STATS.get(pet_type, PET_BASE_STATS["dog"])
+    grown = level - 1
+    stats = {k: base.get(k, 10) + grown * max(1, int(base.get(k, 10) * 0.2)) for k in ("strength", "defense", "agility", "intelligence")}
+    stats["luck"] = base.get("luck", 10)
+    stats["health"] = 100 + grown * 10
+    return Fighter(pet_type, level, stats, tuple(skills) if skills else learned_skills(pet_type, level))
+
+
+# --- 배치 전투 ---
+class _Batch:
+    """(2, N) 배열로 표현한 N판의 전투 상태 (0 = 플레이어1, 1 = 플레이어2)"""
+
+    def __init__(self, f1: Fighter, f2: Fighter, n: int, rng: np.random.Generator, field: Optional[dict]):
+        field = field or {}
+        self.rng = rng
+        self.moves = moves_np()
+        self.base = np.array([[f.stats.get(k, 10) for k in STAT_KEYS] for f in (f1, f2)], dtype=np.float64)
+        self.max_hp = np.array([[f.stats.get("health", 100)] for f in (f1, f2)], dtype=np.int64).repeat(n, axis=1)
+        self.hp = self.max_hp.copy()
+        self.stages = np.zeros((2, n, len(STAGE_KEYS)), dtype=np.int64)
+        self.ailment = np.zeros((2, n), dtype=np.int64)
+        self.ailment_turns = np.zeros((2, n), dtype=np.int64)
+        self.element = np.array([TYPE_ID[f1.element], TYPE_ID[f2.element]])
+        self.skills = [np.array(f.skills, dtype=np.int64) for f in (f1, f2)]
+        self.weather = np.full(n, WEATHER_ID[field.get("weather", "clear")], dtype=np.int64)
+        self.location = np.full(n, LOCATION_ID[field.get("location", "stadium")], dtype=np.int64)
+
+    def stage_mult(self, side, b, key):
+        return STAGE_MULT[self.stages[side, b, key] + 6]
+
+    def turn_order(self, b, moves):
+        """선공 측 인덱스(0/1) 배열"""
+        prio = self.moves.priority[moves]
+        agi = [
+            self.base[s, S_AGI] * self.stage_mult(s, b, AGI) * np.where(self.ailment[s, b] == PARALYSIS, 0.5, 1.0)
+            for s in (0, 1)
+        ]
+        coin = self.rng.integers(0, 2, b.size)
+        by_speed = np.where(agi[0] > agi[1], 0, np.where(agi[1] > agi[0], 1, coin))
+        return np.where(prio[0] > prio[1], 0, np.where(prio[1] > prio[0], 1, by_speed))
+
+    def check_hit(self, b, a, d, mv):
+        acc = self.moves.accuracy[mv]
+        net = np.clip(self.stages[a, b, ACC] - self.stages[d, b, EVA], -6, 6)
+        stage_m = np.where(net >= 0, (3.0 + net) / 3.0, 3.0 / (3.0 + np.abs(net)))
+        atk_agi = np.maximum(self.base[a, S_AGI] * self.stage_mult(a, b, AGI), 1)
+        def_agi = np.maximum(self.base[d, S_AGI] * self.stage_mult(d, b, AGI), 1)
+        chance = np.clip(acc * (atk_agi / def_agi) * stage_m, 20, 100)
+        roll = self.rng.random(b.size) * 100
+        return self.moves.auto_hit[mv] | (acc >= 1000) | (roll <= chance)
+
+    def damage(self, b, a, d, mv):
+        power = self.moves.power[mv]
+        cat = self.moves.category[mv]
+        special = cat == SPECIAL
+        atk = np.where(special,
+                       self.base[a, S_INT] * self.stage_mult(a, b, INT),
+                       self.base[a, S_STR] * self.stage_mult(a, b, STR))
+        dfv = np.where(special,
+                       self.base[d, S_INT] * self.stage_mult(d, b, INT),
+                       self.base[d, S_DEF] * self.stage_mult(d, b, DEF))
+        atk = np.where((cat == PHYSICAL) & (self.ailment[a, b] == BURN), atk * 0.5, atk)
+        dfv = np.maximum(dfv, 1)
+
+        dmg = (atk / dfv) * power * 0.5 + 2
+        hp_pct = self.hp[a, b] / self.max_hp[a, b]
+        dmg = np.where(self.moves.hp_scaling[mv], dmg * (1.0 + (1.0 - hp_pct)), dmg)
+
+        crit_chance = np.minimum(5.0 + self.base[a, S_LUCK] * 0.5 + CRIT_BONUS[np.minimum(self.stages[a, b, CRIT], 3)], 100)
+        crit = self.rng.random(b.size) * 100 < crit_chance
+        rand = self.rng.uniform(0.85, 1.0, b.size)
+
+        mtype = self.moves.type[mv]
+        type_m = TYPE_MATRIX[mtype, self.element[d]]
+        field_m = FIELD_MULT[self.weather[b], self.location[b], mtype]
+
+        final = (dmg * np.where(crit, 1.5, 1.0) * type_m * rand * field_m).astype(np.int64)
+        final = np.where((final < 1) & (type_m > 0), 1, final)
+        final = np.where(type_m == 0, 0, final)
+        return np.where((power > 0) & (cat != STATUS), final, 0)
+
+    def apply_effects(self, b, a, d, mv):
+        for mid in np.unique(mv):
+            effects = self.moves.effects.get(int(mid))
+            if not effects:
+                continue
+            sel = mv == mid
+            sel[sel] = self.rng.random(int(sel.sum())) * 100 <= self.moves.effect_chance[mid]
+            if not sel.any():
+                continue
+            eb, ea, ed = b[sel], a[sel], d[sel]
+            for effect in effects:
+                t = ea if effect.get("target") == "self" else ed
+                etype = effect.get("type", "")
+                if etype == "stat_change":
+                    key = STAGE_INDEX[effect["stat"]]
+                    lo, hi = (0, 3) if key == CRIT else (-6, 6)
+                    self.stages[t, eb, key] = np.clip(self.stages[t, eb, key] + effect["value"], lo, hi)
+                elif etype == "status":
+                    free = self.ailment[t, eb] == 0
+                    tb, tt = eb[free], t[free]
+                    s_data = STATUS_DATA.get(effect["status"], {})
+                    self.ailment[tt, tb] = AILMENT_ID[effect["status"]]
+                    self.ailment_turns[tt, tb] = self.rng.integers(s_data.get("min_turn", 2), s_data.get("max_turn", 5) + 1, tb.size)
+                elif etype == "heal":
+                    pct = effect.get("amount", effect.get("value", 50))
+                    alive = self.hp[t, eb] > 0
+                    tb, tt = eb[alive], t[alive]
+                    amount = np.maximum((self.max_hp[tt, tb] * (pct / 100)).astype(np.int64), 1)
+                    self.hp[tt, tb] = np.minimum(self.max_hp[tt, tb], self.hp[tt, tb] + amount)
+                elif etype == "recoil":
+                    pct = effect.get("value", 25)
+                    amount = np.maximum((self.max_hp[t, eb] * (pct / 100)).astype(np.int64), 1)
+                    self.hp[t, eb] = np.maximum(0, self.hp[t, eb] - amount)
+                elif etype == "field_change":
+                    if effect.get("field", "weather") == "weather":
+                        self.weather[eb] = WEATHER_ID[effect.get("value", "clear")]
+                    else:
+                        self.location[eb] = LOCATION_ID[effect.get("value", "stadium")]
+
+    def attack(self, b, a, d, mv):
+        """한 쪽의 공격 (명중 -> 데미지 -> 방어자가 살아 있으면 효과)"""
+        hit = self.check_hit(b, a, d, mv)
+        b, a, d, mv = b[hit], a[hit], d[hit], mv[hit]
+        self.hp[d, b] = np.maximum(0, self.hp[d, b] - self.damage(b, a, d, mv))
+        alive = self.hp[d, b] > 0
+        self.apply_effects(b[alive], a[alive], d[alive], mv[alive])
+
+    def end_of_turn(self, b):
+        for s in (0, 1):
+            sb = b[(self.hp[s, b] > 0) & (self.ailment[s, b] != 0)]
+            dot = np.isin(self.ailment[s, sb], DOT_AILMENTS)
+            self.hp[s, sb] = np.where(dot, np.maximum(0, self.hp[s, sb] - np.maximum(self.max_hp[s, sb] // 8, 1)), self.hp[s, sb])
+            self.ailment_turns[s, sb] -= 1
+            self.ailment[s, sb] = np.where(self.ailment_turns[s, sb] <= 0, 0, self.ailment[s, sb])
+
+
+def simulate(f1: Fighter, f2: Fighter, n: int = 10000, seed: Optional[int] = None,
+             max_turns: int = 100, field: Optional[dict] = None) -> dict:
+    """
+    f1 vs f2 를 n판 진행한 결과
+    Return: {"battles", "p1_win", "p2_win", "draw", "timeout", "avg_turns"}
+            (비율은 0~1, avg_turns는 시간 초과 판을 max_turns로 포함)
+    """
+    rng = np.random.default_rng(seed)
+    batch = _Batch(f1, f2, n, rng, field)
+    active = np.ones(n, dtype=bool)
+    turns = np.zeros(n, dtype=np.int64)
+
+    for _ in range(max_turns):
+        b = np.flatnonzero(active)
+        if b.size == 0:
+            break
+        moves = np.stack([s[rng.integers(0, s.size, b.size)] for s in batch.skills])
+        first = batch.turn_order(b, moves)
+        second = 1 - first
+        cols = np.arange(b.size)
+
+        batch.attack(b, first, second, moves[first, cols])
+        go = batch.hp[second, b] > 0
+        batch.attack(b[go], second[go], first[go], moves[second[go], cols[go]])
+        batch.end_of_turn(b)
+
+        turns[b] += 1
+        over = (batch.hp[0, b] <= 0) | (batch.hp[1, b] <= 0)
+        active[b[over]] = False
+
+    p1_alive = batch.hp[0] > 0
+    p2_alive = batch.hp[1] > 0
+    finished = ~active
+    return {
+        "battles": n,
+        "p1_win": float((finished & p1_alive & ~p2_alive).mean()),
+        "p2_win": float((finished & ~p1_alive & p2_alive).mean()),
+        "draw": float((finished & ~p1_alive & ~p2_alive).mean()),
+        "timeout": float(active.mean()),
+        "avg_turns": float(turns.mean()),
+    }
+
+
+# --- CLI ---
+def _parse_skills(text: str) -> dict:
+    """'cat=125,130;dog=15,25' -> {'cat': (125, 130), 'dog': (15, 25)}"""
+    result = {}
+    for part in filter(None, (text or "").split(";")):
+        pet, ids = part.split("=")
+        result[pet.strip()] = tuple(int(i) for i in ids.split(","))
+    return result
+
+
+def win_rate_matrix(pets, level: int, battles: int, seed: int, skills: dict, field: Optional[dict] = None):
+    """행 펫(P1)의 승률 행렬 (무승부는 0.5승)"""
+    matrix = {}
+    for i, p1 in enumerate(pets):
+        for j, p2 in enumerate(pets):
+            res = simulate(
+                typical_fighter(p1, level, skills.get(p1)), typical_fighter(p2, level, skills.get(p2)),
+                n=battles, seed=seed + i * 1000 + j, field=field
+            )
+            matrix[(p1, p2)] = res["p1_win"] + 0.5 * res["draw"]
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo battle balance simulator")
+    parser.add_argument("--pets", default="dog,cat,bird", help="쉼표로 구분한 펫 종류")
+    parser.add_argument("--levels", default="10,30", help="쉼표로 구분한 레벨 (양측 동일)")
+    parser.add_argument("--battles", type=int, default=100000, help="대진당 전투 수")
+    parser.add_argument("--skills", default="", help="기술 세트 재정의 (예: cat=125,130;dog=15,25)")
+    parser.add_argument("--weather", default="clear", choices=WEATHERS)
+    parser.add_argument("--location", default="stadium", choices=LOCATIONS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    pets = [p.strip() for p in args.pets.split(",") if p.strip()]
+    skills = _parse_skills(args.skills)
+    field = {"weather": args.weather, "location": args.location}
+
+    for level in (int(l) for l in args.levels.split(",")):
+        t0 = time.perf_counter()
+        matrix = win_rate_matrix(pets, level, args.battles, args.seed, skills, field)
+        elapsed = time.perf_counter() - t0
+
+        print(f"\n=== Lv{level} win rate (row P1 vs column P2, {args.battles} battles each, {elapsed:.1f}s) ===")
+        for p in pets:
+            print(f"  {p:>6}: skills {typical_fighter(p, level, skills.get(p)).skills}")
+        print(" " * 8 + "".join(f"{p:>8}" for p in pets))
+        for p1 in pets:
+            print(f"{p1:>8}" + "".join(f"{matrix[(p1, p2)]:>8.1%}" for p2 in pets))
+
+
+if __name__ == "__main__":
+    main()
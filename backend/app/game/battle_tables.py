@@ -0,0 +1,161 @@
+# backend/app/game/battle_tables.py
+"""
+컴파일된 전투 수치 테이블
+game_assets의 딕셔너리 데이터를 import 시 한 번 숫자 배열로 변환하여
+스칼라 엔진(BattleCalculator), 시뮬레이터, AI가 함께 사용합니다.
+
+- 타입: TYPES / TYPE_ID, 상성 행렬 TYPE_MATRIX[기술 타입, 방어 속성]
+- 필드: FIELD_MULT[날씨, 장소, 기술 타입] (날씨 배율 * 장소 배율)
+- 랭크: STAGE_MULT[stage + 6], 치명타 랭크 보너스 CRIT_BONUS[min(stage, 3)]
+- 기술: 기술 ID로 인덱싱하는 Struct of Arrays (MoveTable)
+
+NumPy 배열(배치 연산용)과 같은 내용의 파이썬 리스트(_PY, 스칼라 연산용)를 함께 제공합니다.
+파이썬 float 연산에 NumPy 스칼라가 섞이면 오히려 느려지기 때문입니다.
+"""
+import numpy as np
+from typing import Dict, NamedTuple
+from app.game.game_assets import (
+    MOVE_DATA, TYPE_CHART, FIELD_EFECTS, STAT_STAGES, STATUS_DATA, PET_TYPE_MAP
+)
+
+# --- 랭크 ---
+STAGE_KEYS = ("strength", "defense", "agility", "intelligence", "accuracy", "evasion", "crit_rate")
+STAGE_INDEX = {k: i for i, k in enumerate(STAGE_KEYS)}
+STR, DEF, AGI, INT, ACC, EVA, CRIT = range(len(STAGE_KEYS))
+
+STAGE_MULT = np.array([STAT_STAGES[s] for s in range(-6, 7)])  # index = stage + 6
+STAGE_MULT_PY = STAGE_MULT.tolist()
+CRIT_BONUS = np.array([0.0, 12.5, 50.0, 100.0])                 # index = min(crit stage, 3)
+CRIT_BONUS_PY = CRIT_BONUS.tolist()
+
+# --- 상태 이상 ---
+AILMENTS = (None,) + tuple(STATUS_DATA)  # 0 = 없음
+AILMENT_ID = {name: i for i, name in enumerate(AILMENTS)}
+DOT_AILMENTS = np.array([AILMENT_ID[s] for s in ("poison", "burn", "bleed")])
+
+# --- 타입 상성 ---
+TYPES = list(TYPE_CHART)
+for _elem in PET_TYPE_MAP.values():
+    if _elem not in TYPES:
+        TYPES.append(_elem)  # 상성표에 없는 펫 속성(earth, wind ...)은 항상 1.0
+TYPE_ID = {t: i for i, t in enumerate(TYPES)}
+NORMAL = TYPE_ID["normal"]
+
+TYPE_MATRIX = np.ones((len(TYPES), len(TYPES)))  # [공격 기술 타입, 방어 펫 속성]
+for _atk, _chart in TYPE_CHART.items():
+    # 우선순위: immune > weak > resist (나중에 덮어씀)
+    for _key, _mult in (("resist", 0.5), ("weak", 2.0), ("immune", 0.0)):
+        for _def in _chart.get(_key, []):
+            TYPE_MATRIX[TYPE_ID[_atk], TYPE_ID[_def]] = _mult
+TYPE_MATRIX_PY = TYPE_MATRIX.tolist()
+
+# --- 필드 (날씨 x 장소) ---
+WEATHERS = list(FIELD_EFECTS["weather"])
+LOCATIONS = list(FIELD_EFECTS["location"])
+WEATHER_ID = {w: i for i, w in enumerate(WEATHERS)}
+LOCATION_ID = {l: i for i, l in enumerate(LOCATIONS)}
+
+
+def _field_vector(chart: dict) -> np.ndarray:
+    vec = np.ones(len(TYPES))
+    for t, mult in chart.items():
+        if t in TYPE_ID:
+            vec[TYPE_ID[t]] = mult
+    return vec
+
+
+FIELD_MULT = np.array([
+    [_field_vector(FIELD_EFECTS["weather"][w]) * _field_vector(FIELD_EFECTS["location"][l]) for l in LOCATIONS]
+    for w in WEATHERS
+])  # [날씨, 장소, 기술 타입]
+FIELD_MULT_PY = FIELD_MULT.tolist()
+
+
+def field_ids(field_data: dict):
+    """{'weather': 'rain', 'location': 'cave'} -> (날씨 ID, 장소 ID), 모르는 값은 clear/stadium"""
+    return (
+        WEATHER_ID.get(field_data.get("weather", "clear"), WEATHER_ID["clear"]),
+        LOCATION_ID.get(field_data.get("location", "stadium"), LOCATION_ID["stadium"]),
+    )
+
+
+def element_id(pet_type: str) -> int:
+    return TYPE_ID.get(PET_TYPE_MAP.get(pet_type, "normal"), NORMAL)
+
+
+# --- 기술 (Struct of Arrays) ---
+PHYSICAL, SPECIAL, STATUS = 0, 1, 2
+CATEGORY_ID = {"physical": PHYSICAL, "special": SPECIAL, "status": STATUS}
+
+
+class MoveTable(NamedTuple):
+    known: object        # 정의된 기술 여부
+    power: object
+    accuracy: object
+    priority: object
+    category: object     # PHYSICAL / SPECIAL / STATUS
+    type: object         # TYPE_ID
+    hp_scaling: object   # HP가 낮을수록 위력 증가 (scaling == "hp_loss")
+    auto_hit: object     # 자기 대상 단일 효과 (명중 판정 생략)
+    effect_chance: object
+    effects: Dict[int, list]  # 효과 목록 (정규화된 list)
+
+    def has(self, move_id) -> bool:
+        return 0 <= move_id < len(self.known) and self.known[move_id]
+
+
+def _compile_moves() -> MoveTable:
+    size = max(MOVE_DATA) + 1
+    known = np.zeros(size, dtype=bool)
+    power = np.zeros(size)
+    accuracy = np.full(size, 100.0)
+    priority = np.zeros(size, dtype=np.int64)
+    category = np.full(size, PHYSICAL, dtype=np.int64)
+    mtype = np.full(size, NORMAL, dtype=np.int64)
+    hp_scaling = np.zeros(size, dtype=bool)
+    auto_hit = np.zeros(size, dtype=bool)
+    effect_chance = np.zeros(size)
+    effects = {}
+
+    for mid, m in MOVE_DATA.items():
+        known[mid] = True
+        power[mid] = m.get("power", 0)
+        accuracy[mid] = m.get("accuracy", 100)
+        priority[mid] = m.get("priority", 0)
+        category[mid] = CATEGORY_ID.get(m.get("category", "physical"), PHYSICAL)
+        mtype[mid] = TYPE_ID.get(m.get("type", "normal"), NORMAL)
+        hp_scaling[mid] = m.get("scaling") == "hp_loss"
+        eff = m.get("effect")
+        auto_hit[mid] = isinstance(eff, dict) and eff.get("target") == "self"
+        effect_chance[mid] = m.get("effect_chance", 0)
+        listed = eff if isinstance(eff, list) else [eff] if isinstance(eff, dict) else []
+        if listed:
+            effects[mid] = listed
+
+    return MoveTable(known, power, accuracy, priority, category, mtype, hp_scaling, auto_hit, effect_chance, effects)
+
+
+MOVES = _compile_moves()
+MOVES_PY = MoveTable(*(a.tolist() for a in MOVES[:-1]), MOVES.effects)
+_compiled_count = len(MOVE_DATA)
+
+
+def _refresh():
+    """실행 중 MOVE_DATA에 기술이 추가되면(테스트용 임시 기술 등) 다시 컴파일"""
+    global MOVES, MOVES_PY, _compiled_count
+    if len(MOVE_DATA) != _compiled_count:
+        MOVES = _compile_moves()
+        MOVES_PY = MoveTable(*(a.tolist() for a in MOVES[:-1]), MOVES.effects)
+        _compiled_count = len(MOVE_DATA)
+
+
+def moves_np() -> MoveTable:
+    """배치 연산용 기술 테이블 (NumPy 배열)"""
+    _refresh()
+    return MOVES
+
+
+def moves_py() -> MoveTable:
+    """스칼라 엔진용 기술 테이블 (파이썬 리스트)"""
+    _refresh()
+    return MOVES_PY
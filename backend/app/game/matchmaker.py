@@ -1,71 +1,254 @@
 # backend/app/game/matchmaker.py
-import asyncio
+"""
+분산 매치메이킹 (Redis Sorted Set)
+대기열을 워커 메모리 대신 Redis에 두어 모든 워커가 같은 대기열을 공유합니다.
+
+mm:queue  (ZSet) user_id -> 레이팅 (매칭 기준 점수, app.game.battle_rating)
+mm:joined (ZSet) user_id -> 대기 시작 시각 (대기 시간에 따라 매칭 범위 확장)
+mm:seen   (ZSet) user_id -> 마지막 생존 신호 (워커가 죽어 남은 항목 정리)
+mm:leader (String) 매칭 루프 리더 락
+
+- 매칭 루프는 모든 워커에서 돌지만 리더 락을 가진 워커 하나만 매칭합니다.
+- 오래 기다린 사람부터, 점수 차이가 허용 범위(BAND_BASE + 대기초 * BAND_PER_SEC, 최대 BAND_MAX) 안인
+  가장 가까운 상대와 짝지은 뒤 Lua로 두 명을 원자적으로 대기열에서 꺼냅니다.
+- 매칭 결과는 같은 워커의 대기자에게 바로, 다른 워커의 대기자에게는 Pub/Sub(matchmaking:{user_id})으로 전달합니다.
+"""
+import os
+import time
 import uuid
-from typing import List, Dict, Optional
-from fastapi import WebSocket
+import bisect
+import asyncio
+from typing import Dict, Optional
+from app.db.database_redis import RedisManager
+from app.db.redis_pubsub import hub as pubsub_hub
+from app.core.serialization import encode_text, loads
+
+QUEUE_KEY = "mm:queue"
+JOINED_KEY = "mm:joined"
+SEEN_KEY = "mm:seen"
+LEADER_KEY = "mm:leader"
+MATCH_CHANNEL_PREFIX = "matchmaking:"
+
+TICK_SEC = float(os.getenv("MATCH_TICK_SEC", "0.5"))
+BAND_BASE = float(os.getenv("MATCH_BAND_BASE", "50"))       # 처음 허용하는 레이팅 차이
+BAND_PER_SEC = float(os.getenv("MATCH_BAND_PER_SEC", "10")) # 대기 1초당 늘어나는 허용 범위
+BAND_MAX = float(os.getenv("MATCH_BAND_MAX", "400"))        # Elo 400 차이 = 기대 승률 약 91%
+HEARTBEAT_SEC = 15
+STALE_SEC = HEARTBEAT_SEC * 3
+LEADER_TTL_MS = 5000
+
+# 두 명이 모두 대기열에 있을 때만 함께 꺼냄 (다른 곳에서 이미 취소/매칭되었으면 0)
+_CLAIM_LUA = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) or not redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+    return 0
+end
+for i = 1, 3 do
+    redis.call('ZREM', KEYS[i], ARGV[1], ARGV[2])
+end
+return 1
+"""
+
+# 리더 락 연장 (소유자일 때만)
+_RENEW_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def band_for(wait_sec: float) -> float:
+    """대기 시간에 따른 허용 점수 차이"""
+    return min(BAND_MAX, BAND_BASE + max(0.0, wait_sec) * BAND_PER_SEC)
+
+
+def pair_players(entries: list, joined: Dict[str, float], now: float) -> list:
+    """
+    entries: [(user_id, score)] 점수 오름차순, joined: user_id -> 대기 시작 시각
+    오래 기다린 순서로 허용 범위 안의 가장 가까운 상대와 짝지은 [(a, b)] 반환
+    """
+    ids = [uid for uid, _ in entries]
+    scores = [score for _, score in entries]
+    index = {uid: i for i, uid in enumerate(ids)}
+    taken = set()
+    pairs = []
+
+    for uid in sorted(ids, key=lambda u: joined.get(u, now)):
+        if uid in taken:
+            continue
+        i = index[uid]
+        band = band_for(now - joined.get(uid, now))
+        lo = bisect.bisect_left(scores, scores[i] - band)
+        hi = bisect.bisect_right(scores, scores[i] + band)
+
+        # 점수가 가까운 쪽부터 바깥으로 탐색
+        best = None
+        left, right = i - 1, i + 1
+        while left >= lo or right < hi:
+            if left >= lo and ids[left] in taken:
+                left -= 1
+                continue
+            if right < hi and ids[right] in taken:
+                right += 1
+                continue
+            if right >= hi or (left >= lo and scores[i] - scores[left] <= scores[right] - scores[i]):
+                best = left
+            else:
+                best = right
+            break
+
+        if best is not None:
+            taken.update((uid, ids[best]))
+            pairs.append((uid, ids[best]))
+    return pairs
+
 
 class Matchmaker:
-    _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Matchmaker, cls).__new__(cls)
-            cls._instance.queue = [] # List of (user_id, websocket)
-            cls._instance.active_matches = {} # room_id -> [user_id, user_id]
-        return cls._instance
-
-    async def add_to_queue(self, user_id: int, websocket: WebSocket):
-        """대기열에 유저 추가 및 매칭 시도"""
-        # 이미 대기열에 있으면 제거 (갱신)
-        self.remove_from_queue(user_id)
-        
-        self.queue.append((user_id, websocket))
-        print(f"[Matchmaker] User {user_id} added to queue. Queue size: {len(self.queue)}")
-        
-        await self.check_match()
-
-    def remove_from_queue(self, user_id: int):
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self.waiters: Dict[int, asyncio.Future] = {}  # 이 워커에 접속한 대기자
+        self._task: Optional[asyncio.Task] = None
+        self._claim = None
+        self._renew = None
+
+    # --- 대기자 (웹소켓 엔드포인트) ---
+    async def add_to_queue(self, user_id: int, score: float) -> asyncio.Future:
+        """대기열에 등록하고 매칭 결과(MATCH_FOUND 메시지)를 받을 Future 반환"""
+        old = self.waiters.pop(user_id, None)
+        if old and not old.done():
+            old.cancel()
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[user_id] = future
+
+        now = time.time()
+        client = RedisManager.get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.zadd(QUEUE_KEY, {user_id: score})
+            pipe.zadd(JOINED_KEY, {user_id: now})
+            pipe.zadd(SEEN_KEY, {user_id: now})
+            await pipe.execute()
+        print(f"[Matchmaker] User {user_id} added to queue (score {score}).")
+        return future
+
+    async def heartbeat(self, user_id: int):
+        client = RedisManager.get_client()
+        await client.zadd(SEEN_KEY, {user_id: time.time()}, xx=True)
+
+    async def remove_from_queue(self, user_id: int):
         """대기열에서 유저 제거"""
-        self.queue = [p for p in self.queue if p[0] != user_id]
+        future = self.waiters.pop(user_id, None)
+        if future and not future.done():
+            future.cancel()
+        client = RedisManager.get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            for key in (QUEUE_KEY, JOINED_KEY, SEEN_KEY):
+                pipe.zrem(key, user_id)
+            await pipe.execute()
         print(f"[Matchmaker] User {user_id} removed from queue.")
 
-    async def check_match(self):
-        """대기열을 확인하여 2명이 모이면 매칭 성사"""
-        if len(self.queue) >= 2:
-            # 2명 추출
-            player1 = self.queue.pop(0)
-            player2 = self.queue.pop(0)
-            
-            p1_id, p1_ws = player1
-            p2_id, p2_ws = player2
-            
-            # 고유 Room ID 생성
-            room_id = str(uuid.uuid4())
-            print(f"\n[MATCH_DEBUG] =========================================")
-            print(f"🚩 매칭 성사! 방 ID: {room_id}")
-            print(f"🚩 플레이어 1: {p1_id}")
-            print(f"🚩 플레이어 2: {p2_id}")
-            print(f"========================================================\n")
-            
-            print(f"[Matchmaker] Match found! Room: {room_id}, Players: {p1_id} vs {p2_id}")
-            
-            # 매칭 정보 전송
-            match_data = {
-                "type": "MATCH_FOUND",
-                "room_id": room_id,
-                "opponent_id": p2_id # p1에게는 p2가 상대
-            }
-            try:
-                await p1_ws.send_json(match_data)
-                print(f"🚩 [MATCH_DEBUG] P1({p1_id})에게 MATCH_FOUND 전송 완료")
-            except Exception as e:
-                print(f"[Matchmaker] Failed to notify p1: {e}")
-                
-            match_data["opponent_id"] = p1_id # p2에게는 p1이 상대
+    async def queue_size(self) -> int:
+        return await RedisManager.get_client().zcard(QUEUE_KEY)
+
+    # --- 매칭 결과 전달 ---
+    def _resolve(self, user_id: int, message: dict) -> bool:
+        future = self.waiters.pop(user_id, None)
+        if future is None or future.done():
+            return False
+        future.set_result(message)
+        return True
+
+    async def _notify(self, user_id: int, message: dict):
+        if not self._resolve(user_id, message):
+            await pubsub_hub.publish(f"{MATCH_CHANNEL_PREFIX}{user_id}", user_id, encode_text(message))
+
+    async def on_match_event(self, channel: str, target: str, payload: str):
+        """다른 워커의 매칭 루프가 보낸 결과를 이 워커의 대기자에게 전달"""
+        self._resolve(int(target), loads(payload))
+
+    # --- 매칭 루프 (리더 워커만 실행) ---
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            client = RedisManager.get_client()
+            await client.eval(_RELEASE_LUA, 1, LEADER_KEY, self.worker_id)
+        except Exception:
+            pass
+
+    async def _is_leader(self, client) -> bool:
+        if self._renew is None:
+            self._renew = client.register_script(_RENEW_LUA)
+        if await self._renew(keys=[LEADER_KEY], args=[self.worker_id, LEADER_TTL_MS], client=client):
+            return True
+        return bool(await client.set(LEADER_KEY, self.worker_id, nx=True, px=LEADER_TTL_MS))
+
+    async def _run(self):
+        while True:
             try:
-                await p2_ws.send_json(match_data)
-                print(f"🚩 [MATCH_DEBUG] P2({p2_id})에게 MATCH_FOUND 전송 완료")
+                client = RedisManager.get_client()
+                if await self._is_leader(client):
+                    await self.match_once(client)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                print(f"[Matchmaker] Failed to notify p2: {e}")
+                print(f"[Matchmaker] Loop Error: {e}")
+            await asyncio.sleep(TICK_SEC)
+
+    async def match_once(self, client=None) -> int:
+        """대기열 전체를 한 번 훑어 매칭 (성사된 쌍 수 반환)"""
+        client = client or RedisManager.get_client()
+        now = time.time()
+
+        # 생존 신호가 끊긴 대기자 정리
+        stale = await client.zrangebyscore(SEEN_KEY, "-inf", now - STALE_SEC)
+        if stale:
+            async with client.pipeline(transaction=True) as pipe:
+                for key in (QUEUE_KEY, JOINED_KEY, SEEN_KEY):
+                    pipe.zrem(key, *stale)
+                await pipe.execute()
+
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zrange(QUEUE_KEY, 0, -1, withscores=True)
+            pipe.zrange(JOINED_KEY, 0, -1, withscores=True)
+            entries, joined = await pipe.execute()
+        if len(entries) < 2:
+            return 0
+
+        pairs = pair_players(entries, dict(joined), now)
+        if not pairs:
+            return 0
+
+        if self._claim is None:
+            self._claim = client.register_script(_CLAIM_LUA)
+        async with client.pipeline(transaction=False) as pipe:
+            for a, b in pairs:
+                await self._claim(keys=[QUEUE_KEY, JOINED_KEY, SEEN_KEY], args=[a, b], client=pipe)
+            claimed = await pipe.execute()
+
+        matched = 0
+        for (a, b), ok in zip(pairs, claimed):
+            if ok != 1:
+                continue
+            matched += 1
+            p1, p2 = int(a), int(b)
+            room_id = str(uuid.uuid4())
+            print(f"[Matchmaker] Match found! Room: {room_id}, Players: {p1} vs {p2}")
+            await self._notify(p1, {"type": "MATCH_FOUND", "room_id": room_id, "opponent_id": p2})
+            await self._notify(p2, {"type": "MATCH_FOUND", "room_id": room_id, "opponent_id": p1})
+        return matched
+
 
 matchmaker = Matchmaker()
+pubsub_hub.register(f"{MATCH_CHANNEL_PREFIX}*", matchmaker.on_match_event)
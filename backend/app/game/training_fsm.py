@@ -0,0 +1,360 @@
+# backend/app/game/training_fsm.py
+"""
+[Training FSM Engine]
+훈련 판정 상태 머신: READY → DETECTING → STAY → SUCCESS → COOLDOWN
+
+- 웹소켓/DB/LLM과 분리된 순수 로직입니다. 전이 함수는 시각(now)을 인자로 받고 I/O를 하지 않습니다.
+- 부수 효과(메시지 전송, LLM 호출, 베스트샷 저장, 보상 지급)는 Command 객체로 반환하고,
+  실제 실행은 소켓 계층(analysis_socket)이 담당합니다.
+- 시계(clock)를 주입할 수 있어, 녹화된 결과 스트림을 오프라인으로 재생(replay)할 수 있습니다.
+"""
+import time
+import random
+from typing import NamedTuple, Optional, Callable, Iterable, List, Tuple
+
+# --- 상태 ---
+READY = "READY"
+DETECTING = "DETECTING"
+STAY = "STAY"
+SUCCESS = "SUCCESS"
+COOLDOWN = "COOLDOWN"
+
+# --- 타이밍 상수 (초) ---
+STAY_HOLD_SEC = 3.0      # 자세 유지 시간
+GRACE_SEC = 0.8          # STAY 중 인식 끊김 허용 시간
+COOLDOWN_SEC = 3.0       # 성공 후 휴식 시간
+IDLE_SEC = 20.0          # 무반응 시 심심함 표현 주기
+LLM_COOLDOWN_SEC = 10.0  # 성공 외 LLM 메시지 최소 간격
+
+
+# --- Commands (소켓 계층이 실행할 부수 효과) ---
+class Send(NamedTuple):
+    """비전 결과(result) 위에 상태/메시지를 덮어써서 전송"""
+    status: str
+    message: Optional[str] = None
+    clear_message: bool = False  # True면 result의 message 제거 ('찾는 중' 메시지 억제)
+    specific: bool = False       # True면 is_specific_feedback 표시
+
+
+class TriggerLLM(NamedTuple):
+    """캐릭터 메시지 생성 요청 (쿨타임은 FSM이 이미 확인함)"""
+    action_type: str
+    is_success: bool = False
+    feedback: str = ""
+
+
+class CaptureBestShot(NamedTuple):
+    """현재 프레임을 베스트샷으로 저장"""
+    conf: float
+
+
+class DiscardBestShot(NamedTuple):
+    """저장된 베스트샷 폐기 (자세 유지 실패)"""
+
+
+class GrantReward(NamedTuple):
+    """훈련 성공: 보상 지급 + 성공 메시지 전송"""
+
+
+class SpeculateSuccess(NamedTuple):
+    """자세 유지 시작: 성공 메시지를 미리 생성 (STAY 3초 동안)"""
+
+
+class CancelSpeculation(NamedTuple):
+    """자세 유지 실패: 미리 생성 중인 성공 메시지 폐기"""
+
+
+DISCARD_BEST_SHOT = DiscardBestShot()
+GRANT_REWARD = GrantReward()
+SPECULATE_SUCCESS = SpeculateSuccess()
+CANCEL_SPECULATION = CancelSpeculation()
+
+
+class TrainingState:
+    """
+    훈련 세션 1개의 FSM 상태.
+    프레임마다 접근하므로 __slots__로 속성 딕셔너리 생성을 피합니다.
+    """
+    __slots__ = (
+        "phase", "phase_started", "last_detected", "last_interaction",
+        "last_llm", "best_conf", "has_best_shot"
+    )
+
+    def __init__(self, now: float = 0.0):
+        self.phase = READY
+        self.phase_started: Optional[float] = None   # STAY/COOLDOWN 시작 시각
+        self.last_detected: Optional[float] = None   # 마지막으로 '성공'을 감지한 시각
+        self.last_interaction = now                  # 마지막 상호작용 시각 (Idle 체크용)
+        self.last_llm = 0.0                          # 마지막 LLM 메시지 요청 시각
+        self.best_conf = 0.0
+        self.has_best_shot = False
+
+
+# --- 순수 전이 함수 ---
+def request_llm(state: TrainingState, now: float, out: list, action_type: str,
+                is_success: bool = False, feedback: str = ""):
+    """쿨타임 체크 후 LLM 요청 Command 추가 (성공은 즉시, 그 외 10초)"""
+    cooldown = 0.0 if is_success else LLM_COOLDOWN_SEC
+    if now - state.last_llm < cooldown:
+        return
+    state.last_llm = now
+    out.append(TriggerLLM(action_type, is_success, feedback))
+
+
+def check_idle(state: TrainingState, now: float, out: list):
+    """20초 이상 상호작용이 없으면 심심함 메시지 요청 후 타이머 재시작"""
+    if now - state.last_interaction > IDLE_SEC:
+        request_llm(state, now, out, "idle")
+        state.last_interaction = now
+
+
+def reset(state: TrainingState):
+    """모드 변경 등으로 판정을 처음부터 다시 시작"""
+    state.phase = READY
+    state.phase_started = None
+    state.last_detected = None
+    state.best_conf = 0.0
+    state.has_best_shot = False
+
+
+def advance(state: TrainingState, now: float, mode: str, vision_success: bool,
+            conf: float = 0.0, has_frame: bool = False, specific_feedback: bool = False,
+            out: Optional[list] = None) -> list:
+    """
+    비전 판정 결과 1건을 반영하여 상태를 전이하고 Command 목록을 반환합니다.
+    """
+    if out is None:
+        out = []
+
+    # --- COOLDOWN ---
+    if state.phase == COOLDOWN:
+        elapsed = now - state.phase_started
+        if elapsed >= COOLDOWN_SEC:
+            state.phase = READY
+            state.phase_started = None
+        else:
+            # [FIX] 'stay' 대신 'keep'을 사용하여 클라이언트 UI가 뒤로 돌아가는 현상 방지
+            out.append(Send("keep", f"잠시 휴식... {COOLDOWN_SEC - elapsed:.1f}초", specific=True))
+            return out
+
+    if vision_success:
+        state.last_interaction = now
+        state.last_detected = now
+
+        if state.phase == READY:
+            state.phase = DETECTING
+            out.append(Send("detecting", "동작 감지 시작!"))
+
+        elif state.phase == DETECTING:
+            state.phase = STAY
+            state.phase_started = now
+            out.append(Send("stay", "좋아요, 자세를 3초간 유지하세요!"))
+            out.append(SPECULATE_SUCCESS)
+
+        elif state.phase == STAY:
+            hold = now - state.phase_started
+            if hold >= STAY_HOLD_SEC:
+                state.phase = SUCCESS
+            else:
+                # [Best Shot] 첫 프레임 또는 더 좋은 프레임 저장
+                if has_frame and (not state.has_best_shot or conf > state.best_conf):
+                    state.best_conf = conf
+                    state.has_best_shot = True
+                    out.append(CaptureBestShot(conf))
+                out.append(Send("stay", f"자세 유지... {STAY_HOLD_SEC - hold:.1f}초"))
+
+    else:
+        if state.phase == STAY:
+            if now - state.last_detected > GRACE_SEC:
+                # [실패 전환]
+                state.phase = READY
+                state.phase_started = None
+                state.best_conf = 0.0
+                state.has_best_shot = False
+                out.append(DISCARD_BEST_SHOT)
+                out.append(CANCEL_SPECULATION)
+                out.append(Send("fail", "동작이 끊겼습니다."))
+                state.last_interaction = now
+                # 실패 시 격려 메시지
+                request_llm(state, now, out, mode, feedback="pose_unstable")
+            else:
+                # Grace Period
+                hold = now - state.phase_started
+                out.append(Send("stay", f"자세 유지... {1 - hold:.1f}초 (인식 불안정)"))
+
+        elif state.phase == DETECTING:
+            # 단순 감지 실패는 메시지 생성 안 함 (너무 빈번함)
+            state.phase = READY
+
+        if state.phase == READY:
+            # 단순 "찾는 중" 메시지는 보내지 않음 (캐릭터 대화 방해 방지)
+            out.append(Send("fail", clear_message=not specific_feedback))
+
+    # --- SUCCESS ---
+    if state.phase == SUCCESS:
+        state.last_interaction = now
+        out.append(GRANT_REWARD)
+        state.best_conf = 0.0
+        state.has_best_shot = False
+        # 성공 후 바로 READY가 아닌 COOLDOWN으로 전환
+        state.phase = COOLDOWN
+        state.phase_started = now
+        state.last_detected = None
+
+    return out
+
+
+def snapshot(state: TrainingState) -> list:
+    """세션 재개(Redis 체크포인트)용 압축 표현"""
+    return [
+        state.phase, state.phase_started, state.last_detected, state.last_interaction,
+        state.last_llm, state.best_conf, state.has_best_shot
+    ]
+
+
+def restore(data: list) -> TrainingState:
+    state = TrainingState()
+    (state.phase, state.phase_started, state.last_detected, state.last_interaction,
+     state.last_llm, state.best_conf, state.has_best_shot) = data
+    return state
+
+
+def fallback_reward(mode: str, rng=random) -> Optional[Tuple[str, dict, int]]:
+    """
+    Edge AI 클라이언트가 성공을 보고했지만 서버 로직이 보상을 만들지 못한 경우의 기본 보상.
+    Return: (action_type, base_reward, bonus_points) 또는 알 수 없는 모드면 None
+    """
+    roll = rng.random()
+    if mode == "playing":
+        reward = {"stat_type": "strength", "value": 3} if roll < 0.7 else {"stat_type": "agility", "value": 3}
+        return "playing_fetch", reward, 2
+    if mode == "feeding":
+        reward = {"stat_type": "health", "value": 3} if roll < 0.7 else {"stat_type": "defense", "value": 3}
+        return "feeding", reward, 1
+    if mode == "interaction":
+        reward = {"stat_type": "happiness", "value": 4} if roll < 0.7 else {"stat_type": "intelligence", "value": 3}
+        return "interaction_owner", reward, 3
+    return None
+
+
+class TrainingFSM:
+    """
+    시계를 주입받는 FSM 엔진. 프레임당 시계를 한 번만 읽습니다.
+
+    사용 예:
+        fsm = TrainingFSM(mode="playing")
+        commands = fsm.start()                      # 첫 인사
+        commands = fsm.step(result.get("success"))  # 매 프레임
+    """
+    __slots__ = ("state", "mode", "clock")
+
+    def __init__(self, mode: str = "playing", clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.mode = mode
+        self.state = TrainingState(clock())
+
+    @property
+    def phase(self) -> str:
+        return self.state.phase
+
+    def snapshot(self) -> list:
+        return [self.mode, snapshot(self.state)]
+
+    @classmethod
+    def resume(cls, data: list, clock: Callable[[], float] = time.time) -> "TrainingFSM":
+        """
+        체크포인트에서 FSM을 복원합니다. 시각은 벽시계(time.time) 기준이므로
+        다른 워커에서도 STAY/COOLDOWN 타이머가 그대로 이어집니다.
+        단, 끊겨 있는 동안 감지가 유예 시간을 넘겼다면 자세 유지는 실패로 처리합니다.
+        """
+        fsm = cls(mode=data[0], clock=clock)
+        fsm.state = restore(data[1])
+        state = fsm.state
+        if state.phase in (DETECTING, STAY) and (
+            state.last_detected is None or fsm.clock() - state.last_detected > GRACE_SEC
+        ):
+            reset(state)
+        return fsm
+
+    def start(self) -> list:
+        """연결 직후 인사 메시지 (Startup Silence 방지)"""
+        out = []
+        request_llm(self.state, self.clock(), out, "greeting")
+        return out
+
+    def change_mode(self, mode: str):
+        self.mode = mode
+        reset(self.state)
+
+    def note_best_shot(self, conf: float):
+        """Edge 모드: 클라이언트가 보낸 베스트샷을 기록"""
+        self.state.best_conf = conf
+        self.state.has_best_shot = True
+
+    def accept_client_success(self) -> bool:
+        """
+        Edge 클라이언트의 성공 판정(타이머 완료)을 수용합니다.
+        단, 서버 측 SUCCESS/COOLDOWN 중에는 무시하여 반복 보상을 막습니다.
+        """
+        if self.state.phase in (SUCCESS, COOLDOWN):
+            return False
+        self.state.phase = SUCCESS
+        return True
+
+    def step(self, vision_success: bool, conf: float = 0.0, has_frame: bool = False,
+             specific_feedback: bool = False, skipped: bool = False) -> list:
+        now = self.clock()
+        out = []
+        check_idle(self.state, now, out)
+        if skipped:
+            return out
+        return advance(self.state, now, self.mode, vision_success, conf, has_frame, specific_feedback, out)
+
+
+# --- Offline Replay ---
+class Frame(NamedTuple):
+    """녹화된 판정 결과 1건"""
+    t: float
+    success: bool
+    conf: float = 0.0
+    has_frame: bool = False
+    specific: bool = False
+    skipped: bool = False
+    client_success: bool = False
+
+
+class ReplayClock:
+    __slots__ = ("now",)
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def replay(frames: Iterable[Frame], mode: str = "playing", greet: bool = True) -> List[Tuple[float, object]]:
+    """
+    결과 스트림을 재생하여 (시각, Command) 목록을 반환합니다.
+    벤치마크 및 회귀 테스트용 (네트워크/DB 불필요).
+    """
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        return []
+
+    clock = ReplayClock(first.t)
+    fsm = TrainingFSM(mode=mode, clock=clock)
+    log = []
+    if greet:
+        log.extend((first.t, c) for c in fsm.start())
+
+    frame = first
+    while frame is not None:
+        clock.now = frame.t
+        if frame.client_success:
+            fsm.accept_client_success()
+        for c in fsm.step(frame.success, frame.conf, frame.has_frame, frame.specific, frame.skipped):
+            log.append((frame.t, c))
+        frame = next(frames, None)
+    return log
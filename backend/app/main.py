@@ -6,6 +6,7 @@ from requests import Request
 from dotenv import load_dotenv
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 
 # 현재 파일(main.py)의 위치: backend/app/main.py
@@ -18,8 +19,14 @@ from app.sockets.analysis_socket import router as websocket_router
 from app.sockets.battle_socket import router as battle_router
 from app.db.database import init_db
 from app.ai_core.vision import detector
+from app.ai_core.brain.prompt_builder import start_encoder_loader
 
 from app.db.database_redis import RedisManager # 추가
+from app.db.redis_pubsub import hub as pubsub_hub
+from app.game.matchmaker import matchmaker
+from app.game import battle_ai
+from app.game.battle_scheduler import scheduler as battle_scheduler
+from app.game.battle_rating import persister as rating_persister
 
 # Admin
 from sqladmin import Admin
@@ -27,7 +34,7 @@ from app.db.database import engine
 from app.admin_panel import UserAdmin, CharacterAdmin, StatAdmin, ActionLogAdmin, DiaryAdmin, DiaryLikeAdmin, NoticeAdmin
 
 
-app = FastAPI(title="PetTrainer API")
+app = FastAPI(title="PetTrainer API", default_response_class=ORJSONResponse)
 
 # Mount the 'uploads' directory to serve static files
 # This should be placed before the routers if there's any path conflict.
@@ -65,8 +72,18 @@ async def on_startup():
     서버가 시작될 때 초기화 작업을 수행합니다.
     1. DB 초기화 (테이블 생성 및 기본 데이터 시딩)
     2. AI 모델 프리로딩 (첫 요청 지연 방지)
+    3. 워커 공용 Redis Pub/Sub 구독 시작 (워커 간 배틀 메시지, 채팅 알림 전달)
+    4. 매치메이킹 루프 시작 (리더 워커 하나만 매칭)
+    5. 배틀 턴 스케줄러 시작 (턴 시간 초과 자동 선택, 방치된 방 정리)
+    6. 레이팅 리더보드 복구(비어 있으면 DB에서) 및 주기적 DB 저장 시작
+    7. 프롬프트 토큰 계산용 tiktoken 인코딩 로드 (백그라운드 스레드)
     """
     await init_db()
+    await pubsub_hub.start()
+    await matchmaker.start()
+    await battle_scheduler.start()
+    await rating_persister.start()
+    start_encoder_loader()
     
     # YOLO 모델을 메모리에 미리 로드합니다.
     # 이렇게 하면 첫 번째 사용자 요청 시 모델 로딩으로 인한 딜레이가 발생하지 않습니다.
@@ -102,6 +119,11 @@ async def on_shutdown():
     """
     서버 종료 시 리소스를 안전하게 해제합니다.
     """
+    await matchmaker.stop()
+    await battle_scheduler.stop()
+    await rating_persister.stop()
+    await pubsub_hub.stop()
+    battle_ai.shutdown()
     await RedisManager.close() # Redis 연결 풀 닫기
 
 @app.middleware("http")
@@ -5,6 +5,45 @@ from datetime import datetime
 from app.game.game_assets import PET_LEARNSET
 from sqlalchemy.orm import Session, selectinload
 
+TRAINING_STATS = ("strength", "intelligence", "agility", "defense", "luck", "happiness", "health")
+
+def compute_training_reward(stat: Stat, yolo_result: dict) -> dict:
+    """
+    훈련 성공 보상 규칙 (순수 함수, DB 변경 없음)
+    update_stats_from_yolo_result(적용)와 project_training_reward(추측 생성용 예측)가 함께 사용합니다.
+    Return: {"stat_type": 올릴 스탯(알 수 없으면 None), "value": 반영 후 값, "bonus_points": int, "milestone_reached": bool}
+    """
+    base_reward = yolo_result.get("base_reward", {})
+    if base_reward:
+        stype = base_reward.get("stat_type")
+        if stype not in TRAINING_STATS:
+            stype = None
+        value = getattr(stat, stype) + base_reward.get("value", 0) if stype else 0
+        # [New] Bonus Points for User Distribution
+        bonus = yolo_result.get("bonus_points", 0)
+    else:
+        # 보상 정보가 없는 경우 기본값 (안전장치)
+        stype, value, bonus = "strength", stat.strength + 1, 0
+
+    # 마일스톤(목표 달성): 스탯이 10단위(10, 20, 30...)에 도달했을 때 이펙트 발생
+    return {
+        "stat_type": stype,
+        "value": value,
+        "bonus_points": bonus,
+        "milestone_reached": value > 0 and value % 10 == 0,
+    }
+
+async def _count_today_actions(db: AsyncSession, char_id: int, action_type: str) -> int:
+    """오늘(UTC 날짜 기준) 같은 행동을 수행한 횟수"""
+    today_start = datetime.utcnow().date()
+    stmt = select(func.count(ActionLog.id)).where(
+        ActionLog.character_id == char_id,
+        ActionLog.action_type == action_type,
+        ActionLog.created_at >= today_start
+    )
+    count_res = await db.execute(stmt)
+    return count_res.scalar_one()
+
 async def update_stats_from_yolo_result(db: AsyncSession, char_id: int, yolo_result: dict):
     """
     YOLO 분석 결과(성공 시)를 바탕으로 캐릭터의 스탯을 업데이트하고 행동 로그를 저장합니다.
@@ -33,44 +72,12 @@ async def update_stats_from_yolo_result(db: AsyncSession, char_id: int, yolo_res
     )
     db.add(action_log)
     
-    # 3. 스탯 업데이트 (base_reward 정보 활용)
-    base_reward = yolo_result.get("base_reward", {})
-    updated_stat_val = 0
-    
-    if base_reward:
-        stype = base_reward.get("stat_type")
-        val = base_reward.get("value", 0)
-        
-        if stype == "strength":     # 근력
-            stat.strength += val
-            updated_stat_val = stat.strength
-        elif stype == "intelligence": # 지능
-            stat.intelligence += val
-            updated_stat_val = stat.intelligence
-        elif stype == "agility":    # 민첩
-            stat.agility += val
-            updated_stat_val = stat.agility
-        elif stype == "defense":    # 방어
-            stat.defense += val
-            updated_stat_val = stat.defense
-        elif stype == "luck":       # 운
-            stat.luck += val
-            updated_stat_val = stat.luck
-        elif stype == "happiness":  # 행복도
-            stat.happiness += val
-            updated_stat_val = stat.happiness
-        elif stype == "health":     # 체력
-            stat.health += val
-            updated_stat_val = stat.health
-            
-        # [New] Bonus Points for User Distribution
-        bonus = yolo_result.get("bonus_points", 0)
-        if bonus > 0:
-            stat.unused_points += bonus
-    else:
-        # 보상 정보가 없는 경우 기본값 (안전장치)
-        stat.strength += 1
-        updated_stat_val = stat.strength
+    # 3. 스탯 업데이트 (base_reward 정보 활용, 규칙은 compute_training_reward)
+    reward = compute_training_reward(stat, yolo_result)
+    if reward["stat_type"]:
+        setattr(stat, reward["stat_type"], reward["value"])
+    if reward["bonus_points"] > 0:
+        stat.unused_points += reward["bonus_points"]
 
     # [Fix] Grant EXP for Training Success
     # Training grants 30 EXP by default
@@ -88,36 +95,55 @@ async def update_stats_from_yolo_result(db: AsyncSession, char_id: int, yolo_res
         level_up_info = await _give_exp_and_levelup(db, character, exp_gain) 
         
         # No need to refresh stat manually if object is same session attached
-    
-        
-    # 4. 마일스톤(목표 달성) 체크
-    # 예: 스탯이 10단위(10, 20, 30...)에 도달했을 때 이펙트 발생
-    milestone_reached = False
-    if updated_stat_val > 0 and updated_stat_val % 10 == 0:
-        milestone_reached = True
 
-    # 5. DB 커밋 및 갱신
+    # 4. DB 커밋 및 갱신
     await db.commit()
     await db.refresh(stat)
     
-    # 6. 일일 수행 횟수 계산 (오늘 날짜 기준)
-    today_start = datetime.utcnow().date()
-    
-    stmt = select(func.count(ActionLog.id)).where(
-        ActionLog.character_id == char_id,
-        ActionLog.action_type == action_type,
-        ActionLog.created_at >= today_start
-    )
-    count_res = await db.execute(stmt)
-    daily_count = count_res.scalar_one()
+    # 5. 일일 수행 횟수 계산 (오늘 날짜 기준)
+    daily_count = await _count_today_actions(db, char_id, action_type)
 
     return {
         "stat": stat,
         "daily_count": daily_count,
-        "milestone_reached": milestone_reached,
+        "milestone_reached": reward["milestone_reached"],
         "level_up_info": level_up_info # Pass this up
     }
 
+async def project_training_reward(db: AsyncSession, char_id: int, yolo_result: dict):
+    """
+    update_stats_from_yolo_result를 적용했을 때의 결과를 DB 변경 없이 예측합니다.
+    (STAY 단계에서 성공 메시지를 미리 생성하기 위한 읽기 전용 조회)
+    Return: {"stats": {...}, "daily_count": int, "milestone_reached": bool} 또는 None
+    """
+    stmt = select(Character).options(selectinload(Character.stat)).where(Character.id == char_id)
+    result = await db.execute(stmt)
+    character = result.scalar_one_or_none()
+    if not character or not character.stat:
+        return None
+
+    stat = character.stat
+    projected = {
+        "strength": stat.strength,
+        "health": stat.health,
+        "happiness": stat.happiness
+    }
+
+    # 보상 반영 (update_stats_from_yolo_result와 같은 compute_training_reward 사용)
+    reward = compute_training_reward(stat, yolo_result)
+    if reward["stat_type"] in projected:
+        projected[reward["stat_type"]] = reward["value"]
+
+    # 오늘 수행 횟수 (+1 = 이번 성공)
+    action_type = yolo_result.get("action_type", "unknown")
+    daily_count = await _count_today_actions(db, char_id, action_type) + 1
+
+    return {
+        "stats": projected,
+        "daily_count": daily_count,
+        "milestone_reached": reward["milestone_reached"]
+    }
+
 async def get_character(db: AsyncSession, char_id: int):
     """
     캐릭터 정보와 스탯을 함께 조회합니다.
@@ -188,6 +214,10 @@ async def create_character(db: AsyncSession, user_id: int, name: str, pet_type:
         await check_and_unlock_skills(db, existing_char, stat.level if stat else 5)
         
         await db.commit()
+
+        # 펫/기술이 초기화되었으므로 배틀 카드도 다시 만들도록 삭제
+        from app.game import battle_card
+        await battle_card.invalidate_card(user_id)
         return await get_character(db, existing_char.id)
 
     # 3. 캐릭터 생성
@@ -339,6 +369,11 @@ async def _give_exp_and_levelup(db: AsyncSession, character: Character, exp_gain
         level_up_occurred = True 
 
     await db.commit()
+
+    # 배틀 카드(기술 상세)는 레벨업/해금 시점에 미리 갱신
+    if level_up_occurred:
+        from app.game import battle_card
+        await battle_card.refresh_card(character)
     
     print(f"[DEBUG] Final Result - New Skills: {newly_acquired_skills_info}")
 
@@ -406,6 +441,9 @@ async def update_character_image_urls(db: AsyncSession, char_id: int, image_urls
     
     await db.commit()
     await db.refresh(character)
+
+    from app.game import battle_card
+    await battle_card.invalidate_card(character.user_id)
     return character
 
 async def delete_character(db: AsyncSession, char_id: int) -> bool:
@@ -437,4 +475,7 @@ async def check_and_unlock_skills(db: Session, character: Character, current_lev
         character.learned_skills = updated_learned_skills
         db.add(character)
         await db.commit()
-        print(f"--- [해금 성공] 새 스킬이 추가되었습니다: {updated_learned_skills} ---")
\ No newline at end of file
+        print(f"--- [해금 성공] 새 스킬이 추가되었습니다: {updated_learned_skills} ---")
+
+        from app.game import battle_card
+        await battle_card.refresh_card(character)
\ No newline at end of file
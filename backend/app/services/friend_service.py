@@ -45,15 +45,17 @@ async def accept_friend(db: AsyncSession, receiver_id: int, requester_id: int):
     await db.commit()
     return {"message": "Friend request accepted", "status": "success"}
 
-async def get_friends(db: AsyncSession, user_id: int):
+async def get_friend_ids(db: AsyncSession, user_id: int) -> list:
     stmt = select(Friendship).where(
         or_(Friendship.requester_id == user_id, Friendship.receiver_id == user_id),
         Friendship.status == "accepted"
     )
     result = await db.execute(stmt)
     friendships = result.scalars().all()
-    
-    friend_ids = [f.receiver_id if f.requester_id == user_id else f.requester_id for f in friendships]
+    return [f.receiver_id if f.requester_id == user_id else f.requester_id for f in friendships]
+
+async def get_friends(db: AsyncSession, user_id: int):
+    friend_ids = await get_friend_ids(db, user_id)
             
     if not friend_ids:
         return []
@@ -0,0 +1,118 @@
+# backend/app/services/training_session_service.py
+"""
+훈련(분석 소켓) 세션 체크포인트 저장소
+모바일 네트워크가 잠깐 끊겨도 재접속 시(다른 uvicorn 워커 포함) FSM 단계, 추적 이력,
+쿨다운 타이머, 베스트샷을 이어서 사용할 수 있도록 Redis에 세션 토큰 단위로 저장합니다.
+
+- training_session:{token}       : [버전, user_id, FSM 스냅샷, 추적 상태] (JSON 배열)
+- training_session:{token}:shot  : 베스트샷 이미지 (Base64, 변경됐을 때만 기록)
+- training_session:{token}:gen   : 세션을 소유한 연결의 세대 번호 (접속/재접속마다 증가)
+
+재접속한 새 연결이 세대를 올리면, 아직 정리 중인 이전 연결의 마지막 체크포인트는
+세대가 달라 기록되지 않습니다. (새 연결의 상태를 옛 상태로 덮어쓰지 않음)
+"""
+import os
+import uuid
+import base64
+from typing import Optional
+from app.db.database_redis import RedisManager
+from app.core.serialization import encode_text, loads
+
+SESSION_TTL = int(os.getenv("TRAINING_SESSION_TTL", "180"))  # 초
+SNAPSHOT_VERSION = 1
+
+
+def new_session_token() -> str:
+    return uuid.uuid4().hex
+
+
+def _key(token: str) -> str:
+    return f"training_session:{token}"
+
+
+# 세대가 일치할 때만 체크포인트 기록
+# KEYS: 세션, 베스트샷, 세대 / ARGV: 세대, 스냅샷, TTL, 베스트샷 처리(keep|set|del), 베스트샷
+_SAVE_LUA = """
+if redis.call('GET', KEYS[3]) ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+if ARGV[4] == 'set' then
+    redis.call('SET', KEYS[2], ARGV[5], 'EX', ARGV[3])
+elseif ARGV[4] == 'del' then
+    redis.call('DEL', KEYS[2])
+else
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+return 1
+"""
+
+_save_script = None
+
+
+async def claim_session(token: str) -> int:
+    """이 연결을 세션의 소유자로 등록하고 세대 번호를 반환 (이전 연결의 체크포인트는 이후 무시됨)"""
+    client = RedisManager.get_client()
+    try:
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.incr(f"{_key(token)}:gen")
+            pipe.expire(f"{_key(token)}:gen", SESSION_TTL)
+            generation, _ = await pipe.execute()
+        return generation
+    except Exception as e:
+        # 세대 0은 어떤 저장도 통과하지 못함 (체크포인트 없이 훈련은 계속 진행)
+        print(f"[Session] Claim Error: {e}")
+        return 0
+
+
+async def save_session(token: str, generation: int, user_id: int, fsm_snapshot: list, tracking: list,
+                       best_shot: Optional[bytes] = None, best_shot_dirty: bool = False) -> bool:
+    """
+    세션 상태를 체크포인트합니다. (Lua 1회 왕복)
+    베스트샷은 크기가 크므로 best_shot_dirty일 때만 다시 씁니다.
+    더 새로운 연결이 세션을 가져갔으면(세대 불일치) 기록하지 않고 False.
+    """
+    global _save_script
+    client = RedisManager.get_client()
+    if _save_script is None:
+        _save_script = client.register_script(_SAVE_LUA)
+    key = _key(token)
+    payload = encode_text([SNAPSHOT_VERSION, user_id, fsm_snapshot, tracking])
+
+    shot_mode, shot = "keep", ""
+    if best_shot_dirty:
+        if best_shot:
+            shot_mode, shot = "set", base64.b64encode(best_shot).decode("ascii")
+        else:
+            shot_mode = "del"
+    saved = await _save_script(
+        keys=[key, f"{key}:shot", f"{key}:gen"],
+        args=[generation, payload, SESSION_TTL, shot_mode, shot],
+        client=client
+    )
+    return saved == 1
+
+
+async def load_session(token: str, user_id: int) -> Optional[dict]:
+    """
+    세션을 불러옵니다. 토큰이 만료되었거나 다른 유저의 세션이면 None.
+    Return: {"fsm": [...], "tracking": [...], "best_shot": bytes | None}
+    """
+    client = RedisManager.get_client()
+    key = _key(token)
+    try:
+        raw, shot = await client.mget(key, f"{key}:shot")
+        if not raw:
+            return None
+        version, owner_id, fsm_snapshot, tracking = loads(raw)
+        if version != SNAPSHOT_VERSION or owner_id != user_id:
+            return None
+        return {
+            "fsm": fsm_snapshot,
+            "tracking": tracking,
+            "best_shot": base64.b64decode(shot) if shot else None,
+        }
+    except Exception as e:
+        print(f"[Session] Load Error: {e}")
+        return None
@@ -1,10 +1,10 @@
 # backend/app/sockets/analysis_socket.py
-import json
 import time
+import random
 import asyncio
 from fastapi import Depends
 from app.db.database import get_db
-from app.services import char_service
+from app.services import char_service, training_session_service
 from app.ai_core.vision import detector
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import AsyncSessionLocal
@@ -12,25 +12,61 @@ from app.db.database_redis import RedisManager
 from app.core.pet_constants import PET_CLASS_MAP
 from fastapi.concurrency import run_in_threadpool
 from app.core.security import verify_websocket_token
-from app.ai_core.brain.graphs import get_character_response
+from app.core.serialization import send_json, loads
+from app.ai_core.brain.graphs import (
+    prepare_character_response, commit_character_response, discard_character_response,
+    speculation_key, RULE_TEMPLATES
+)
+from app.ai_core.brain.dispatcher import dispatcher, priority_for, PRIORITY_SUCCESS
+from app.ai_core.brain.response_cache import response_cache
+from app.ai_core.brain import coalescer
+from app.game.training_fsm import (
+    TrainingFSM, Send, TriggerLLM, CaptureBestShot, DiscardBestShot, GrantReward,
+    SpeculateSuccess, CancelSpeculation, fallback_reward
+)
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 router = APIRouter()
 
-        
+# 성공 메시지 추측 생성 지표 (워커 누적)
+SPECULATION_METRICS = {"started": 0, "hit": 0, "miss": 0, "discarded": 0}
+
+
+@router.get("/analysis/llm/metrics")
+async def get_llm_metrics():
+    """
+    LLM 디스패처 및 응답 캐시 지표 (현재 워커 기준)
+    queued/in_flight는 현재 값, 나머지는 누적 카운터입니다.
+    """
+    judged = SPECULATION_METRICS["hit"] + SPECULATION_METRICS["miss"]
+    return {
+        **dispatcher.metrics(),
+        "response_cache": response_cache.metrics(),
+        "coalescer": coalescer.metrics(),
+        "speculation": {
+            **SPECULATION_METRICS,
+            "hit_rate": round(SPECULATION_METRICS["hit"] / judged, 4) if judged else 0.0
+        }
+    }
+
+
 @router.websocket("/ws/analysis/{user_id}")
 async def analysis_endpoint(
-    websocket: WebSocket, 
-    user_id: int, 
-    mode: str = "playing", 
-    pet_type: str = "none", 
-    difficulty: str = "easy", 
+    websocket: WebSocket,
+    user_id: int,
+    mode: str = "playing",
+    pet_type: str = "none",
+    difficulty: str = "easy",
     token: str | None = None,
+    session: str | None = None,
+    stream: bool = False,
     db: AsyncSession = Depends(get_db)
     ):
     """
     실시간 분석을 위한 웹소켓 엔드포인트입니다.
     클라이언트(Flutter)로부터 실시간 카메라 프레임을 받아 AI로 분석하고 결과를 반환합니다.
+    판정 상태 머신은 app.game.training_fsm.TrainingFSM이 담당하고,
+    이 핸들러는 FSM이 반환한 Command(전송, LLM, 베스트샷, 보상)를 실행합니다.
 
     Args:
         websocket: 웹소켓 연결 객체
@@ -39,6 +75,8 @@ async def analysis_endpoint(
         pet_type: 반려동물 종류 ('dog', 'cat') - YOLO 클래스 ID 매핑에 사용
         difficulty: 난이도 ('easy', 'hard') - 판정 기준 완화/강화
         token: 보안 검증용 토큰 (Optional)
+        session: 이전 연결에서 받은 세션 토큰 (Optional) - 재접속 시 훈련 상태 이어하기
+        stream: True면 LLM 대사를 char_message_delta 프레임으로 스트리밍하고 char_message_done으로 마무리
     """
     try:
         # [Security] 연결 수락 전 토큰 검증
@@ -58,47 +96,39 @@ async def analysis_endpoint(
     # [TEST] Force Auto-Detection (Detect Dog/Cat/Bird dynamically)
     # Original: target_class_id = PET_CLASS_MAP.get(pet_type.lower(), 16)
     target_class_id = -1
-    
-    # --- FSM 상태 변수 ---
-    state = "READY"              # 현재 상태: READY, DETECTING, STAY, SUCCESS
-    state_start_time = None      # STAY 상태 시작 시간
-    last_detected_time = None    # 마지막으로 '성공'을 감지한 시간
-    
-    # --- LLM 연동 변수 [NEW] ---
-    last_llm_time = 0            # 마지막 메시지 전송 시각
-    last_interaction_time = time.time() # 마지막 FSM 상태 변화 시각 (Idle 체크용)
-    llm_task = None              # 비동기 LLM 태스크 (Fire-and-forget)
-
-    # --- 헬퍼 함수: LLM 트리거 ---
-    async def trigger_llm(action_type, is_success=False, reward=None, feedback="", milestone=False):
-        nonlocal last_llm_time
-        current_now = time.time()
-        
-        # 쿨타임 체크 (성공이 아닌 경우 10초, 성공은 즉시)
-        cooldown = 10 if not is_success else 0
-        if current_now - last_llm_time < cooldown:
-            return
 
-        last_llm_time = current_now
-        
+    # --- FSM 엔진 (READY → DETECTING → STAY → SUCCESS → COOLDOWN) ---
+    fsm = TrainingFSM(mode=mode)
+
+    # --- LLM 호출 핸들 (세션별 최신 요청 우선, 전역 동시성 제한, 종료 시 취소) ---
+    llm_session = dispatcher.session(user_id)
+
+    # --- [Streaming] 토큰 단위 대사 전송 (opt-in) ---
+    async def send_delta(token: str):
+        await send_json(websocket, {"status": "keep", "char_message_delta": token})
+
+    on_token = send_delta if stream else None
+
+    # --- 헬퍼 함수: LLM 트리거 (쿨타임은 FSM이 판단) ---
+    def trigger_llm(action_type, is_success=False, reward=None, feedback="", milestone=False):
         # 비동기 실행을 위해 별도 함수로 래핑
         async def run_llm():
             try:
                 # DB에서 최신 스탯 조회 (읽기 전용 세션)
                 async with AsyncSessionLocal() as db:
                     char_stats = {"strength": 0, "happiness": 0} # Default
-                    
+
                      # [Fix] user_id로 캐릭터 조회 후 char_id 사용
-                    # get_character는 char_id를 받도록 설계되어 있음. 
-                    
+                    # get_character는 char_id를 받도록 설계되어 있음.
+
                     # 따라서 먼저 user_id에 해당하는 캐릭터를 찾아야 함.
                     from sqlalchemy import select
                     from app.db.models.character import Character
-                    
+
                     stmt = select(Character).where(Character.user_id == user_id)
                     result = await db.execute(stmt)
                     character_obj = result.scalar_one_or_none()
-                    
+
                     if character_obj:
                          # 캐릭터가 있으면 스탯 로딩
                          character = await char_service.get_character(db, character_obj.id)
@@ -110,39 +140,43 @@ async def analysis_endpoint(
                                 "happiness": character.stat.happiness,
                                 "health": character.stat.health
                             }
-                        
-                    msg = await get_character_response(
-                        user_id=user_id, # [New] Context Memory Key
+
+                    prepared = await prepare_character_response(
+                        user_id, # [New] Context Memory Key
+                        on_token=on_token,
                         action_type=action_type,
                         current_stats=char_stats,
-                        mode=mode,
+                        mode=fsm.mode,
                         is_success=is_success,
                         reward_info=reward or {},
                         feedback_detail=feedback,
                         milestone_reached=milestone
                     )
-                    
+                    if prepared is None:
+                        return  # 같은 사용자의 더 새로운 요청으로 병합됨
+                    msg = await commit_character_response(prepared)
+
                     # 소켓 전송 (비동기)
                     # [Safety] 연결 상태 확인
                     from fastapi.websockets import WebSocketState
                     if websocket.client_state == WebSocketState.CONNECTED:
-                        await websocket.send_json({
+                        payload = {
                             "char_message": msg,  # [Change] chat_message -> char_message
                             "message": "AI: " + msg[:15] + "...", # 시스템 로그용 요약
                             "status": "keep" # 상태 유지
-                        })
+                        }
+                        if prepared.streamed:
+                            # 스트리밍 종료 표시 (char_message는 최종 전체 문장)
+                            payload["char_message_done"] = True
+                        await send_json(websocket, payload)
                     else:
                         print(f"[LLM_SKIP] 소켓 연결 끊김 (User {user_id})")
             except Exception as ex:
                 print(f"[LLM_ERROR] {ex}")
 
-        # 백그라운드 태스크 생성
-        asyncio.create_task(run_llm())
+        # 디스패처에 예약 (우선순위가 낮으면 버려짐)
+        llm_session.submit(priority_for(action_type, is_success), run_llm)
 
-    # [NEW] 연결 직후 초기 인사 (Greeting)
-    # 앱 시작 시 침묵(Startup Silence) 방지
-    await trigger_llm("greeting", is_success=False)
-    
     # [NEW] Anti-Flickering State
     vision_state = {
         "last_pet_box": None,
@@ -154,171 +188,360 @@ async def analysis_endpoint(
         "best_bbox": []          # [NEW] Best Shot BBox for cropping (Optional)
     }
 
-    
+    # [Session Resume] 재접속 세션 복원 (FSM 단계, 추적 이력, 쿨다운 타이머, 베스트샷)
+    restored = None
+    if session:
+        restored = await training_session_service.load_session(session, user_id)
+    if restored:
+        fsm = TrainingFSM.resume(restored["fsm"])
+        if fsm.mode != mode:
+            fsm.change_mode(mode)
+        detector.restore_tracking_state(vision_state, restored["tracking"])
+        if restored["best_shot"] and fsm.state.has_best_shot:
+            vision_state["best_frame_data"] = restored["best_shot"]
+            vision_state["best_conf"] = fsm.state.best_conf
+        session_token = session
+        print(f"[FSM_WS] User {user_id} 세션 복원: {fsm.phase}", flush=True)
+    else:
+        session_token = training_session_service.new_session_token()
+    # 이 연결이 세션 소유자 (재접속한 새 연결이 있으면 이 연결의 체크포인트는 무시됨)
+    session_generation = await training_session_service.claim_session(session_token)
+
+    best_shot_dirty = False      # 마지막 체크포인트 이후 베스트샷 변경 여부
+    checkpoint_phase = fsm.phase # 마지막 체크포인트 시점의 FSM 단계
+
+    async def checkpoint():
+        nonlocal best_shot_dirty, checkpoint_phase
+        try:
+            await training_session_service.save_session(
+                session_token, session_generation, user_id, fsm.snapshot(),
+                detector.export_tracking_state(vision_state),
+                best_shot=vision_state["best_frame_data"],
+                best_shot_dirty=best_shot_dirty
+            )
+            best_shot_dirty = False
+            checkpoint_phase = fsm.phase
+        except Exception as e:
+            print(f"[Session] Save Error: {e}")
+
+    def reset_best_shot():
+        nonlocal best_shot_dirty
+        vision_state["best_frame_data"] = None
+        vision_state["best_conf"] = 0.0
+        best_shot_dirty = True
+
+    # --- 성공 메시지 추측 생성 (STAY 진입 시 시작 → 성공 시 사용, 자세 유지 실패 시 폐기) ---
+    # {"reward": (action_type, base_reward, bonus_points), "key": 예측 상황 키, "task": 디스패처 태스크}
+    speculation = None
+
+    def drop_speculation_task(task: asyncio.Future):
+        """추측 생성 태스크 취소 (이미 끝난 결과는 기록하지 않고 사용자 차례만 반환)"""
+        def discard(done: asyncio.Future):
+            if not done.cancelled() and done.exception() is None and done.result() is not None:
+                asyncio.create_task(discard_character_response(done.result()))
+        task.add_done_callback(discard)
+        task.cancel()
+
+    def cancel_speculation():
+        nonlocal speculation
+        if speculation is not None:
+            drop_speculation_task(speculation["task"])
+            SPECULATION_METRICS["discarded"] += 1
+            speculation = None
+
+    def speculate_success(result: dict, has_best_shot: bool):
+        nonlocal speculation
+        cancel_speculation()
+        if not result or not result.get("base_reward"):
+            return
+        spec = {
+            "reward": (result.get("action_type"), result["base_reward"], result.get("bonus_points", 0)),
+            "key": None,
+            "task": None
+        }
+
+        async def run_speculation():
+            # 보상 적용 결과를 DB 변경 없이 예측한 뒤 성공 메시지 생성 (기록은 성공 시에만)
+            async with AsyncSessionLocal() as db:
+                from sqlalchemy import select
+                from app.db.models.character import Character
+                char_res = await db.execute(select(Character.id).where(Character.user_id == user_id))
+                char_id = char_res.scalar_one_or_none()
+                if char_id is None:
+                    return None
+                projected = await char_service.project_training_reward(db, char_id, result)
+            if not projected:
+                return None
+
+            kwargs = dict(
+                action_type=(spec["reward"][0] or "action").replace("_", " ").title(),
+                current_stats=projected["stats"],
+                mode=fsm.mode,
+                is_success=True,
+                reward_info=spec["reward"][1],
+                daily_count=projected["daily_count"],
+                milestone_reached=projected["milestone_reached"],
+                best_shot_url="speculative" if has_best_shot else None
+            )
+            spec["key"] = speculation_key(**kwargs)
+            return await prepare_character_response(user_id, **kwargs)
+
+        spec["task"] = llm_session.submit(PRIORITY_SUCCESS, run_speculation)
+        if spec["task"] is not None:
+            speculation = spec
+            SPECULATION_METRICS["started"] += 1
+
+    async def take_speculation(kwargs: dict):
+        """추측 생성 결과가 실제 상황과 같으면 사용, 다르면 폐기 (None)"""
+        nonlocal speculation
+        spec, speculation = speculation, None
+        if spec is None:
+            return None
+        task = spec["task"]
+        if spec["key"] is not None and spec["key"] == speculation_key(**kwargs):
+            await asyncio.wait((task,))
+            if not task.cancelled() and task.result() is not None:
+                SPECULATION_METRICS["hit"] += 1
+                return task.result()
+        drop_speculation_task(task)
+        SPECULATION_METRICS["miss"] += 1
+        return None
+
+    # --- 성공 처리: DB 보상 → 베스트샷 저장 → LLM → 일기 ---
+    async def handle_success(result: dict):
+        print(f"[FSM_SUCCESS] User {user_id} 훈련 성공!")
+
+        # 추측 생성에 사용한 보상으로 고정 (같은 확률로 STAY 진입 시점에 뽑은 보상)
+        if speculation is not None:
+            result["action_type"], result["base_reward"], result["bonus_points"] = speculation["reward"]
+
+        # DB 업데이트
+        response_data = {}
+        try:
+            async with AsyncSessionLocal() as db:
+                # [Fix] user_id로 character_id 조회
+                from sqlalchemy import select
+                from app.db.models.character import Character
+                stmt = select(Character).where(Character.user_id == user_id)
+                char_res = await db.execute(stmt)
+                character_obj = char_res.scalar_one_or_none()
+
+                if not character_obj:
+                    raise Exception("Character not found for user")
+
+                # char_id를 사용하여 스탯 업데이트 호출
+                service_result = await char_service.update_stats_from_yolo_result(db, character_obj.id, result)
+
+                if service_result:
+                    # [NEW] 1. Best Shot Saving (Execute BEFORE LLM)
+                    best_shot_url = None
+                    if vision_state["best_frame_data"]:
+                        try:
+                            import os
+                            from datetime import datetime
+
+                            # Save Image to Local Disk
+                            today_str = datetime.now().strftime("%Y%m%d")
+                            upload_dir = f"uploads/{today_str}"
+                            os.makedirs(upload_dir, exist_ok=True)
+
+                            filename = f"best_shot_{user_id}_{int(time.time())}.jpg"
+                            filepath = f"{upload_dir}/{filename}"
+
+                            with open(filepath, "wb") as f:
+                                f.write(vision_state["best_frame_data"])
+
+                            # Generate URL (Relative path for Frontend)
+                            best_shot_url = f"/uploads/{today_str}/{filename}"
+                            print(f"[BestShot] Saved: {filepath}")
+
+                        except Exception as e:
+                            print(f"[BestShot] Save Error: {e}")
+                            import traceback
+                            traceback.print_exc()
+
+                    # LLM 호출을 위한 정보 준비
+                    updated_stat = service_result["stat"]
+
+                    # [Changed] Pass best_shot_url to LLM
+                    llm_kwargs = dict(
+                        action_type=result.get("action_type", "action").replace("_", " ").title(),
+                        current_stats={
+                            "strength": updated_stat.strength,
+                            "health": updated_stat.health,
+                            "happiness": updated_stat.happiness
+                        },
+                        mode=fsm.mode,
+                        is_success=True,
+                        reward_info=result.get("base_reward", {}),
+                        feedback_detail=result.get("feedback_message", ""),
+                        daily_count=service_result.get("daily_count", 0),
+                        milestone_reached=service_result.get("milestone_reached"),
+                        best_shot_url=best_shot_url # [New] Pass Best Shot URL
+                    )
+
+                    # [Speculation] STAY 동안 미리 만든 메시지가 있으면 즉시 사용
+                    prepared = await take_speculation(llm_kwargs)
+                    if prepared is None:
+                        prepared = await llm_session.call(
+                            PRIORITY_SUCCESS, lambda: prepare_character_response(user_id, on_token=on_token, **llm_kwargs)
+                        )
+                    msg = await commit_character_response(prepared) if prepared else None
+                    if not msg:
+                        # 디스패처에서 취소/실패된 경우 규칙 기반 메시지로 대체
+                        msg = random.choice(RULE_TEMPLATES["success"])
+
+                    response_data = {
+                        "status": "success",
+                        "char_message": msg,
+                        "message": "훈련 성공!",
+                        "base_reward": result.get("base_reward", {}),
+                        "bonus_points": result.get("bonus_points", 0),
+                        "count": service_result.get("daily_count", 0),
+                        "bbox": [],
+                        "level_up_info": service_result.get("level_up_info", {}),
+                        "pet_keypoints": [],
+                        "human_keypoints": [],
+                        "best_shot_url": best_shot_url # [New] Send URL to Client
+                    }
+                    if prepared and prepared.streamed:
+                        response_data["char_message_done"] = True
+
+                    # [NEW] 2. Create Diary Entry (After LLM)
+                    if best_shot_url:
+                        try:
+                            from app.db.models.diary import Diary
+                            from datetime import datetime
+
+                            diary_entry = Diary(
+                                user_id=user_id,
+                                image_url=best_shot_url,
+                                content=msg, # Character's comment (Image-Aware)
+                                tag="훈련인증",
+                                created_at=datetime.utcnow()
+                            )
+                            db.add(diary_entry)
+                            await db.commit()
+                            print(f"[BestShot] Diary Uploaded with msg: {msg[:20]}...")
+
+                        except Exception as e:
+                            print(f"[BestShot] Diary Error: {e}")
+                else:
+                     raise Exception("DB Error")
+
+        except Exception as e:
+            print(f"Error: {e}")
+            import traceback
+            traceback.print_exc()
+            response_data = {
+                "status": "success",
+                "message": "훈련 성공! (보상 오류)",
+                "base_reward": result.get("base_reward", {}),
+                "bonus_points": 0,
+                "bbox": []
+            }
+
+        # Reset Best Shot State for next round
+        reset_best_shot()
+        cancel_speculation()  # 보상 오류 등으로 사용되지 않은 추측 생성 정리
+        await send_json(websocket, response_data)
+
+    # --- FSM Command 실행기 ---
+    async def run_commands(commands, result=None, image_bytes=None):
+        nonlocal best_shot_dirty
+        for cmd in commands:
+            if isinstance(cmd, Send):
+                # result는 매 프레임 새로 만들어지므로 복사 없이 덮어써서 전송
+                result["status"] = cmd.status
+                if cmd.message is not None:
+                    result["message"] = cmd.message
+                if cmd.clear_message:
+                    result.pop("message", None)
+                if cmd.specific:
+                    result["is_specific_feedback"] = True
+                await send_json(websocket, result)
+            elif isinstance(cmd, TriggerLLM):
+                trigger_llm(cmd.action_type, is_success=cmd.is_success, feedback=cmd.feedback)
+            elif isinstance(cmd, CaptureBestShot):
+                vision_state["best_conf"] = cmd.conf
+                vision_state["best_frame_data"] = image_bytes
+                vision_state["best_bbox"] = result.get("bbox", [])
+                best_shot_dirty = True
+                print(f"[BestShot] Updated! Conf: {cmd.conf:.4f}", flush=True)
+            elif isinstance(cmd, DiscardBestShot):
+                reset_best_shot()
+            elif isinstance(cmd, GrantReward):
+                await handle_success(result)
+            elif isinstance(cmd, SpeculateSuccess):
+                speculate_success(result, image_bytes is not None or vision_state["best_frame_data"] is not None)
+            elif isinstance(cmd, CancelSpeculation):
+                cancel_speculation()
+
+    # 세션 토큰 전달 (재접속 시 ?session=토큰 으로 이어하기)
+    # status는 'keep'으로 보내 클라이언트 훈련 상태를 바꾸지 않음
+    await send_json(websocket, {
+        "status": "keep",
+        "session_token": session_token,
+        "resumed": restored is not None
+    })
+
+    # [NEW] 연결 직후 초기 인사 (Greeting)
+    # 앱 시작 시 침묵(Startup Silence) 방지 - 복원된 세션은 다시 인사하지 않음
+    if not restored:
+        await run_commands(fsm.start())
+
     # [Optimization] 프레임 스킵 카운터
     frame_count = 0
     PROCESS_INTERVAL = 1  # 3프레임마다 1번 처리 # [Tuning] 1로 변경하여 반응성 최우선
 
     try:
         while True:
-            # 타임아웃을 두어 receive_bytes가 무한정 막히지 않게 할 수도 있지만,
-            # Idle 처리를 위해 asyncio.wait_for를 쓸 수도 있음.
-            # [Fix] 타임아웃 방식이 아닌, 프레임 수신 여부와 관계없이 시간 체크
             try:
                 # [Modified] Support both Bytes (Image) and Text (JSON Result)
                 # `receive()` returns a dict: {'type': 'websocket.receive', 'bytes': ..., 'text': ...}
                 message = await websocket.receive()
-                
-                if 'bytes' in message and message['bytes']:
-                    image_bytes = message['bytes']
-                    # [Server-side Logic]
-                    
-                elif 'text' in message and message['text']:
-                    # [Edge AI Logic]
-                    # Client sent pre-processed result (JSON)
-                    import json
-                    edge_result = json.loads(message['text'])
-                    
-                    # [Fix] Construct base_response with dimensions for Logic Aspect Ratio safety
-                    # Default to 640 if missing (but Frontend sends it now)
-                    base_resp_input = {
-                        "width": edge_result.get("width", 640),
-                        "height": edge_result.get("height", 640),
-                        "bbox": edge_result.get('bbox', []),
-                        "pet_keypoints": edge_result.get('pet_keypoints', []),
-                        "human_keypoints": edge_result.get('human_keypoints', [])
-                    }
+                image_bytes = message.get("bytes") or None
+                edge_result = None
 
-                    # [Fix] Invoke Logic Layer (Server-side Logic Reuse)
-                    result = await run_in_threadpool(
-                        detector.process_logic_only,
-                        detected_objects=edge_result.get('bbox', []),
-                        mode=mode,
-                        target_class_id=target_class_id,
-                        difficulty=difficulty,
-                        vision_state=vision_state,
-                        base_response=base_resp_input # [NEW] Pass dimensions
-                    )
-                    
-                    # Ensure minimal keys exist (Should be handled by process_logic_only, but safe check)
-                    if "success" not in result: result["success"] = False
-                    
-                    # [Fix] Propagate Frame ID for Latency Calculation
-                    # Frontend expects 'frame_id' to match the request to calculate latency
-                    if 'frame_id' in edge_result:
-                        result['frame_id'] = edge_result['frame_id']
-                    
-                    # [NEW] Edge Mode Best Shot Handling
-                    # Client sends best shot as Base64 because Server can't see the stream
-                    if 'best_shot_base64' in edge_result and edge_result['best_shot_base64']:
-                        try:
-                            import base64
-                            # Decode Base64 to Bytes
-                            img_data = base64.b64decode(edge_result['best_shot_base64'])
-                            vision_state["best_frame_data"] = img_data
-                            vision_state["best_conf"] = edge_result.get('conf_score', 1.0) # Use current conf as best
-                            # print(f"[Edge BestShot] Received {len(img_data)} bytes", flush=True)
-                        except Exception as e:
-                            print(f"[Edge BestShot] Decode Error: {e}")
-
-                    
-                    # [Fix] Trust Client's Success Decision (Edge AI Timer Completion)
-                    
-                    # [Fix] Trust Client's Success Decision (Edge AI Timer Completion)
-                    # BUT respect server-side COOLDOWN to prevent spam/looping
-                    if edge_result.get('status') == 'success' and state not in ["SUCCESS", "COOLDOWN"]:
-                        state = "SUCCESS"
-                        result["success"] = True # Align vision success with FSM state
-                        
-                        # [Fix] Force Generate Reward if Server Logic didn't trigger 'is_interacting'
-                        if not result.get("base_reward"):
-                            import numpy as np
-                            # Fallback Reward Generation (Same logic as detector.py)
-                            if mode == "playing":
-                                action_type = "playing_fetch"
-                                result["base_reward"] = {"stat_type": "strength", "value": 3} if np.random.rand() < 0.7 else {"stat_type": "agility", "value": 3}
-                                result["bonus_points"] = 2
-                            elif mode == "feeding":
-                                action_type = "feeding"
-                                result["base_reward"] = {"stat_type": "health", "value": 3} if np.random.rand() < 0.7 else {"stat_type": "defense", "value": 3}
-                                result["bonus_points"] = 1
-                            elif mode == "interaction":
-                                action_type = "interaction_owner"
-                                result["base_reward"] = {"stat_type": "happiness", "value": 4} if np.random.rand() < 0.7 else {"stat_type": "intelligence", "value": 3}
-                                result["bonus_points"] = 3
-                            
-                            result["action_type"] = action_type
-                    
-                    # Pass through to FSM Logic below (Skip 'run_in_threadpool(detector...)')
-                    image_bytes = None # Skip decoding
-                    
-                else:
-                    # Ping/Pong or Empty
-                    continue
-                    
+                if image_bytes is None:
+                    if not message.get("text"):
+                        # Ping/Pong or Empty
+                        continue
+                    # 텍스트 프레임은 한 번만 파싱 (제어 메시지 또는 Edge AI 결과)
+                    edge_result = loads(message["text"])
             except Exception:
                 break
-            
-            # image_bytes = None # [Fix] Removed redundant reset that might cause issues
 
             # A. Control Message Handling
-            if "text" in message:
-                is_control = False
-                try:
-                    data = json.loads(message["text"])
-                    if data.get("type") == "change_mode":
-                        new_mode = data.get("mode")
-                        if new_mode in ["playing", "feeding", "interaction"]:
-                            mode = new_mode
-                            # Reset State
-                            state = "READY"
-                            state_start_time = None
-                            last_detected_time = None
-                            vision_state["is_tracking"] = False # Vision state reset
-                            vision_state["best_frame_data"] = None # Reset Best Shot
-                            vision_state["best_conf"] = 0.0
-                            
-                            print(f"[FSM_WS] User {user_id} switched to mode: {mode}")
-                            
-                            await websocket.send_json({
-                                "status": "info",
-                                "message": f"모드가 '{mode}'로 변경되었습니다."
-                            })
-                            is_control = True
-                            
-                    elif data.get("type") == "ping":
-                        # Keep-alive
-                        is_control = True
-                        pass
-                except:
-                    pass
-                
-                if is_control:
-                    continue # Skip vision processing for control messages
-
-            # B. Image Data Handling
-            if "bytes" in message:
-                image_bytes = message["bytes"]
+            if edge_result is not None:
+                msg_type = edge_result.get("type")
+                if msg_type == "change_mode":
+                    new_mode = edge_result.get("mode")
+                    if new_mode in ["playing", "feeding", "interaction"]:
+                        # Reset State
+                        fsm.change_mode(new_mode)
+                        cancel_speculation()
+                        vision_state["is_tracking"] = False # Vision state reset
+                        reset_best_shot()
+
+                        print(f"[FSM_WS] User {user_id} switched to mode: {fsm.mode}")
+
+                        await send_json(websocket, {
+                            "status": "info",
+                            "message": f"모드가 '{fsm.mode}'로 변경되었습니다."
+                        })
+                        await checkpoint()
+                        continue # Skip vision processing for control messages
+                elif msg_type == "ping":
+                    # Keep-alive
+                    continue
 
             frame_count += 1
 
-            # 1. Idle 체크 (매 프레임마다 시간 비교)
-            # 마지막 상호작용(성공, 실패, 감지 등)으로부터 20초 경과 시
-            if time.time() - last_interaction_time > 20.0:
-                 # 20초 이상 잠수 -> 심심함 표현# trigger_llm이 성공했을 때만 리셋 등 전략 필요.
-                 # 여기서는 trigger_llm 호출 후 시간을 리셋하여 20초 뒤에 다시 칭얼대도록 함
-                 # 비동기 호출 (결과 기다리지 않음)
-                 await trigger_llm("idle", is_success=False)
-                 
-                 # 메시지를 보냈으므로 다시 20초 카운트 (재촉 주기)
-                 last_interaction_time = time.time()
-            
-            current_time = time.time()
-            
             # [Branching] Server-side Inference vs Edge Result
             if image_bytes is not None:
                 # [Server-side Inference]
-                
+
                 # [NEW] Frame ID Extraction (Last 4 bytes)
                 frame_id = -1
                 if len(image_bytes) > 4:
@@ -329,256 +552,97 @@ async def analysis_endpoint(
 
                 # 비전 처리 (CPU/GPU)
                 result = await run_in_threadpool(
-                    detector.process_frame, 
-                    image_bytes, 
-                    mode, 
-                    target_class_id, 
+                    detector.process_frame,
+                    image_bytes,
+                    fsm.mode,
+                    target_class_id,
                     difficulty,
                     frame_index=frame_count,
                     process_interval=PROCESS_INTERVAL,
                     frame_id=frame_id,  # [NEW] Pass ID
                     vision_state=vision_state # [NEW] Inject State
                 )
-            
-            # [Common] Post-Inference FSM Logic
+            else:
+                # [Edge AI Logic]
+                # Client sent pre-processed result (JSON)
+                # [Fix] Construct base_response with dimensions for Logic Aspect Ratio safety
+                # Default to 640 if missing (but Frontend sends it now)
+                base_resp_input = {
+                    "width": edge_result.get("width", 640),
+                    "height": edge_result.get("height", 640),
+                    "bbox": edge_result.get('bbox', []),
+                    "pet_keypoints": edge_result.get('pet_keypoints', []),
+                    "human_keypoints": edge_result.get('human_keypoints', [])
+                }
 
-            if result.get("skipped", False):
-                continue
-            is_success_vision = result.get("success", False)
-
-            # --- COOLDOWN Logic ---
-            if state == "COOLDOWN":
-                elapsed = current_time - state_start_time
-                if elapsed >= 3.0:
-                    state = "READY"
-                    state_start_time = None
-                    # Transition to READY allows immediate re-detection in next lines
-                    # Optional: Send "Ready" message
-                else:
-                    # Still in cooldown - block other states
-                    # [FIX] 'stay' 대신 'keep'을 사용하여 클라이언트 UI가 뒤로 돌아가는 현상 방지
-                    response = result.copy()
-                    response.update({
-                        "status": "keep", 
-                        "message": f"잠시 휴식... {3.0 - elapsed:.1f}초",
-                        "is_specific_feedback": True
-                    })
-                    await websocket.send_json(response)
-                    continue
+                # [Fix] Invoke Logic Layer (Server-side Logic Reuse)
+                result = await run_in_threadpool(
+                    detector.process_logic_only,
+                    detected_objects=edge_result.get('bbox', []),
+                    mode=fsm.mode,
+                    target_class_id=target_class_id,
+                    difficulty=difficulty,
+                    vision_state=vision_state,
+                    base_response=base_resp_input # [NEW] Pass dimensions
+                )
 
-            # --- FSM 로직 ---
-            response = result.copy()
-
-            if is_success_vision:
-                last_interaction_time = current_time # 상호작용 발생
-                last_detected_time = current_time
-                
-                if state == "READY":
-                    state = "DETECTING"
-                    response.update({"status": "detecting", "message": "동작 감지 시작!"})
-                    await websocket.send_json(response)
-                
-                elif state == "DETECTING":
-                    state = "STAY"
-                    state_start_time = current_time
-                    response.update({"status": "stay", "message": "좋아요, 자세를 3초간 유지하세요!"})
-                    await websocket.send_json(response)
-                
-                elif state == "STAY":
-                    hold_duration = current_time - state_start_time
-                    if hold_duration >= 3:
-                        state = "SUCCESS"
-                    else:
-                        response.update({"status": "stay", "message": f"자세 유지... {3 - hold_duration:.1f}초"})
-                        
-                        # [NEW] Best Shot Selection
-                        current_conf = result.get("conf_score", 0.0)
-                        
-                        # [Fix] Capture FIRST frame or BETTER frame
-                        if image_bytes and (vision_state["best_frame_data"] is None or current_conf > vision_state["best_conf"]):
-                            vision_state["best_conf"] = current_conf
-                            vision_state["best_frame_data"] = image_bytes
-                            vision_state["best_bbox"] = result.get("bbox", [])
-                            print(f"[BestShot] Updated! Conf: {current_conf:.4f}", flush=True)
-
-                        await websocket.send_json(response)
-            
-            else: # is_success_vision is False
-                if state == "STAY":
-                    # 유예 시간 (Grace Period) 체크
-                    # [UX Improvement] 1.5초 -> 0.8초 단축 (반응성 향상)
-                    if current_time - last_detected_time > 0.8:
-                        # [실패 전환]
-                        state = "READY"
-                        state_start_time = None
-                        vision_state["best_frame_data"] = None # Reset on Fail
-                        vision_state["best_conf"] = 0.0
-                        response.update({"status": "fail", "message": "동작이 끊겼습니다."})
-                        await websocket.send_json(response)
-                        
-                        last_interaction_time = current_time # 상호작용(실패) 발생
-                        
-                        # [NEW] 실패 시 격려 메시지
-                        await trigger_llm(mode, is_success=False, feedback="pose_unstable")
-                        
-                    else:
-                        # [Fixed] Grace Period 처리
-                        hold_duration = current_time - state_start_time
-                        response.update({
-                            "status": "stay", 
-                            "message": f"자세 유지... {1 - hold_duration:.1f}초 (인식 불안정)"
-                        })
-                        await websocket.send_json(response)
-                        
-                elif state == "DETECTING":
-                    state = "READY"
-                    # 단순 감지 실패는 메시지 생성 안 함 (너무 빈번함)
-                
-                # READY 상태 반복 전송 방지 (클라이언트 부하 감소)
-                if state == "READY":
-                    # [Fix] 단순 "찾는 중" 메시지는 보내지 않음 (캐릭터 대화 방해 방지)
-                    if not result.get("is_specific_feedback", False):
-                        response.pop("message", None)
-                    
-                    response.update({"status": "fail"})
-                    await websocket.send_json(response)
-
-            # --- 성공 상태 처리 ---
-            if state == "SUCCESS":
-                print(f"[FSM_SUCCESS] User {user_id} 훈련 성공!")
-                last_interaction_time = current_time
-                
-                # DB 업데이트
-                response_data = {}
-                try:
-                    async with AsyncSessionLocal() as db:
-                        # [Fix] user_id로 character_id 조회
-                        from sqlalchemy import select
-                        from app.db.models.character import Character
-                        stmt = select(Character).where(Character.user_id == user_id)
-                        char_res = await db.execute(stmt)
-                        character_obj = char_res.scalar_one_or_none()
-                        
-                        if not character_obj:
-                            raise Exception("Character not found for user")
-                            
-                        # char_id를 사용하여 스탯 업데이트 호출
-                        service_result = await char_service.update_stats_from_yolo_result(db, character_obj.id, result)
-                        
-                        if service_result:
-                            # [NEW] 1. Best Shot Saving (Execute BEFORE LLM)
-                            best_shot_url = None
-                            if vision_state["best_frame_data"]:
-                                try:
-                                    import os
-                                    from datetime import datetime
-                                    
-                                    # Save Image to Local Disk
-                                    today_str = datetime.now().strftime("%Y%m%d")
-                                    upload_dir = f"uploads/{today_str}"
-                                    os.makedirs(upload_dir, exist_ok=True)
-                                    
-                                    filename = f"best_shot_{user_id}_{int(time.time())}.jpg"
-                                    filepath = f"{upload_dir}/{filename}"
-                                    
-                                    with open(filepath, "wb") as f:
-                                        f.write(vision_state["best_frame_data"])
-                                        
-                                    # Generate URL (Relative path for Frontend)
-                                    best_shot_url = f"/uploads/{today_str}/{filename}"
-                                    print(f"[BestShot] Saved: {filepath}")
-
-                                except Exception as e:
-                                    print(f"[BestShot] Save Error: {e}")
-                                    import traceback
-                                    traceback.print_exc()
-
-                            # LLM 호출을 위한 정보 준비
-                            updated_stat = service_result["stat"]
-                            
-                            # [Changed] Pass best_shot_url to LLM
-                            msg = await get_character_response(
-                                user_id=user_id, 
-                                action_type=result.get("action_type", "action").replace("_", " ").title(),
-                                current_stats={
-                                    "strength": updated_stat.strength,
-                                    "health": updated_stat.health,
-                                    "happiness": updated_stat.happiness
-                                },
-                                mode=mode,
-                                is_success=True,
-                                reward_info=result.get("base_reward", {}),
-                                feedback_detail=result.get("feedback_message", ""),
-                                daily_count=service_result.get("daily_count", 0),
-                                milestone_reached=service_result.get("milestone_reached"),
-                                best_shot_url=best_shot_url # [New] Pass Best Shot URL
-                            )
-                            
-                            response_data = {
-                                "status": "success",
-                                "char_message": msg, 
-                                "message": "훈련 성공!", 
-                                "base_reward": result.get("base_reward", {}),
-                                "bonus_points": result.get("bonus_points", 0),
-                                "count": service_result.get("daily_count", 0),
-                                "bbox": [],
-                                "level_up_info": service_result.get("level_up_info", {}), 
-                                "pet_keypoints": [],
-                                "human_keypoints": [],
-                                "best_shot_url": best_shot_url # [New] Send URL to Client
-                            }
-                            
-                            # [NEW] 2. Create Diary Entry (After LLM)
-                            if best_shot_url:
-                                try:
-                                    from app.db.models.diary import Diary
-                                    from datetime import datetime
-                                    
-                                    diary_entry = Diary(
-                                        user_id=user_id,
-                                        image_url=best_shot_url, 
-                                        content=msg, # Character's comment (Image-Aware)
-                                        tag="훈련인증",
-                                        created_at=datetime.utcnow()
-                                    )
-                                    db.add(diary_entry)
-                                    await db.commit() 
-                                    print(f"[BestShot] Diary Uploaded with msg: {msg[:20]}...")
-                                    
-                                except Exception as e:
-                                    print(f"[BestShot] Diary Error: {e}")
-                            
-                            # Reset Best Shot State for next round
-                            vision_state["best_frame_data"] = None
-                            vision_state["best_conf"] = 0.0
-                        else:
-                             raise Exception("DB Error")
-                             
-                except Exception as e:
-                    print(f"Error: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    response_data = {
-                        "status": "success",
-                        "message": "훈련 성공! (보상 오류)",
-                        "base_reward": result.get("base_reward", {}),
-                        "bonus_points": 0,
-                        "bbox": []
-                    }
-                
-                await websocket.send_json(response_data)
-                
-                # [UX Improvement] Switch to COOLDOWN instead of READY
-                state = "COOLDOWN"
-                state_start_time = current_time # Reset for cooldown timer
-                last_detected_time = None
+                # Ensure minimal keys exist (Should be handled by process_logic_only, but safe check)
+                if "success" not in result: result["success"] = False
+
+                # [Fix] Propagate Frame ID for Latency Calculation
+                # Frontend expects 'frame_id' to match the request to calculate latency
+                if 'frame_id' in edge_result:
+                    result['frame_id'] = edge_result['frame_id']
+
+                # [NEW] Edge Mode Best Shot Handling
+                # Client sends best shot as Base64 because Server can't see the stream
+                if edge_result.get('best_shot_base64'):
+                    try:
+                        import base64
+                        # Decode Base64 to Bytes
+                        img_data = base64.b64decode(edge_result['best_shot_base64'])
+                        vision_state["best_frame_data"] = img_data
+                        vision_state["best_conf"] = edge_result.get('conf_score', 1.0) # Use current conf as best
+                        fsm.note_best_shot(vision_state["best_conf"])
+                        best_shot_dirty = True
+                    except Exception as e:
+                        print(f"[Edge BestShot] Decode Error: {e}")
+
+                # [Fix] Trust Client's Success Decision (Edge AI Timer Completion)
+                # BUT respect server-side COOLDOWN to prevent spam/looping
+                if edge_result.get('status') == 'success' and fsm.accept_client_success():
+                    result["success"] = True # Align vision success with FSM state
+
+                    # [Fix] Force Generate Reward if Server Logic didn't trigger 'is_interacting'
+                    if not result.get("base_reward"):
+                        fallback = fallback_reward(fsm.mode)
+                        if fallback:
+                            result["action_type"], result["base_reward"], result["bonus_points"] = fallback
+
+            # [Common] Post-Inference FSM Logic
+            commands = fsm.step(
+                result.get("success", False),
+                conf=result.get("conf_score", 0.0),
+                has_frame=image_bytes is not None,
+                specific_feedback=result.get("is_specific_feedback", False),
+                skipped=result.get("skipped", False)
+            )
+            await run_commands(commands, result, image_bytes)
+
+            # 단계가 바뀔 때만 체크포인트 (프레임마다 쓰지 않음)
+            if fsm.phase != checkpoint_phase:
+                await checkpoint()
 
     except WebSocketDisconnect:
         print(f"[FSM_WS] 사용자 {nickname} 연결 종료", flush=True)
     except Exception as e:
         print(f"[FSM_WS] 소켓 에러 발생: {e}", flush=True)
     finally:
+        # 진행 중인 LLM 호출 취소 (끊긴 소켓에 대한 비용 낭비 방지)
+        llm_session.close()
+        # 연결 종료 시점 상태 저장 (재접속 대비)
+        await checkpoint()
         try:
             await websocket.close()
         except:
-            pass
\ No newline at end of file
+            pass
@@ -1,25 +1,36 @@
 # backend/app/sockets/battle_socket.py
-import json
+import os
 import uuid
 import random
 import asyncio
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from typing import Dict, Optional
-from app.services import char_service
-from app.game.matchmaker import matchmaker
-from app.game.game_assets import MOVE_DATA
+from app.services import char_service, friend_service
+from app.game.matchmaker import matchmaker, HEARTBEAT_SEC
 from app.db.database import AsyncSessionLocal
 from app.db.database_redis import RedisManager
+from app.db.redis_pubsub import hub as pubsub_hub, BROADCAST
+from app.sockets.spectator_hub import spectators
 from app.db.models.character import Character, Stat
-from app.core.security import verify_websocket_token
-from app.game.battle_calculator import BattleCalculator
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.game.battle_manager import BattleManager, BattleState
+from app.core.security import verify_websocket_token, verify_token
+from app.core.serialization import send_json, encode_text
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from app.game.battle_manager import BattleManager, BattleState, CombatStats, turn_rng
+from app.game import battle_room_store, battle_ai, battle_replay, battle_card, battle_rating
+from app.game.battle_scheduler import scheduler, turn_deadline, MAX_IDLE_TURNS
 
 router = APIRouter()
 
 # --- 웹소켓 연결 관리 클래스 ---
+# 소켓은 접속한 워커에만 있으므로, 같은 워커에 있는 소켓은 바로 보내고
+# 나머지는 Redis Pub/Sub(battle_room:{room_id})으로 다른 워커에 전달합니다.
+# 관전자는 워커별 SpectatorHub가 받으며, 어느 워커에든 관전자가 있으면(방의 spectators > 0) 항상 발행합니다.
+ROOM_CHANNEL_PREFIX = "battle_room:"
+SPECTATORS = "spectators"          # 관전자에게만
+SPECTATORS_END = "spectators_end"  # 관전자에게 보내고 관전 종료
+BATTLE_SEND_TIMEOUT = float(os.getenv("BATTLE_SEND_TIMEOUT", "5"))  # 초과 시 끊긴 소켓으로 처리
+
 class BattleConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, Dict[int, WebSocket]] = {}
@@ -36,51 +47,79 @@ class BattleConnectionManager:
             if not self.active_connections[room_id]:
                 del self.active_connections[room_id]
 
-    async def broadcast(self, room_id: str, message: dict):
-        if room_id in self.active_connections:
-            targets = list(self.active_connections[room_id].items())
-            for uid, ws in targets:
-                try:
-                    if ws.client_state.value == 1:
-                        await ws.send_json(message)
-                except:
-                    self.disconnect(room_id, uid)
+    async def _deliver(self, room_id: str, encoded: str, user_id: Optional[int] = None) -> int:
+        """이 워커에 연결된 소켓에만 전송 (전송한 소켓 수 반환)"""
+        conns = self.active_connections.get(room_id)
+        if not conns:
+            return 0
+        targets = list(conns.items()) if user_id is None else [(user_id, conns[user_id])] if user_id in conns else []
+        sent = 0
+        for uid, ws in targets:
+            try:
+                if ws.client_state.value == 1:
+                    await asyncio.wait_for(ws.send_text(encoded), BATTLE_SEND_TIMEOUT)
+                    sent += 1
+            except:
+                self.disconnect(room_id, uid)
+        return sent
+
+    async def _publish(self, room_id: str, target, encoded: str):
+        try:
+            await pubsub_hub.publish(f"{ROOM_CHANNEL_PREFIX}{room_id}", target, encoded)
+        except Exception as e:
+            print(f"[Battle] Publish Error: {e}")
+
+    async def broadcast(self, room_id: str, message: dict, spectated: bool = False, is_ai: bool = False):
+        # 한 번만 인코딩하고 플레이어와 관전자 모두에게 같은 문자열 전송
+        encoded = encode_text(message)
+        local = await self._deliver(room_id, encoded)
+        spectators.publish(room_id, encoded)
+        # 사람 플레이어(AI 방은 1명)가 모두 이 워커에 있고 관전자가 없으면 발행 생략
+        if local < (1 if is_ai else 2) or spectated:
+            await self._publish(room_id, BROADCAST, encoded)
+
+    async def broadcast_spectators(self, room_id: str, message: dict, spectated: bool, final: bool = False):
+        """관전자 전용 메시지 (final이면 전송 후 관전 종료)"""
+        encoded = encode_text(message)
+        spectators.publish(room_id, encoded)
+        if final:
+            spectators.close_room(room_id)
+        if spectated:
+            await self._publish(room_id, SPECTATORS_END if final else SPECTATORS, encoded)
 
     async def send_to_user(self, room_id: str, user_id: int, message: dict):
-        ws = self.active_connections.get(room_id, {}).get(user_id)
-        if ws:
-            await ws.send_json(message)
+        if user_id == battle_room_store.AI_BOT_ID:
+            return  # AI 봇은 소켓이 없음
+        encoded = encode_text(message)
+        if not await self._deliver(room_id, encoded, user_id):
+            await self._publish(room_id, user_id, encoded)
+
+    async def on_room_event(self, channel: str, target: str, payload: str):
+        """다른 워커가 발행한 방 메시지를 이 워커의 소켓에 전달"""
+        room_id = channel[len(ROOM_CHANNEL_PREFIX):]
+        if target in (SPECTATORS, SPECTATORS_END):
+            spectators.publish(room_id, payload)
+            if target == SPECTATORS_END:
+                spectators.close_room(room_id)
+            return
+        if target == BROADCAST:
+            spectators.publish(room_id, payload)
+        await self._deliver(room_id, payload, None if target == BROADCAST else int(target))
 
 manager = BattleConnectionManager()
+pubsub_hub.register(f"{ROOM_CHANNEL_PREFIX}*", manager.on_room_event)
 
 # --- 헬퍼 함수 ---
-async def save_room_state(room_id: str, data: dict):
-    redis = RedisManager.get_client()
-    await redis.set(f"room:{room_id}", json.dumps(data), ex=3600)
-
-async def load_room_state(room_id: str) -> Optional[dict]:
-    redis = RedisManager.get_client()
-    data = await redis.get(f"room:{room_id}")
-    return json.loads(data) if data else None
-
-def create_initial_room_data(room_id: str, is_ai_battle: bool = False) -> dict:
-    return {
-        "room_id": room_id,
-        "players": [],
-        "character_stats": {},
-        "pet_types": {},
-        "learned_skills": {},
-        "battle_states": {},
-        "selections": {},
-        "turn_count": 0,
-        "field_effects": {"weather": "clear", "location": "stadium"},
-        "is_ai_battle": is_ai_battle
-    }
+# 방 상태는 app.game.battle_room_store (Redis Hash + Lua)에서 관리합니다.
 
-async def handle_forfeit(room_id: str, leaver_id: int):
-    """유저가 나갔을 때 남은 유저 승리 처리"""
-    room_data = await load_room_state(room_id)
-    if not room_data: return
+async def handle_forfeit(room_id: str, leaver_id: int, reason: str = "opponent_fled"):
+    """
+    유저가 나갔을 때 남은 유저 승리 처리
+    reason="turn_timeout"이면 연결은 살아 있으므로 패배 알림을 보내고, AI 방도 종료합니다.
+    이미 끝난 방(KO/무승부 확정, 다른 기권 처리)이면 아무것도 하지 않습니다.
+    """
+    room_data = await battle_room_store.load_room(room_id)
+    if not room_data or room_data["finished"]: return
 
     winner_id = None
     for p_id in room_data["players"]:
@@ -88,27 +127,115 @@ async def handle_forfeit(room_id: str, leaver_id: int):
             winner_id = p_id
             break
 
-    if winner_id is not None and winner_id != 0:
+    timed_out = reason == "turn_timeout"
+    if winner_id is None or (winner_id == 0 and not timed_out):
+        return
+    # 이 호출이 방을 끝낸 경우에만 결과 처리 (보상/레이팅 중복 방지)
+    if not await battle_room_store.finish_room(room_id):
+        return
+
+    if timed_out:
+        await manager.send_to_user(room_id, leaver_id, {
+            "type": "GAME_OVER",
+            "result": "LOSE",
+            "reason": reason,
+            "winner": winner_id,
+            "message": "제한 시간 내에 기술을 선택하지 않아 패배했습니다."
+        })
+
+    if winner_id != battle_room_store.AI_BOT_ID:
         await manager.send_to_user(room_id, winner_id, {
             "type": "GAME_OVER",
             "result": "WIN",
-            "reason": "opponent_fled",
-            "message": "상대방이 대전을 포기했습니다."
+            "reason": reason,
+            "message": "상대방이 제한 시간 내에 기술을 선택하지 않았습니다." if timed_out else "상대방이 대전을 포기했습니다."
         })
+    await manager.broadcast_spectators(room_id, {
+        "type": "GAME_OVER",
+        "result": "END",
+        "reason": reason,
+        "winner": winner_id
+    }, spectated=room_data["spectators"] > 0, final=True)
+    if winner_id != battle_room_store.AI_BOT_ID:
         async with AsyncSessionLocal() as db:
             await char_service.process_battle_result(db, winner_id, leaver_id)
+    if not room_data["is_ai_battle"]:
+        await battle_rating.record_result(room_id, winner_id, leaver_id, room_data["pet_types"])
+    await battle_replay.save_replay(room_id, winner_id, "forfeit")
+    await delete_room_state(room_id)
+
+def pick_timeout_move(room_data: dict, user_id: int) -> int:
+    """시간 초과 자동 선택: PP가 남은 기술 중 무작위 (모두 소진이면 첫 기술)"""
+    uid = str(user_id)
+    skills = room_data["learned_skills"].get(uid) or [1]
+    state = room_data["battle_states"].get(uid)
+    usable = [sid for sid in skills if state is None or state.pp.get(str(sid), 1) > 0]
+    return random.choice(usable) if usable else skills[0]
+
+async def handle_turn_timeout(room_id: str):
+    """
+    스케줄러 마감 핸들러 (battle:deadlines에서 이 워커가 가져간 방)
+    - 상대가 입장하지 않은 방: ROOM_EXPIRED 후 정리
+    - 선택하지 않은 플레이어: 자동 선택 (TURN_TIMEOUT 알림), MAX_IDLE_TURNS번 연속이면 기권 처리
+    """
+    room_data = await battle_room_store.load_room(room_id)
+    if not room_data or room_data["finished"]:
+        # 방이 TTL로 사라졌거나 이미 끝남 (종료 처리 중)
+        await scheduler.cancel(room_id)
+        return
+
+    players = room_data["players"]
+    spectated = room_data["spectators"] > 0
+    if len(players) < 2 or not all(str(p) in room_data["battle_states"] for p in players):
+        print(f"[Scheduler] Room {room_id} expired (opponent did not join)")
+        await manager.broadcast(room_id, {
+            "type": "ROOM_EXPIRED",
+            "message": "상대방이 입장하지 않아 대전이 취소되었습니다."
+        }, spectated=spectated, is_ai=room_data["is_ai_battle"])
+        await manager.broadcast_spectators(room_id, {"type": "ROOM_EXPIRED"}, spectated=spectated, final=True)
         await delete_room_state(room_id)
+        return
+
+    is_ai = room_data["is_ai_battle"]
+    pending = [p for p in players if str(p) not in room_data["selections"] and not (is_ai and p == battle_room_store.AI_BOT_ID)]
+    if not pending:
+        # 턴 처리 중: 턴 확정이 다음 마감을 기록 (처리 워커가 죽었다면 임대 만료 후 다시 호출됨)
+        return
+
+    # 마감 이후 읽은 턴 기준으로만 처리 (그 사이 직접 선택했거나 턴이 넘어간 플레이어는 건너뜀)
+    turn = room_data["turn_count"]
+    idle_players = []
+    for uid in pending:
+        idle = await battle_room_store.mark_idle(room_id, uid, turn)
+        if idle < 0:
+            continue
+        if idle >= MAX_IDLE_TURNS:
+            print(f"[Scheduler] User {uid} idle for {idle} turns in room {room_id}, forfeit")
+            await handle_forfeit(room_id, uid, reason="turn_timeout")
+            return
+        idle_players.append(uid)
+
+    claimed_room = None
+    for uid in idle_players:
+        move_id = pick_timeout_move(room_data, uid)
+        applied, claimed = await battle_room_store.timeout_select(room_id, uid, move_id, turn)
+        if not applied:
+            continue
+        await manager.send_to_user(room_id, uid, {
+            "type": "TURN_TIMEOUT",
+            "move_id": move_id,
+            "message": "제한 시간이 지나 기술이 자동으로 선택되었습니다."
+        })
+        claimed_room = claimed or claimed_room
+
+    if claimed_room:
+        await process_turn_redis(room_id, claimed_room)
+
+scheduler.set_handler(handle_turn_timeout)
 
 async def delete_room_state(room_id: str):
     """방과 관련된 모든 Redis 임시 데이터를 삭제합니다."""
-    redis = RedisManager.get_client()
-    keys = [
-        f"room:{room_id}",
-        f"room:{room_id}:players_list",
-        f"room:{room_id}:selections"
-    ]
-    for key in keys:
-        await redis.delete(key)
+    await battle_room_store.delete_room(room_id)
     print(f"🧹 [Cleanup] Room {room_id} data purged.")
 
 # --- [1] 매치메이킹 엔드포인트 (레벨 제한 포함) ---
@@ -130,7 +257,7 @@ async def matchmaking_endpoint(websocket: WebSocket, user_id: int, token: str |
             
             # 🔴 레벨 제한 체크 로직 (Lv.10 미만 입장 불가)
             if not char_stat or char_stat.level < 10:
-                await websocket.send_json({
+                await send_json(websocket, {
                     "type": "ERROR", 
                     "code": "LEVEL_LOW", 
                     "message": f"Lv.10부터 가능합니다. (현재: {char_stat.level if char_stat else 1})"
@@ -142,26 +269,120 @@ async def matchmaking_endpoint(websocket: WebSocket, user_id: int, token: str |
                 except WebSocketDisconnect: pass
                 return
 
-        await matchmaker.add_to_queue(user_id, websocket)
+        # 레이팅이 비슷한 상대와 매칭 (기록이 없으면 기본 레이팅)
+        match = await matchmaker.add_to_queue(user_id, await battle_rating.get_rating(user_id))
+
+        # 매칭 결과(Future)와 클라이언트 메시지를 함께 대기 (폴링 없음)
+        receive = asyncio.ensure_future(websocket.receive_text())
+        try:
+            while True:
+                done, _ = await asyncio.wait(
+                    {receive, match}, timeout=HEARTBEAT_SEC, return_when=asyncio.FIRST_COMPLETED
+                )
+                if match in done:
+                    # 다른 접속에서 다시 대기열에 들어오면 이전 대기는 취소됨
+                    if not match.cancelled():
+                        await send_json(websocket, match.result())
+                    break
+                if receive in done:
+                    data = receive.result()
+                    if data == "CANCEL": break
+                    if data == "AI_BATTLE":
+                        room_id = str(uuid.uuid4())
+                        await battle_room_store.create_room(room_id, is_ai_battle=True)
+                        await send_json(websocket, {"type": "MATCH_FOUND", "room_id": room_id, "opponent_id": 0})
+                        break
+                    receive = asyncio.ensure_future(websocket.receive_text())
+                else:
+                    await matchmaker.heartbeat(user_id)
+        finally:
+            receive.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await matchmaker.remove_from_queue(user_id)
+
+# --- [2] 관전 엔드포인트 ---
+# /ws/battle/{room_id}/{user_id}보다 먼저 선언해야 spectate 경로가 가려지지 않습니다.
+CLOSE_SPECTATE_FORBIDDEN = 4003
+
+async def can_spectate(room_id: str, viewer_id: int) -> Optional[bool]:
+    """플레이어 본인 또는 플레이어의 친구만 관전 가능 (방이 없으면 None)"""
+    members = await RedisManager.get_client().smembers(battle_room_store.players_key(room_id))
+    players = {int(m) for m in members} - {battle_room_store.AI_BOT_ID}
+    if not players:
+        return None
+    if viewer_id in players:
+        return True
+    async with AsyncSessionLocal() as db:
+        friend_ids = await friend_service.get_friend_ids(db, viewer_id)
+    return not players.isdisjoint(friend_ids)
+
+@router.websocket("/ws/battle/spectate/{room_id}")
+async def spectate_endpoint(websocket: WebSocket, room_id: str, token: str | None = None):
+    """
+    방의 BATTLE_START / TURN_RESULT / GAME_OVER를 관전합니다. (수신 전용)
+    토큰의 유저가 플레이어 본인이거나 플레이어의 친구여야 하며, 아니면 4003으로 닫습니다.
+    접속 직후 SPECTATE_SNAPSHOT(현재 상태, turn_count)을 받고, 이후 TURN_RESULT 중
+    turn < turn_count 인 것은 스냅샷에 이미 반영된 턴이므로 클라이언트가 무시합니다.
+    """
+    try:
+        await verify_websocket_token(websocket, token)
+        await websocket.accept()
+    except WebSocketDisconnect:
+        return
+
+    try:
+        viewer_id = verify_token(token) if token else None
+    except HTTPException:
+        viewer_id = None
+    allowed = await can_spectate(room_id, viewer_id) if viewer_id is not None else False
+    if allowed is None:
+        await websocket.close(code=4004)
+        return
+    if not allowed:
+        await websocket.close(code=CLOSE_SPECTATE_FORBIDDEN)
+        return
 
+    async def snapshot() -> Optional[str]:
+        room_data = await battle_room_store.load_room(room_id)
+        if not room_data:
+            return None
+        return encode_text({
+            "type": "SPECTATE_SNAPSHOT",
+            "room_id": room_id,
+            "turn_count": room_data["turn_count"],
+            "players": await build_players_info(room_data),
+            "player_states": battle_replay.player_states(room_data["battle_states"]),
+            "field_effects": room_data["field_effects"],
+            "spectators": room_data["spectators"],
+        })
+
+    # 관전자 수를 먼저 올려야 다른 워커가 처리하는 턴도 이 워커로 발행됨
+    if await battle_room_store.add_spectator(room_id, 1) < 0:
+        await websocket.close(code=4004)
+        return
+
+    viewer = None
+    try:
+        viewer = await spectators.join(room_id, websocket, snapshot)
+        if viewer is None:
+            return
+        # 관전자는 보내는 메시지가 없음 (연결 종료 감지용)
         while True:
-            try:
-                # 🔴 비동기 타임아웃 대기로 매칭 신호 수신 보장
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=1.0)
-                if data == "CANCEL": break
-                if data == "AI_BATTLE":
-                    room_id = str(uuid.uuid4())
-                    await save_room_state(room_id, create_initial_room_data(room_id, is_ai_battle=True))
-                    await websocket.send_json({"type": "MATCH_FOUND", "room_id": room_id, "opponent_id": 0})
-                    break
-            except asyncio.TimeoutError:
-                continue
+            await websocket.receive_text()
     except WebSocketDisconnect:
         pass
+    except Exception as e:
+        print(f"[Spectator] Error: {e}")
     finally:
-        matchmaker.remove_from_queue(user_id)
+        if viewer is not None:
+            spectators.leave(room_id, viewer)
+        elif websocket.application_state.value == 1:  # 허브가 닫지 않았으면 (스냅샷 실패: 방 없음)
+            await websocket.close(code=4004)
+        await battle_room_store.add_spectator(room_id, -1)
 
-# --- [2] 배틀 엔드포인트 (데이터 동기화 및 기권 처리 포함) ---
+# --- [3] 배틀 엔드포인트 (데이터 동기화 및 기권 처리 포함) ---
 @router.websocket("/ws/battle/{room_id}/{user_id}")
 async def battle_endpoint(websocket: WebSocket, room_id: str, user_id: int, token: str | None = None):
     print(f"\n🔥 [BATTLE_DEBUG] =========================================")
@@ -177,10 +398,6 @@ async def battle_endpoint(websocket: WebSocket, room_id: str, user_id: int, toke
         await websocket.accept()
         await manager.connect(room_id, user_id, websocket)
 
-        redis = RedisManager.get_client()
-        players_set_key = f"room:{room_id}:players_list"
-        await redis.sadd(players_set_key, user_id)
-
         async with AsyncSessionLocal() as db:
             char_res = await db.execute(
                 select(Character).options(selectinload(Character.stat)).where(Character.user_id == user_id)
@@ -191,79 +408,42 @@ async def battle_endpoint(websocket: WebSocket, room_id: str, user_id: int, toke
                 return
             stat = char.stat
 
-            # 🔴 데이터 덮어쓰기 방지를 위한 원자적 업데이트
-            room_data = await load_room_state(room_id) or create_initial_room_data(room_id)
-            uid_str = str(user_id)
-            
-            current_players = await redis.smembers(players_set_key)
-            print(f"📢 [BATTLE_DEBUG] 방({room_id}) 현재 접속 인원: {current_players}")
-
-            # 내 정보 기입
-            room_data["character_stats"][uid_str] = {k: v for k, v in stat.__dict__.items() if not k.startswith('_') and isinstance(v, (int, float, str, bool, list, dict))}
-            room_data["pet_types"][uid_str] = char.pet_type
-            room_data["learned_skills"][uid_str] = char.learned_skills or [1]
-
-            if "image_urls" not in room_data: room_data["image_urls"] = {}
-            room_data["image_urls"][uid_str] = {
-                "front": char.front_url,
-                "back": char.back_url,
-                "side": char.side_url,
-                "face": char.face_url
-            }
-
-            if uid_str not in room_data["battle_states"]:
-                room_data["battle_states"][uid_str] = BattleState(max_hp=stat.health, current_hp=stat.health).to_dict()
-
-            # AI 봇 설정 복구
-            if room_data.get("is_ai_battle") and "0" not in room_data["battle_states"]:
-                room_data["players"].append(0)
-                room_data["character_stats"]["0"] = room_data["character_stats"][uid_str]
-                room_data["pet_types"]["0"] = "bear"
-                room_data["learned_skills"]["0"] = [5, 15, 30]
-                room_data["battle_states"]["0"] = room_data["battle_states"][uid_str]
-
-            # 플레이어 리스트 최종 동기화
-            actual_members = await redis.smembers(players_set_key)
-            all_ids = set([int(m) for m in actual_members])
-            if room_data.get("is_ai_battle"): all_ids.add(0)
-            room_data["players"] = list(all_ids)
-
-            await save_room_state(room_id, room_data)
-
-        await manager.broadcast(room_id, {"type": "JOIN", "user_id": user_id, "message": f"User {user_id} joined."})
-
-        # 🔴 배틀 시작 최종 확인 (양측 데이터 무결성 검사)
-        if len(room_data["players"]) >= 2:
-            print(f"⚔️ [BATTLE_DEBUG] 방({room_id}) 인원 충족(2명). 배틀 시작 검사 진입...")
-            await asyncio.sleep(0.5) # 동기화 시간 확보
-            final_check = await load_room_state(room_id)
-
-            for p in final_check["players"]:
-                has_data = str(p) in final_check["battle_states"]
-                print(f"   - 플레이어 {p} 데이터 존재 여부: {has_data}")
-
-            if all(str(p) in final_check["battle_states"] for p in final_check["players"]):
-                await start_battle_check(room_id)
-            else:
-                print(f"⚠️ [BATTLE_DEBUG] 방({room_id}) 인원은 맞지만 데이터 동기화가 아직 안됨.")
+            # 🔴 데이터 덮어쓰기 방지: 내 필드만 원자적으로 기록 (Lua), AI 봇은 최초 1회 생성
+            room_data, started = await battle_room_store.join_room(
+                room_id, user_id,
+                stats={k: v for k, v in stat.__dict__.items() if not k.startswith('_') and isinstance(v, (int, float, str, bool, list, dict))},
+                pet_type=char.pet_type,
+                skills=char.learned_skills or [1],
+                images={
+                    "front": char.front_url,
+                    "back": char.back_url,
+                    "side": char.side_url,
+                    "face": char.face_url
+                },
+                initial_state=BattleState(max_hp=stat.health, current_hp=stat.health)
+            )
+            print(f"📢 [BATTLE_DEBUG] 방({room_id}) 현재 접속 인원: {room_data['players']}")
+
+        await manager.broadcast(room_id, {"type": "JOIN", "user_id": user_id, "message": f"User {user_id} joined."},
+                                spectated=room_data["spectators"] > 0, is_ai=room_data["is_ai_battle"])
+
+        # 🔴 배틀 시작: 양측 준비 완료는 입장 스크립트가 원자적으로 판정 (두 번째로 준비된 입장에서만 started)
+        if started:
+            print(f"⚔️ [BATTLE_DEBUG] 방({room_id}) 양측 준비 완료. 배틀 시작!")
+            await start_battle_check(room_id, room_data)
+        elif room_data["started"]:
+            # 재접속: 진행 중인 배틀 정보를 이 유저에게만 다시 전송
+            await start_battle_check(room_id, room_data, user_id=user_id)
 
         while True:
             msg = await websocket.receive_json()
             if msg.get("action") == "select_move":
                 move_id = msg.get("move_id")
-                await redis.hset(f"room:{room_id}:selections", uid_str, move_id)
-
-                if room_data.get("is_ai_battle"):
-                    bot_move = random.choice(room_data["learned_skills"].get("0", [5]))
-                    await redis.hset(f"room:{room_id}:selections", "0", str(bot_move))
-
-                all_selections = await redis.hgetall(f"room:{room_id}:selections")
-                if len(all_selections) >= 2:
-                    current_room = await load_room_state(room_id)
-                    current_room["selections"] = {k: int(v) for k, v in all_selections.items()}
-                    await save_room_state(room_id, current_room)
-                    await redis.delete(f"room:{room_id}:selections")
-                    await process_turn_redis(room_id)
+
+                # 선택 기록 + 전원 선택 시 턴 획득 (원자적, 1회 왕복, AI 봇 선택은 턴 처리에서)
+                claimed_room = await battle_room_store.select_move(room_id, user_id, move_id)
+                if claimed_room:
+                    await process_turn_redis(room_id, claimed_room)
                 else:
                     await manager.send_to_user(room_id, user_id, {"type": "WAITING"})
 
@@ -277,67 +457,57 @@ async def battle_endpoint(websocket: WebSocket, room_id: str, user_id: int, toke
             await websocket.close(code=4000)
     finally:
         redis = RedisManager.get_client()
-        # 플레이어 리스트에서 나간 유저 제거
-        await redis.srem(f"room:{room_id}:players_list", user_id)
-        # 남은 인원 확인
-        remaining = await redis.scard(f"room:{room_id}:players_list")
+        players_set_key = battle_room_store.players_key(room_id)
+        # 플레이어 리스트에서 나간 유저 제거 + 남은 인원 확인
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.srem(players_set_key, user_id)
+            pipe.scard(players_set_key)
+            _, remaining = await pipe.execute()
         if remaining == 0:
             await delete_room_state(room_id)
         
-async def start_battle_check(room_id: str):
+async def build_players_info(room_data: dict) -> dict:
+    """BATTLE_START / 관전 스냅샷용 플레이어 정보 (캐시된 배틀 카드 + 현재 HP/PP)"""
+    cards = await battle_card.get_cards(room_data)
+    states = room_data.get("battle_states", {})
+    return {uid: battle_card.with_state(card, states.get(uid)) for uid, card in cards.items()}
+
+async def start_battle_check(room_id: str, room_data: Optional[dict] = None, user_id: Optional[int] = None):
+    """
+    BATTLE_START 전송. room_data는 join_room이 반환한 스냅샷 (재조회 없음)
+    user_id가 있으면 재접속한 유저에게만 보내고 턴 마감은 그대로 둡니다.
+    """
     try:
-        room_data = await load_room_state(room_id)
+        if room_data is None:
+            room_data = await battle_room_store.load_room(room_id)
         if not room_data:
             print(f"❌ [BATTLE_ERROR] 방 데이터를 찾을 수 없음: {room_id}")
             return
         
-        stats_info = {}
-        for uid in room_data["players"]:
-            uid_str = str(uid)
-            
-            # 1. 배틀 상태 안전하게 가져오기 (기본값 100)
-            user_battle_state = room_data.get("battle_states", {}).get(uid_str, {})
-            current_hp = user_battle_state.get("current_hp", 100)
-            max_hp = user_battle_state.get("max_hp", 100)
-
-            # 2. 스킬 상세 정보 (비어있어도 진행되게)
-            details = []
-            sids = room_data.get("learned_skills", {}).get(uid_str, [1])
-            for sid in sids:
-                md = MOVE_DATA.get(sid)
-                if md:
-                    pp_dict = user_battle_state.get("pp", {})
-                    details.append({
-                        "id": sid, "name": md["name"], "type": md["type"],
-                        "power": md["power"], "desc": md["description"],
-                        "max_pp": md.get("max_pp", 20),
-                        "pp": pp_dict.get(str(sid), md.get("max_pp", 20))
-                    })
-            
-            # 3. 이미지 데이터 (None일 경우 빈 문자열 처리 - 프론트 크래시 방지)
-            imgs = room_data.get("image_urls", {}).get(uid_str, {})
-
-            # 🔴 여기서 하나라도 Key가 없으면 KeyError로 서버가 죽습니다. .get()으로 방어!
-            stats_info[uid_str] = {
-                "id": int(uid),
-                "hp": current_hp,
-                "max_hp": max_hp,
-                "name": f"User {uid_str}",
-                "pet_type": room_data.get("pet_types", {}).get(uid_str, "dog"),
-                "skills": details,
-                "front_url": imgs.get("front") or "",
-                "back_url": imgs.get("back") or "",
-                "side_url": imgs.get("side") or "",
-                "face_url": imgs.get("face") or "",
-            }
-        
+        stats_info = await build_players_info(room_data)
+
+        if user_id is not None:
+            await manager.send_to_user(room_id, user_id, {
+                "type": "BATTLE_START",
+                "players": stats_info,
+                "turn": room_data["turn_count"],
+                "turn_deadline": await scheduler.deadline(room_id),
+                "message": "Battle Resumed!"
+            })
+            return
+
+        # 첫 턴 선택 마감 (입장 마감을 대체)
+        deadline = turn_deadline()
+        await scheduler.schedule(room_id, deadline)
+
         # 4. 데이터 전송 시도
         print(f"🚀 [BATTLE_DEBUG] 방({room_id}) 데이터 조립 완료. 전송 시도...")
         await manager.broadcast(room_id, {
             "type": "BATTLE_START",
             "players": stats_info,
+            "turn_deadline": deadline,
             "message": "Battle Started!"
-        })
+        }, spectated=room_data["spectators"] > 0, is_ai=room_data["is_ai_battle"])
         print(f"✅ [BATTLE_DEBUG] 시작 신호 전송 성공!")
 
     except Exception as e:
@@ -347,151 +517,58 @@ async def start_battle_check(room_id: str):
         print(f"🔥 에러 내용: {e}")
         print(traceback.format_exc()) # 어디서 틀렸는지 상세 경로 출력
 
-async def process_turn_redis(room_id: str):
+async def process_turn_redis(room_id: str, room_data: Optional[dict] = None):
+    """
+    양측 선택이 모인 턴을 처리합니다.
+    room_data는 battle_room_store.select_move가 턴을 획득하며 반환한 스냅샷입니다.
+    난수는 방 시드와 턴 번호로 만든 스트림을 사용하므로 턴 로그만으로 리플레이를 재구성할 수 있습니다.
+    """
     print(f"[Battle-Debug] process_turn_redis called for room {room_id}")
-    room_data = await load_room_state(room_id)
+    if room_data is None:
+        room_data = await battle_room_store.load_room(room_id)
     if not room_data: return
     
     players = room_data["players"]
     u1, u2 = players[0], players[1]
     su1, su2 = str(u1), str(u2)
+    turn = room_data["turn_count"]
     
-    class StatObj:
-        def __init__(self, d):
-            for k, v in d.items(): setattr(self, k, v)
-    
-    stat1 = StatObj(room_data["character_stats"][su1])
-    stat2 = StatObj(room_data["character_stats"][su2])
-    
-    state1 = BattleState.from_dict(room_data["battle_states"][su1])
-    state2 = BattleState.from_dict(room_data["battle_states"][su2])
+    stats = {uid: CombatStats.from_dict(room_data["character_stats"][uid]) for uid in (su1, su2)}
+    states = {uid: room_data["battle_states"][uid] for uid in (su1, su2)}
+    state1, state2 = states[su1], states[su2]
+    if room_data["is_ai_battle"]:
+        # 봇은 턴을 획득한 스냅샷(현재 턴의 전투 상태)으로 탐색
+        bot_uid = str(battle_room_store.AI_BOT_ID)
+        room_data["selections"][bot_uid] = await battle_ai.choose_bot_move(room_data, battle_room_store.AI_BOT_ID)
+    selections = {uid: room_data["selections"][uid] for uid in (su1, su2)}
     
     print(f"[Battle-Debug] Loaded HP - U1: {state1.current_hp}/{state1.max_hp}, U2: {state2.current_hp}/{state2.max_hp}", flush=True)
-    
-    move1 = room_data["selections"][su1]
-    move2 = room_data["selections"][su2]
-    
-    # 2. Logic (Turn Order)
-    first = BattleManager.determine_turn_order(stat1, state1, move1, stat2, state2, move2)
-    
-    order = []
-    if first == 1: order = [(u1, u2), (u2, u1)]
-    else: order = [(u2, u1), (u1, u2)]
-    
-    turn_logs = []
-    
-    # [Debug] Initial HP
-    print(f"[Battle-Debug] Turn Start - U1({u1}) HP: {state1.current_hp}, U2({u2}) HP: {state2.current_hp}")
-
-    # 3. Execution Loop
-    for att_id, def_id in order:
-        s_att_id, s_def_id = str(att_id), str(def_id)
-        
-        att_stat = stat1 if att_id == u1 else stat2
-        def_stat = stat2 if att_id == u1 else stat1
-        
-        att_state = state1 if att_id == u1 else state2
-        def_state = state2 if att_id == u1 else state1
-        
-        move_id = move1 if att_id == u1 else move2
-        
-        # [New] Animation Trigger
-        md = MOVE_DATA.get(move_id, {})
-        turn_logs.append({
-            "type": "turn_event",
-            "event_type": "attack_start",
-            "attacker": att_id,
-            "defender": def_id,
-            "move_id": move_id,
-            "move_type": md.get("type", "normal")
-        })
 
-        # [Debug] Before Hit
-        print(f"[Battle-Debug] Action - Attacker: {att_id}, Move: {move_id}, Def HP: {def_state.current_hp}")
+    # 첫 턴이면 리플레이 시작 정보(처리 전 상태)를 함께 기록
+    start_entry = battle_replay.start_entry(room_data) if turn == 0 else None
 
-        # Attack Logic 
-        md = MOVE_DATA.get(move_id, {})
-        
-        # PP Check could go here, but omitted for brevity in auto-battle loop for now
-        
-        is_hit = False
-        eff = md.get("effect", {})
-        if isinstance(eff, dict) and eff.get("target") == "self": is_hit = True
-        elif md.get("type") in ["heal", "buff"]: is_hit = True
-        else:
-             is_hit = BattleCalculator.check_hit(att_stat, att_state, def_stat, def_state, move_id)
-        
-        if not is_hit:
-            turn_logs.append({
-                "type": "turn_event",
-                "event_type": "hit_result",
-                "result": "miss",
-                "attacker": att_id,
-                "defender": def_id,
-                "message": "공격이 빗나갔습니다!"
-            })
-        else:
-             # Damage
-             from app.game.game_assets import PET_TYPE_MAP
-             def_pt = room_data["pet_types"][s_def_id]
-             def_elem = PET_TYPE_MAP.get(def_pt, "normal")
-             
-             dmg, is_crit, eff_type = BattleManager.calculate_damage(att_stat, att_state, def_stat, def_state, move_id, defender_type=def_elem, field_data=room_data["field_effects"])
-             
-             def_state.current_hp = max(0, def_state.current_hp - dmg)
-             
-             # [Debug] After Hit
-             print(f"[Battle-Debug] Hit! Dmg: {dmg}, Def Remaining: {def_state.current_hp}")
-             
-             turn_logs.append({
-                 "type":"turn_event", "event_type":"hit_result", "result":"hit",
-                 "attacker": att_id, "defender": def_id,
-                 "damage": dmg, "defender_hp": def_state.current_hp, "is_critical": is_crit,
-                 "message": f"{dmg} 피해!"
-             })
-
-             # Effects
-             if def_state.current_hp > 0:
-                elog = BattleManager.apply_move_effects(move_id, att_state, def_state, att_stat, f"User {att_id}", f"User {def_id}")
-                for l in elog:
-                    l["attacker"] = att_id
-                    l["defender"] = def_id
-                    if l.get("type") == "field_update":
-                        room_data["field_effects"][l.get("field")] = l.get("value")
-                    turn_logs.append(l)
-
-        if def_state.current_hp <= 0: break
-
-    # [New] Status Effect Damage
-    for uid, state, stat in [(u1, state1, stat1), (u2, state2, stat2)]:
-        if state.current_hp <= 0: continue 
-
-        dmg, msg, detail = BattleManager.process_status_effects(stat, state)
-        if dmg > 0:
-            state.current_hp = max(0, state.current_hp - dmg)
-            print(f"[Battle-Debug] Status Dmg - User: {uid}, Dmg: {dmg}, Rem: {state.current_hp}")
-        
-        if detail:
-            detail["target"] = uid
-            turn_logs.append(detail)
-    
-    # [Debug] Final State
-    print(f"[Battle-Debug] Turn End - U1 HP: {state1.current_hp}, U2 HP: {state2.current_hp}")
+    # 2~3. 선공 결정 + 공격/효과 + 상태 이상 (순수 함수, 턴별 시드 난수)
+    turn_logs = BattleManager.resolve_turn(
+        players, stats, states, room_data["pet_types"], selections, room_data["field_effects"],
+        rng=turn_rng(room_data["seed"], turn)
+    )
 
     # [Debug] Final State
     print(f"[Battle-Debug] Turn End - U1 HP: {state1.current_hp}, U2 HP: {state2.current_hp}", flush=True)
 
-    # 4. Serialize Back & Save
-    d1 = state1.to_dict()
-    d2 = state2.to_dict()
-    print(f"[Battle-Debug] ToDict - U1: {d1['current_hp']}, U2: {d2['current_hp']}", flush=True)
-    
-    room_data["battle_states"][su1] = d1
-    room_data["battle_states"][su2] = d2
-    room_data["selections"] = {} 
-    room_data["turn_count"] += 1
-    
-    await save_room_state(room_id, room_data)
+    is_over = state1.current_hp <= 0 or state2.current_hp <= 0
+    # 다음 턴 선택 마감 (종료면 0 → 마감 제거)
+    deadline = 0 if is_over else turn_deadline()
+
+    # 4. Serialize Back & Save (턴 번호 확인 후 원자적 기록 + 턴 로그 추가 + 다음 마감, 1회 왕복)
+    committed = await battle_room_store.commit_turn(
+        room_id, turn, states, room_data["field_effects"],
+        log_entry=battle_replay.turn_entry(turn, selections, states, room_data["field_effects"]),
+        start_entry=start_entry, next_deadline=deadline
+    )
+    if not committed:
+        print(f"[Battle-Debug] Turn {turn} already committed for room {room_id}, skip")
+        return
     
     # 5. Broadcast Result
     player_states = {
@@ -509,14 +586,15 @@ async def process_turn_redis(room_id: str):
     
     print(f"[Battle-Debug] Broadcast Payload: {player_states}")
     
-    is_over = state1.current_hp <= 0 or state2.current_hp <= 0
-    
+    spectated = room_data["spectators"] > 0
     await manager.broadcast(room_id, {
         "type": "TURN_RESULT",
+        "turn": turn,
         "results": turn_logs,
         "player_states": player_states,
-        "is_game_over": is_over
-    })
+        "is_game_over": is_over,
+        "turn_deadline": deadline or None
+    }, spectated=spectated, is_ai=room_data["is_ai_battle"])
     
     if is_over:
         winner, loser = None, None
@@ -527,6 +605,14 @@ async def process_turn_redis(room_id: str):
         else:
             winner, loser = u1, u2
              
+        # 레이팅 반영 (AI 대전 제외, Redis 1회 왕복 / DB 저장은 주기적으로)
+        ratings = None
+        if not room_data["is_ai_battle"]:
+            ratings = await battle_rating.record_result(
+                room_id, u1 if winner == "DRAW" else winner, u2 if winner == "DRAW" else loser,
+                room_data["pet_types"], draw=winner == "DRAW"
+            )
+
         if winner == "DRAW":
             draw_rewards = {}
             try:
@@ -538,8 +624,9 @@ async def process_turn_redis(room_id: str):
             await manager.broadcast(room_id, {
                 "type": "GAME_OVER", 
                 "result": "DRAW",
-                "rewards": draw_rewards
-            })
+                "rewards": draw_rewards,
+                "ratings": ratings
+            }, spectated=spectated, is_ai=room_data["is_ai_battle"])
         else:
             reward_info = None
             try:
@@ -552,20 +639,24 @@ async def process_turn_redis(room_id: str):
                 "type": "GAME_OVER",
                 "result": "WIN",
                 "winner": winner,
-                "reward": reward_info
+                "reward": reward_info,
+                "ratings": ratings
                 })
                 
             await manager.send_to_user(room_id, loser, {
                 "type": "GAME_OVER",
                 "result": "LOSE",
-                "winner": winner
+                "winner": winner,
+                "ratings": ratings
             })
-        await delete_room_state(room_id)
 
-    else:
-        room_data["selections"] = {}
-        room_data["turn_count"] += 1
-        room_data["battle_states"][su1] = state1.to_dict()
-        room_data["battle_states"][su2] = state2.to_dict()
-        
-        await save_room_state(room_id, room_data)
\ No newline at end of file
+        await manager.broadcast_spectators(room_id, {
+            "type": "GAME_OVER",
+            "result": "DRAW" if winner == "DRAW" else "END",
+            "winner": None if winner == "DRAW" else winner
+        }, spectated=spectated, final=True)
+
+        # 턴 로그 스트림을 리플레이로 저장 (방 삭제 전에)
+        await battle_replay.save_replay(room_id, None if winner == "DRAW" else winner,
+                                        "draw" if winner == "DRAW" else "ko")
+        await delete_room_state(room_id)
\ No newline at end of file
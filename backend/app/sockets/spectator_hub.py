@@ -0,0 +1,147 @@
+# backend/app/sockets/spectator_hub.py
+"""
+배틀 관전자 팬아웃 허브 (워커 단위)
+플레이어 전송 경로(BattleConnectionManager)와 분리하여, 관전자가 수백 명이어도 턴 처리가 느려지지 않게 합니다.
+
+- 메시지는 호출 측에서 한 번만 인코딩한 문자열을 그대로 넣습니다.
+- 관전자마다 제한된 크기의 버퍼와 전송 태스크를 두어, publish는 버퍼에 넣기만 하고 바로 반환합니다. (동시 전송)
+- 버퍼가 가득 차거나 한 번의 전송이 제한 시간을 넘기는 느린 관전자는 연결을 끊습니다.
+- 늦게 들어온 관전자는 스냅샷을 먼저 받고, 스냅샷을 만드는 동안 도착한 메시지는 그 뒤에 받습니다.
+"""
+import os
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi import WebSocket
+
+SPECTATOR_QUEUE_SIZE = int(os.getenv("SPECTATOR_QUEUE_SIZE", "32"))
+SPECTATOR_SEND_TIMEOUT = float(os.getenv("SPECTATOR_SEND_TIMEOUT", "5"))
+SPECTATOR_MAX_PER_ROOM = int(os.getenv("SPECTATOR_MAX_PER_ROOM", "500"))
+
+CLOSE_SLOW_CONSUMER = 4008
+CLOSE_ROOM_FULL = 4009
+
+
+class Viewer:
+    """관전자 1명의 전송 버퍼와 전송 태스크"""
+    __slots__ = ("websocket", "buffer", "wakeup", "task", "closed")
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.buffer = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    def push(self, encoded: str) -> bool:
+        """버퍼에 추가 (가득 차면 False)"""
+        if len(self.buffer) >= SPECTATOR_QUEUE_SIZE:
+            return False
+        self.buffer.append(encoded)
+        self.wakeup.set()
+        return True
+
+    def push_front(self, encoded: str):
+        """스냅샷처럼 먼저 보내야 하는 메시지 (크기 제한 없음)"""
+        self.buffer.appendleft(encoded)
+        self.wakeup.set()
+
+    async def run(self):
+        while not self.closed:
+            if not self.buffer:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            await asyncio.wait_for(self.websocket.send_text(self.buffer.popleft()), SPECTATOR_SEND_TIMEOUT)
+
+
+class SpectatorHub:
+    def __init__(self):
+        self.rooms: Dict[str, Dict[int, Viewer]] = {}
+
+    def count(self, room_id: str) -> int:
+        return len(self.rooms.get(room_id, ()))
+
+    async def join(self, room_id: str, websocket: WebSocket,
+                   snapshot: Callable[[], Awaitable[Optional[str]]]) -> Optional[Viewer]:
+        """
+        관전자 등록 후 스냅샷을 맨 앞에 넣고 전송을 시작합니다.
+        등록을 먼저 하므로 스냅샷을 만드는 사이의 메시지도 놓치지 않습니다. (중복은 클라이언트가 turn으로 거름)
+        스냅샷이 None(방 없음)이거나 방 인원이 가득 차면 None.
+        """
+        viewers = self.rooms.setdefault(room_id, {})
+        if len(viewers) >= SPECTATOR_MAX_PER_ROOM:
+            await websocket.close(code=CLOSE_ROOM_FULL)
+            self._cleanup(room_id)
+            return None
+
+        viewer = Viewer(websocket)
+        viewers[id(viewer)] = viewer
+        encoded = await snapshot()
+        if encoded is None:
+            self.leave(room_id, viewer)
+            return None
+        viewer.push_front(encoded)
+        viewer.task = asyncio.create_task(self._sender(room_id, viewer))
+        return viewer
+
+    def leave(self, room_id: str, viewer: Viewer):
+        viewer.closed = True
+        viewer.wakeup.set()
+        if viewer.task is not None and viewer.task is not asyncio.current_task():
+            viewer.task.cancel()
+        viewers = self.rooms.get(room_id)
+        if viewers is not None:
+            viewers.pop(id(viewer), None)
+        self._cleanup(room_id)
+
+    def publish(self, room_id: str, encoded: str) -> int:
+        """이 워커의 관전자 버퍼에 추가 (대기 없음, 전달한 관전자 수 반환)"""
+        viewers = self.rooms.get(room_id)
+        if not viewers:
+            return 0
+        slow = [v for v in viewers.values() if not v.push(encoded)]
+        for viewer in slow:
+            self._drop(room_id, viewer, "queue full")
+        return len(viewers)
+
+    def close_room(self, room_id: str):
+        """대전 종료: 각 관전자 태스크가 남은 메시지를 보낸 뒤 연결을 닫음"""
+        for viewer in list(self.rooms.get(room_id, {}).values()):
+            viewer.closed = True
+            viewer.wakeup.set()
+
+    async def _sender(self, room_id: str, viewer: Viewer):
+        try:
+            await viewer.run()
+            # close_room 이후 남은 메시지 전송
+            while viewer.buffer:
+                await asyncio.wait_for(viewer.websocket.send_text(viewer.buffer.popleft()), SPECTATOR_SEND_TIMEOUT)
+            await viewer.websocket.close()
+        except asyncio.CancelledError:
+            return
+        except asyncio.TimeoutError:
+            self._drop(room_id, viewer, "send timeout")
+            return
+        except Exception:
+            pass
+        self.leave(room_id, viewer)
+
+    def _drop(self, room_id: str, viewer: Viewer, reason: str):
+        print(f"[Spectator] Dropping slow viewer in room {room_id} ({reason})")
+        self.leave(room_id, viewer)
+        asyncio.create_task(self._close(viewer.websocket, CLOSE_SLOW_CONSUMER))
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def _cleanup(self, room_id: str):
+        if not self.rooms.get(room_id):
+            self.rooms.pop(room_id, None)
+
+
+spectators = SpectatorHub()
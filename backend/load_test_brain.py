@@ -0,0 +1,178 @@
+"""
+Brain 모듈 오프라인 부하 테스트
+가짜 LLM(LLM_PROVIDER=fake)으로 N명의 훈련 사용자를 시뮬레이션하여
+get_character_response 경로(디스패처 → 캐시 → LangGraph → Redis 기억)의
+처리량, 지연, 대기열, Redis 상태 크기를 측정합니다.
+
+Redis 서버가 필요합니다 (REDIS_URL 또는 REDIS_HOST/REDIS_PORT).
+테스트 사용자 ID는 --user-offset부터 사용하며 종료 시 생성한 키를 삭제합니다. (--keep으로 유지)
+
+Usage:
+    python load_test_brain.py --users 200 --duration 30 --latency-ms 800 --jitter-ms 300 --error-rate 0.02
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+# 가짜 LLM 설정은 graphs import 전에 적용해야 함
+parser = argparse.ArgumentParser(description="Brain offline load test")
+parser.add_argument("--users", type=int, default=100, help="동시 훈련 사용자 수")
+parser.add_argument("--duration", type=float, default=20.0, help="측정 시간 (초)")
+parser.add_argument("--event-interval", type=float, default=4.0, help="사용자당 평균 이벤트 간격 (초)")
+parser.add_argument("--latency-ms", type=float, default=800.0)
+parser.add_argument("--jitter-ms", type=float, default=300.0)
+parser.add_argument("--error-rate", type=float, default=0.0)
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--user-offset", type=int, default=900000, help="테스트 사용자 ID 시작값")
+parser.add_argument("--concurrency", type=int, default=None, help="LLM_MAX_CONCURRENCY 재정의")
+parser.add_argument("--rate", type=float, default=None, help="LLM_RATE_PER_SEC 재정의 (0 = 무제한)")
+parser.add_argument("--direct", action="store_true", help="디스패처 없이 get_character_response 직접 호출")
+parser.add_argument("--keep", action="store_true", help="테스트 후 Redis 키 유지")
+args = parser.parse_args()
+
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["LLM_FAKE_LATENCY_MS"] = str(args.latency_ms)
+os.environ["LLM_FAKE_JITTER_MS"] = str(args.jitter_ms)
+os.environ["LLM_FAKE_ERROR_RATE"] = str(args.error_rate)
+os.environ["LLM_FAKE_SEED"] = str(args.seed)
+if args.concurrency is not None:
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+if args.rate is not None:
+    os.environ["LLM_RATE_PER_SEC"] = str(args.rate)
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.database_redis import RedisManager
+from app.ai_core.brain import graphs, memory
+from app.ai_core.brain.dispatcher import dispatcher, priority_for
+from app.ai_core.brain.response_cache import response_cache
+
+MODES = ["playing", "feeding", "interaction"]
+ACTIONS = {"playing": "Playing Fetch", "feeding": "Feeding", "interaction": "Interaction Owner"}
+REWARDS = {
+    "playing": [{"stat_type": "strength", "value": 3}, {"stat_type": "agility", "value": 3}],
+    "feeding": [{"stat_type": "health", "value": 3}, {"stat_type": "defense", "value": 3}],
+    "interaction": [{"stat_type": "happiness", "value": 4}, {"stat_type": "intelligence", "value": 3}],
+}
+
+latencies = []
+dropped = 0
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def trainee(user_id: int, rng: random.Random, deadline: float):
+    """훈련 사용자 1명: 인사 → (실패/대기/성공) 이벤트 반복"""
+    global dropped
+    mode = rng.choice(MODES)
+    stats = {"strength": rng.randint(0, 90), "health": rng.randint(0, 90), "happiness": rng.randint(0, 90)}
+    session = dispatcher.session(user_id)
+    daily = 0
+    event = ("greeting", False)
+
+    while time.time() < deadline:
+        action_type, is_success = event
+        kwargs = dict(current_stats=dict(stats), mode=mode, is_success=is_success)
+        if is_success:
+            daily += 1
+            reward = rng.choice(REWARDS[mode])
+            stats[reward["stat_type"]] = stats.get(reward["stat_type"], 0) + reward["value"]
+            kwargs.update(
+                action_type=ACTIONS[mode], reward_info=reward, daily_count=daily,
+                milestone_reached=rng.random() < 0.1
+            )
+        else:
+            kwargs.update(action_type=action_type, feedback_detail="pose_unstable" if action_type == mode else "")
+
+        t0 = time.perf_counter()
+        if args.direct:
+            await graphs.get_character_response(user_id, **kwargs)
+            latencies.append(time.perf_counter() - t0)
+        else:
+            async def timed_call(kwargs=kwargs, t0=t0):
+                msg = await graphs.get_character_response(user_id, **kwargs)
+                latencies.append(time.perf_counter() - t0)
+                return msg
+            if session.submit(priority_for(action_type, is_success), timed_call) is None:
+                dropped += 1
+
+        await asyncio.sleep(min(rng.expovariate(1.0 / args.event_interval), max(0.0, deadline - time.time())))
+        roll = rng.random()
+        event = ("idle", False) if roll < 0.2 else (mode, False) if roll < 0.6 else (ACTIONS[mode], True)
+
+    session.close()
+
+
+async def sample_queue(deadline: float, samples: list):
+    while time.time() < deadline:
+        samples.append((dispatcher.queued, dispatcher.in_flight))
+        await asyncio.sleep(0.1)
+
+
+async def redis_state_size(user_ids):
+    """사용자별 대화 기억 키 수와 페이로드 크기(바이트)"""
+    client = RedisManager.get_client()
+    keys = 0
+    total_bytes = 0
+    messages = 0
+    for uid in user_ids:
+        rows = await client.lrange(f"brain_history:{uid}", 0, -1)
+        meta = await client.hgetall(f"brain_meta:{uid}")
+        keys += bool(rows) + bool(meta)
+        messages += len(rows)
+        total_bytes += sum(len(r.encode("utf-8")) for r in rows)
+        total_bytes += sum(len(k) + len(v) for k, v in meta.items())
+    return keys, total_bytes, messages
+
+
+async def main():
+    user_ids = list(range(args.user_offset, args.user_offset + args.users))
+    deadline = time.time() + args.duration
+    samples = []
+
+    print(f"=== Brain Load Test: {args.users} users, {args.duration:.0f}s, "
+          f"latency {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms, error {args.error_rate:.1%}, "
+          f"{'direct' if args.direct else 'dispatcher'} ===")
+
+    t0 = time.perf_counter()
+    await asyncio.gather(
+        sample_queue(deadline, samples),
+        *(trainee(uid, random.Random(args.seed * 100003 + uid), deadline) for uid in user_ids)
+    )
+    # 남은 호출 정리 대기
+    while dispatcher.in_flight or dispatcher.queued:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - t0
+
+    m = dispatcher.metrics()
+    print(f"Completed: {len(latencies)} responses in {elapsed:.1f}s -> {len(latencies) / elapsed:.1f} msg/s")
+    print(f"Latency  : p50 {percentile(latencies, 0.5) * 1000:.0f}ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f}ms, p99 {percentile(latencies, 0.99) * 1000:.0f}ms")
+    if not args.direct:
+        print(f"Queue    : peak queued {max((q for q, _ in samples), default=0)}, "
+              f"peak in-flight {max((f for _, f in samples), default=0)}, dropped at submit {dropped}")
+        print(f"Dispatch : {m}")
+    print(f"LLM      : {graphs.llm.calls} calls, {graphs.llm.errors} errors")
+    print(f"Cache    : {response_cache.metrics()}")
+
+    keys, total_bytes, messages = await redis_state_size(user_ids)
+    print(f"Redis    : {keys} keys, {total_bytes / 1024:.1f} KiB payload, {messages} messages "
+          f"({total_bytes / max(1, args.users):.0f} B/user, history cap {memory.HISTORY_LIMIT})")
+
+    if not args.keep:
+        client = RedisManager.get_client()
+        for uid in user_ids:
+            await client.delete(f"brain_history:{uid}", f"brain_meta:{uid}")
+    await RedisManager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
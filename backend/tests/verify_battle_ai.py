@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import random
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.game.battle_manager import BattleState, CombatStats
+from app.game.battle_ai import Searcher, _Side
+from app.game.battle_simulator import typical_fighter
+from verify_battle_sim import FIELD, play_battle
+
+
+def ai_policy(f_self, f_opp, difficulty):
+    searcher_args = (_Side(CombatStats.from_dict(f_self.stats), f_self.skills, f_self.pet_type),
+                     _Side(CombatStats.from_dict(f_opp.stats), f_opp.skills, f_opp.pet_type), difficulty)
+
+    def choose(my_state, opp_state):
+        return Searcher(*searcher_args).choose(my_state, opp_state, dict(FIELD))
+    return choose
+
+
+def random_policy(f_self):
+    return lambda my_state, opp_state: random.choice(f_self.skills)
+
+
+def test_beats_random(difficulty, n=40, min_rate=0.6):
+    """같은 펫끼리(미러 매치) 무작위 선택 상대에게 이기는 비율"""
+    print(f"=== AI({difficulty}) vs Random ===")
+    random.seed(42)
+    all_ok = True
+    for pet, level in (("bear", 30), ("cat", 30)):
+        f = typical_fighter(pet, level)
+        wins = 0
+        start = time.perf_counter()
+        for i in range(n):
+            # 선후(플레이어 번호)를 번갈아 배치
+            if i % 2 == 0:
+                result, _ = play_battle(f, f, ai_policy(f, f, difficulty), random_policy(f))
+                wins += result == "p1_win"
+            else:
+                result, _ = play_battle(f, f, random_policy(f), ai_policy(f, f, difficulty))
+                wins += result == "p2_win"
+        rate = wins / n
+        ok = rate >= min_rate
+        all_ok &= ok
+        print(f"{pet}{level}: win rate {rate:.2f} ({time.perf_counter() - start:.1f}s) {'PASS' if ok else 'FAIL'}")
+    return all_ok
+
+
+def test_budget():
+    print("=== Time Budget ===")
+    f1, f2 = typical_fighter("dog", 40), typical_fighter("bird", 40)
+    searcher = Searcher(_Side(CombatStats.from_dict(f1.stats), f1.skills, f1.pet_type),
+                        _Side(CombatStats.from_dict(f2.stats), f2.skills, f2.pet_type), "hard", budget_ms=20)
+    start = time.perf_counter()
+    move = searcher.choose(BattleState(f1.stats["health"], f1.stats["health"]),
+                           BattleState(f2.stats["health"], f2.stats["health"]), dict(FIELD))
+    elapsed = (time.perf_counter() - start) * 1000
+    # 깊이 1은 예산과 무관하게 완료, 이후 깊이는 예산 초과 시 중단
+    ok = move in f1.skills and elapsed < 20 + 30
+    print(f"move {move} in {elapsed:.1f}ms {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+if __name__ == "__main__":
+    results = [test_budget(), test_beats_random("easy", min_rate=0.5), test_beats_random("normal", n=20)]
+    print("\nALL PASS" if all(results) else "\nSOME FAILED")
@@ -0,0 +1,69 @@
+import os
+import sys
+import random
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.game.battle_manager import BattleManager, BattleState, CombatStats, turn_rng
+from app.game.battle_replay import start_entry, turn_entry, rebuild
+from app.game.battle_simulator import typical_fighter
+from app.core.serialization import encode_text, loads
+
+
+def record_battle(seed, f1, f2, max_turns=100):
+    """process_turn_redis와 같은 방식으로 한 판 진행하며 턴 로그를 만든다 (JSON 왕복 포함)"""
+    room = {
+        "seed": seed,
+        "players": [1, 2],
+        "is_ai_battle": False,
+        "character_stats": {"1": f1.stats, "2": f2.stats},
+        "pet_types": {"1": f1.pet_type, "2": f2.pet_type},
+        "learned_skills": {"1": list(f1.skills), "2": list(f2.skills)},
+        "battle_states": {uid: BattleState(f.stats["health"], f.stats["health"]) for uid, f in (("1", f1), ("2", f2))},
+        "field_effects": {"weather": "rain", "location": "volcano"},
+    }
+    start = start_entry(room)
+    stats = {uid: CombatStats.from_dict(s) for uid, s in room["character_stats"].items()}
+    states = room["battle_states"]
+    turns, events = [], []
+    picker = random.Random(seed)  # 플레이어 선택 (로그에 기록되므로 재구성에는 불필요)
+    for turn in range(max_turns):
+        selections = {"1": picker.choice(f1.skills), "2": picker.choice(f2.skills)}
+        events.append(BattleManager.resolve_turn(
+            room["players"], stats, states, room["pet_types"], selections, room["field_effects"],
+            rng=turn_rng(seed, turn)
+        ))
+        turns.append(loads(encode_text(turn_entry(turn, selections, states, room["field_effects"]))))
+        if min(s.current_hp for s in states.values()) <= 0:
+            break
+    return loads(encode_text(start)), turns, events
+
+
+def test_rebuild():
+    print("=== Replay Rebuild ===")
+    all_ok = True
+    for seed, (p1, p2) in (("a1b2", ("cat", "dog")), ("c3d4", ("bird", "bear")), ("e5f6", ("dog", "dog"))):
+        start, turns, events = record_battle(seed, typical_fighter(p1, 30), typical_fighter(p2, 30))
+        replay = rebuild(start, turns)
+        ok = replay["verified"] and [t["results"] for t in replay["turns"]] == loads(encode_text(events))
+        all_ok &= ok
+        print(f"{p1} vs {p2} (seed {seed}): {len(turns)} turns {'PASS' if ok else 'FAIL'}")
+    return all_ok
+
+
+def test_desync_detected():
+    print("=== Desync Detection ===")
+    start, turns, _ = record_battle("tamper", typical_fighter("cat", 30), typical_fighter("dog", 30))
+    # 3턴의 선택을 바꾸면 그 턴부터 기록된 상태와 달라져야 함
+    f1 = typical_fighter("cat", 30)
+    turns[2]["sel"]["1"] = next(m for m in f1.skills if m != turns[2]["sel"]["1"])
+    replay = rebuild(start, turns)
+    ok = not replay["verified"] and replay["desync_turns"][0] == turns[2]["n"]
+    print(f"desync turns {replay['desync_turns'][:3]} {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+if __name__ == "__main__":
+    results = [test_rebuild(), test_desync_detected()]
+    print("\nALL PASS" if all(results) else "\nSOME FAILED")
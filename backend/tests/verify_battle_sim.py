@@ -0,0 +1,95 @@
+import os
+import sys
+import math
+import random
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.game.battle_manager import BattleManager, BattleState, CombatStats
+from app.game.battle_simulator import simulate, typical_fighter
+
+FIELD = {"weather": "clear", "location": "stadium"}
+
+
+def scalar_battle(f1, f2, max_turns=100):
+    """양측 무작위 선택으로 한 판 진행"""
+    return play_battle(
+        f1, f2,
+        lambda my_state, opp_state: random.choice(f1.skills),
+        lambda my_state, opp_state: random.choice(f2.skills),
+        max_turns
+    )
+
+
+def play_battle(f1, f2, policy1, policy2, max_turns=100):
+    """
+    스칼라 엔진(BattleManager.resolve_turn, 실제 대전과 같은 턴 처리)으로 한 판 진행
+    policy(내 상태, 상대 상태) -> 기술 ID
+    """
+    stats = {str(i): CombatStats.from_dict(f.stats) for i, f in enumerate((f1, f2))}
+    states = {str(i): BattleState(max_hp=f.stats["health"], current_hp=f.stats["health"]) for i, f in enumerate((f1, f2))}
+    pets = {str(i): f.pet_type for i, f in enumerate((f1, f2))}
+    field = dict(FIELD)
+
+    for turn in range(1, max_turns + 1):
+        selections = {"0": policy1(states["0"], states["1"]), "1": policy2(states["1"], states["0"])}
+        BattleManager.resolve_turn([0, 1], stats, states, pets, selections, field)
+
+        alive = [states[uid].current_hp > 0 for uid in ("0", "1")]
+        if not all(alive):
+            return ("p1_win" if alive[0] else "p2_win" if alive[1] else "draw"), turn
+    return "timeout", max_turns
+
+
+def scalar_simulate(f1, f2, n):
+    counts = {"p1_win": 0, "p2_win": 0, "draw": 0, "timeout": 0}
+    turns = 0
+    for _ in range(n):
+        result, t = scalar_battle(f1, f2)
+        counts[result] += 1
+        turns += t
+    return {k: v / n for k, v in counts.items()} | {"avg_turns": turns / n}
+
+
+def within(p_scalar, p_vec, n_scalar, n_vec, sigmas=4.0):
+    """두 비율의 차이가 표준오차의 sigmas배 이내인지"""
+    p = (p_scalar * n_scalar + p_vec * n_vec) / (n_scalar + n_vec)
+    se = math.sqrt(max(p * (1 - p), 1e-4) * (1 / n_scalar + 1 / n_vec))
+    return abs(p_scalar - p_vec) <= sigmas * se
+
+
+def test_matchups():
+    print("=== Vectorized vs Scalar Engine ===")
+    random.seed(1234)
+    n_scalar, n_vec = 3000, 60000
+    matchups = [
+        (typical_fighter("cat", 30), typical_fighter("dog", 30)),
+        (typical_fighter("bird", 20), typical_fighter("cat", 20)),
+        (typical_fighter("dog", 50, skills=(50, 25)), typical_fighter("bear", 50, skills=(15, 30))),
+    ]
+    all_ok = True
+    for f1, f2 in matchups:
+        ref = scalar_simulate(f1, f2, n_scalar)
+        vec = simulate(f1, f2, n=n_vec, seed=99)
+        ok = all(within(ref[k], vec[k], n_scalar, n_vec) for k in ("p1_win", "p2_win", "draw", "timeout"))
+        ok = ok and abs(ref["avg_turns"] - vec["avg_turns"]) <= 0.1 * ref["avg_turns"] + 0.5
+        all_ok &= ok
+        print(f"{f1.pet_type}{f1.level} vs {f2.pet_type}{f2.level}: "
+              f"scalar {ref['p1_win']:.3f}/{ref['p2_win']:.3f}/{ref['draw']:.3f} ({ref['avg_turns']:.1f} turns), "
+              f"vector {vec['p1_win']:.3f}/{vec['p2_win']:.3f}/{vec['draw']:.3f} ({vec['avg_turns']:.1f} turns) "
+              f"{'PASS' if ok else 'FAIL'}")
+    return all_ok
+
+
+def test_deterministic():
+    print("=== Seed Reproducibility ===")
+    f1, f2 = typical_fighter("cat", 30), typical_fighter("dog", 30)
+    ok = simulate(f1, f2, n=5000, seed=7) == simulate(f1, f2, n=5000, seed=7)
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+if __name__ == "__main__":
+    results = [test_deterministic(), test_matchups()]
+    print("\nALL PASS" if all(results) else "\nSOME FAILED")
@@ -0,0 +1,94 @@
+import os
+import sys
+import asyncio
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ai_core.brain.dispatcher import (
+    LLMDispatcher, PRIORITY_IDLE, PRIORITY_FAIL, PRIORITY_SUCCESS
+)
+
+
+def fake_llm(log, name, delay=0.05):
+    async def run():
+        await asyncio.sleep(delay)
+        log.append(name)
+        return name
+    return run
+
+
+async def test_latest_wins():
+    print("=== Latest Request Wins ===")
+    d = LLMDispatcher(max_concurrency=4, rate_per_sec=0)
+    s = d.session("u1")
+    log = []
+    s.submit(PRIORITY_FAIL, fake_llm(log, "greeting"))
+    await asyncio.sleep(0.01)                           # greeting 실행 중
+    s.submit(PRIORITY_FAIL, fake_llm(log, "fail-1"))    # 대기
+    s.submit(PRIORITY_FAIL, fake_llm(log, "fail-2"))    # fail-1 교체
+    s.submit(PRIORITY_IDLE, fake_llm(log, "idle"))      # 낮은 우선순위 → 버림
+    await asyncio.sleep(0.2)
+    ok = log == ["greeting", "fail-2"] and d.counters["dropped"] == 1 and d.counters["cancelled"] == 1
+    print("PASS" if ok else f"FAIL: {log} {d.metrics()}")
+
+
+async def test_success_preempts():
+    print("=== Success Preempts Running Call ===")
+    d = LLMDispatcher(max_concurrency=4, rate_per_sec=0)
+    s = d.session("u2")
+    log = []
+    s.submit(PRIORITY_IDLE, fake_llm(log, "idle", delay=0.5))
+    await asyncio.sleep(0.01)
+    msg = await s.call(PRIORITY_SUCCESS, fake_llm(log, "success"))
+    ok = msg == "success" and log == ["success"] and d.in_flight == 0 and d.queued == 0
+    print("PASS" if ok else f"FAIL: {log} {d.metrics()}")
+
+
+async def test_success_preempts_behind_pending():
+    print("=== Success Preempts Running Call Behind Pending ===")
+    d = LLMDispatcher(max_concurrency=4, rate_per_sec=0)
+    s = d.session("u3")
+    log = []
+    s.submit(PRIORITY_IDLE, fake_llm(log, "idle", delay=0.5))
+    await asyncio.sleep(0.01)                           # idle 실행 중
+    s.submit(PRIORITY_FAIL, fake_llm(log, "fail"))      # 대기
+    started = asyncio.get_running_loop().time()
+    msg = await s.call(PRIORITY_SUCCESS, fake_llm(log, "success"))
+    elapsed = asyncio.get_running_loop().time() - started
+    ok = (msg == "success" and log == ["success"] and elapsed < 0.3
+          and d.counters["cancelled"] == 2 and d.queued == 0 and d.in_flight == 0)
+    print("PASS" if ok else f"FAIL: {log} {elapsed:.2f}s {d.metrics()}")
+
+
+async def test_close_and_bound():
+    print("=== Global Bound & Close ===")
+    d = LLMDispatcher(max_concurrency=3, rate_per_sec=0)
+    peak = 0
+
+    async def slow():
+        nonlocal peak
+        peak = max(peak, d.in_flight)
+        await asyncio.sleep(0.05)
+
+    sessions = [d.session(i) for i in range(20)]
+    for s in sessions:
+        s.submit(PRIORITY_FAIL, slow)
+    await asyncio.sleep(0.12)
+    for s in sessions:
+        s.close()
+    await asyncio.sleep(0.01)
+    m = d.metrics()
+    ok = peak <= 3 and m["queued"] == 0 and m["in_flight"] == 0 and m["cancelled"] > 0
+    print("PASS" if ok else f"FAIL: peak={peak} {m}")
+
+
+async def main():
+    await test_latest_wins()
+    await test_success_preempts()
+    await test_success_preempts_behind_pending()
+    await test_close_and_bound()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import asyncio
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.sockets.spectator_hub import SpectatorHub, SPECTATOR_QUEUE_SIZE, CLOSE_SLOW_CONSUMER
+
+
+class FakeSocket:
+    """send_text마다 delay만큼 걸리는 가짜 웹소켓 (stall이면 응답 없음)"""
+    def __init__(self, delay=0.0, stall=False):
+        self.delay, self.stall = delay, stall
+        self.received, self.close_code = [], None
+
+    async def send_text(self, text):
+        if self.stall:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(self.delay)
+        self.received.append(text)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+async def snapshot():
+    return "SNAPSHOT"
+
+
+async def test_fanout():
+    print("=== Concurrent Fan-out ===")
+    hub = SpectatorHub()
+    socks = [FakeSocket(delay=0.01) for _ in range(300)]
+    for ws in socks:
+        await hub.join("r", ws, snapshot)
+    start = time.perf_counter()
+    hub.publish("r", "TURN_1")
+    publish_ms = (time.perf_counter() - start) * 1000
+    await asyncio.sleep(0.1)
+    # 순차 전송이면 300 * 2 * 10ms = 6초, 동시 전송이면 수십 ms
+    ok = all(ws.received == ["SNAPSHOT", "TURN_1"] for ws in socks) and publish_ms < 50
+    print(f"300 viewers, publish {publish_ms:.1f}ms {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+async def test_slow_consumer():
+    print("=== Slow Consumer Drop ===")
+    hub = SpectatorHub()
+    fast, slow = FakeSocket(), FakeSocket(stall=True)
+    await hub.join("r", fast, snapshot)
+    await hub.join("r", slow, snapshot)
+    for i in range(SPECTATOR_QUEUE_SIZE + 5):
+        hub.publish("r", f"TURN_{i}")
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+    ok = (hub.count("r") == 1 and slow.close_code == CLOSE_SLOW_CONSUMER
+          and len(fast.received) == SPECTATOR_QUEUE_SIZE + 6)
+    print(f"viewers left {hub.count('r')}, slow closed {slow.close_code} {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+async def test_late_join_order():
+    print("=== Late Join Snapshot Order ===")
+    hub = SpectatorHub()
+    ws = FakeSocket()
+
+    async def slow_snapshot():
+        # 스냅샷을 만드는 동안 턴 결과가 도착
+        hub.publish("r", "TURN_5")
+        await asyncio.sleep(0.01)
+        return "SNAPSHOT"
+
+    await hub.join("r", ws, slow_snapshot)
+    hub.close_room("r")
+    await asyncio.sleep(0.05)
+    ok = ws.received == ["SNAPSHOT", "TURN_5"] and ws.close_code == 1000 and hub.count("r") == 0
+    print(f"received {ws.received}, closed {ws.close_code} {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+async def main():
+    return [await test_fanout(), await test_slow_consumer(), await test_late_join_order()]
+
+
+if __name__ == "__main__":
+    results = asyncio.run(main())
+    print("\nALL PASS" if all(results) else "\nSOME FAILED")